@@ -0,0 +1,17 @@
+# Generated by Django 6.0.2 on 2026-10-18 15:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_sellerrequest'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sellerrequest',
+            index=models.Index(fields=['status', '-submitted_at'], name='sellerreq_status_submitted_idx'),
+        ),
+    ]
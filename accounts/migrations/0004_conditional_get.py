@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-18 17:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sellerprofile',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -36,6 +36,7 @@ class SellerProfile(models.Model):
     rating = models.DecimalField(max_digits=3, decimal_places=2, default=0.00)
     total_sales = models.IntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.business_name} - {self.user.username}"
@@ -92,4 +93,8 @@ class SellerRequest(models.Model):
     class Meta:
         verbose_name = 'Demande Vendeur'
         verbose_name_plural = 'Demandes Vendeurs'
-        ordering = ['-submitted_at']
\ No newline at end of file
+        ordering = ['-submitted_at']
+        indexes = [
+            # Demandes en attente (dashboard admin), plus récentes d'abord
+            models.Index(fields=['status', '-submitted_at'], name='sellerreq_status_submitted_idx'),
+        ]
\ No newline at end of file
@@ -1,3 +1,11 @@
 from django.test import TestCase
 
-# Create your tests here.
+from products.query_plans import plan_problems
+
+from .models import SellerRequest
+
+
+class QueryPlanTests(TestCase):
+    def test_pending_seller_requests_use_an_index(self):
+        plan, problems = plan_problems(SellerRequest.objects.filter(status='pending').order_by('-submitted_at')[:5])
+        self.assertEqual(problems, [], plan)
@@ -3,11 +3,15 @@ from django.contrib.auth import login, logout, authenticate
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.db.models import Sum
+from django.http import JsonResponse
+from django.template.loader import render_to_string
 
 from .models import User, SellerProfile, SellerRequest
 from .forms import (UserRegistrationForm, UserLoginForm, UserProfileForm,
                     SellerProfileForm, SellerRequestForm)
 from orders.models import Order, OrderItem
+from products import conditional
+from products.pagination import paginate, estimate_count, InvalidCursor
 
 try:
     from .emails import send_welcome_email, send_seller_request_submitted
@@ -80,9 +84,7 @@ def dashboard_view(request):
     user = request.user
     context = {'user': user}
     if user.is_seller:
-        seller_orders = Order.objects.filter(
-            items__seller=user
-        ).distinct().order_by('-created_at')[:5]
+        seller_orders = Order.for_seller(user)[:5]
         total_sales = OrderItem.objects.filter(
             seller=user
         ).aggregate(t=Sum('total_price'))['t'] or 0
@@ -176,12 +178,36 @@ def become_seller_view(request):
 # PROFIL PUBLIC VENDEUR
 # ─────────────────────────────────────────
 def seller_public_profile_view(request, username):
-    seller = get_object_or_404(User, username=username, is_seller=True)
-    products = seller.products.filter(is_active=True).order_by('-created_at')
-    return render(request, 'accounts/seller_profile.html', {
+    seller = get_object_or_404(
+        User.objects.select_related('seller_profile'), username=username, is_seller=True,
+    )
+    validators = conditional.seller_page(request, seller)
+    response = conditional.not_modified(request, validators)
+    if response:
+        return response
+
+    products = seller.products.filter(is_active=True)
+
+    try:
+        page = paginate(products, 'newest', request.GET.get('cursor'))
+    except InvalidCursor:
+        page = paginate(products, 'newest')
+
+    # Défilement infini : fragment HTML des cartes suivantes
+    if request.GET.get('partial'):
+        return conditional.with_validators(JsonResponse({
+            'html': render_to_string('includes/seller_product_cards.html', {'products': page}, request=request),
+            'next': page.next_cursor,
+        }), validators)
+
+    total_products, total_is_estimate = estimate_count(products)
+    return conditional.with_validators(render(request, 'accounts/seller_profile.html', {
         'seller': seller,
-        'products': products,
-    })
+        'products': page,
+        'next_cursor': page.next_cursor,
+        'total_products': total_products,
+        'total_is_estimate': total_is_estimate,
+    }), validators)
 
 
 # ─────────────────────────────────────────
@@ -194,7 +220,7 @@ def seller_reports_view(request):
         return redirect('accounts:dashboard')
 
     user = request.user
-    all_orders = Order.objects.filter(items__seller=user).distinct()
+    all_orders = Order.for_seller(user)
     released_orders = all_orders.filter(is_payment_released=True)
     pending_orders = all_orders.filter(
         is_payment_verified=True,
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 from decouple import config, Csv
 import dj_database_url
@@ -70,6 +71,19 @@ else:
         }
     }
 
+# ── CACHE ──
+# Fichiers par défaut : partagé entre les workers gunicorn d'une même machine
+# (l'invalidation d'un worker est vue par les autres). Redis/Memcached en production :
+# CACHE_BACKEND=django.core.cache.backends.redis.RedisCache CACHE_LOCATION=redis://...
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': config('CACHE_LOCATION', default=str(Path(tempfile.gettempdir()) / 'mykanty-cache')),
+        'TIMEOUT': config('CACHE_TIMEOUT', default=3600, cast=int),
+        'OPTIONS': {'MAX_ENTRIES': config('CACHE_MAX_ENTRIES', default=20000, cast=int)},
+    }
+}
+
 # ── VALIDATION MOTS DE PASSE ──
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -105,6 +119,18 @@ EMAIL_HOST_USER = config('EMAIL_HOST_USER', default='')
 EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='')
 DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='My Kanty <noreply@mykanty.com>')
 
+# ── COMMANDES ──
+# Durée pendant laquelle le stock d'une commande non payée reste réservé
+STOCK_RESERVATION_HOURS = config('STOCK_RESERVATION_HOURS', default=48, cast=int)
+# Frais de livraison par zone (XOF, orders/pricing.py). Tarif unique de
+# 2000 XOF par défaut, tant que des tarifs par zone ne sont pas validés
+SHIPPING_FLAT_RATE = config('SHIPPING_FLAT_RATE', default=2000, cast=int)
+SHIPPING_RATES = {
+    'grand_lome': config('SHIPPING_RATE_GRAND_LOME', default=SHIPPING_FLAT_RATE, cast=int),
+    'togo': config('SHIPPING_RATE_TOGO', default=SHIPPING_FLAT_RATE, cast=int),
+    'international': config('SHIPPING_RATE_INTERNATIONAL', default=SHIPPING_FLAT_RATE, cast=int),
+}
+
 # ── SÉCURITÉ PRODUCTION ──
 if not DEBUG:
     SECURE_BROWSER_XSS_FILTER = True
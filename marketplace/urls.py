@@ -3,6 +3,8 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from . import views
+from products import views as product_views
+from orders import views as order_views
 from django.views.generic import TemplateView
 
 urlpatterns = [
@@ -15,6 +17,10 @@ urlpatterns = [
     path('payments/', include('payments.urls')),
     path('legal/', include('legal.urls')),
     path('chatbot-api/', views.chatbot_api_view, name='chatbot-api'),
+    path('api/products/search/', product_views.product_search_api_view, name='product-search-api'),
+    path('api/v1/', include('products.api_urls')),
+    path('api/cart/validate/', order_views.cart_validate_api_view, name='cart-validate-api'),
+    path('api/cart/sync/', order_views.cart_sync_api_view, name='cart-sync-api'),
     path('offline/', TemplateView.as_view(template_name='offline.html'), name='offline'),
 
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT) \
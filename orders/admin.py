@@ -1,5 +1,6 @@
 from django.contrib import admin
 from .models import Order, OrderItem, Cart, CartItem
+from .stock import release
 from django.utils import timezone
 
 @admin.register(Order)
@@ -40,7 +41,8 @@ class OrderAdmin(admin.ModelAdmin):
         }),
     )
     
-    actions = ['verify_payment', 'mark_in_preparation', 'mark_in_delivery', 'mark_delivered', 'release_payment']
+    actions = ['verify_payment', 'mark_in_preparation', 'mark_in_delivery', 'mark_delivered', 'release_payment',
+               'cancel_and_restock']
     
     def customer_display(self, obj):
         return obj.get_customer_name()
@@ -66,11 +68,13 @@ class OrderAdmin(admin.ModelAdmin):
     escrow_display.short_description = 'État Escrow'
     
     def verify_payment(self, request, queryset):
-        updated = queryset.filter(is_payment_verified=False).update(
+        # Une commande annulée (réservation expirée) a déjà rendu son stock
+        updated = queryset.filter(is_payment_verified=False).exclude(status='cancelled').update(
             is_payment_verified=True,
             payment_verified_at=timezone.now(),
             payment_verified_by=request.user,
-            status='payment_received'
+            status='payment_received',
+            reservation_expires_at=None,  # Stock définitivement vendu
         )
         self.message_user(request, f"{updated} paiement(s) vérifié(s)")
     verify_payment.short_description = "Vérifier le paiement (Escrow)"
@@ -104,6 +108,11 @@ class OrderAdmin(admin.ModelAdmin):
         self.message_user(request, f"Paiement libéré pour {updated} commande(s)")
     release_payment.short_description = "Libérer paiement au vendeur"
 
+    def cancel_and_restock(self, request, queryset):
+        cancelled = sum(release(order_id) for order_id in queryset.values_list('pk', flat=True))
+        self.message_user(request, f"{cancelled} commande(s) annulée(s), stock remis en vente")
+    cancel_and_restock.short_description = "Annuler (non payée) et remettre en stock"
+
 @admin.register(OrderItem)
 class OrderItemAdmin(admin.ModelAdmin):
     list_display = ['order', 'product_name', 'quantity', 'total_price', 'seller']
@@ -112,8 +121,23 @@ class OrderItemAdmin(admin.ModelAdmin):
 
 @admin.register(Cart)
 class CartAdmin(admin.ModelAdmin):
-    list_display = ['user', 'session_key', 'created_at']
+    list_display = ['user', 'session_key', 'items_count', 'items_total', 'updated_at']
     search_fields = ['user__username', 'session_key']
+    list_select_related = ['user']
+
+    def get_queryset(self, request):
+        # Nombre d'articles et total agrégés dans la requête de la liste
+        return super().get_queryset(request).with_summary()
+
+    def items_count(self, obj):
+        return obj.items_count
+    items_count.short_description = 'Articles'
+    items_count.admin_order_field = 'items_count'
+
+    def items_total(self, obj):
+        return obj.items_total
+    items_total.short_description = 'Total (XOF)'
+    items_total.admin_order_field = 'items_total'
 
 @admin.register(CartItem)
 class CartItemAdmin(admin.ModelAdmin):
@@ -0,0 +1,74 @@
+"""
+Validation du panier du navigateur (localStorage, PWA)
+
+Le panier est stocké côté client : prix, nom et image peuvent avoir changé,
+le produit être retiré de la vente ou en rupture. `validate_cart` revalide
+tout le panier en un aller-retour et UNE projection values() (la même que
+la tarification, orders/pricing.py, avec les colonnes d'affichage en plus).
+
+Version d'une ligne : updated_at du produit (changé par toute modification,
+y compris du stock). Le client renvoie la version qu'il connaît ; une ligne
+inchangée ne contient que l'essentiel (id, quantité, prix, disponibilité),
+le client garde son nom et son image en cache.
+"""
+
+from django.urls import reverse
+
+from products.api import product_image_url
+
+from .checkout import CheckoutError, cart_quantities
+from .pricing import DEFAULT_COUNTRY, price_cart
+
+MAX_LINES = 100
+DISPLAY_FIELDS = ('price', 'discount_price', 'main_image', 'image_variants', 'updated_at')
+
+
+def _version(row):
+    return row['updated_at'].isoformat()
+
+
+def validate_cart(items, city='', country=DEFAULT_COUNTRY):
+    """
+    items : [{'id', 'quantity', 'version' (facultatif)}]. Retourne les lignes
+    dans l'ordre du panier et les montants faisant foi ; lève CheckoutError.
+    """
+    quantities = cart_quantities(items)
+    if len(quantities) > MAX_LINES:
+        raise CheckoutError(f"Au plus {MAX_LINES} produits par panier")
+    known = {int(item['id']): item.get('version') for item in items}
+    quote = price_cart(quantities, city, country, fields=DISPLAY_FIELDS)
+
+    lines = []
+    for product_id, quantity in quantities.items():
+        row = quote.rows.get(product_id)
+        if row is None:
+            lines.append({'id': product_id, 'quantity': quantity, 'is_active': False, 'available': False})
+            continue
+        version = _version(row)
+        line = {
+            'id': product_id,
+            'quantity': quantity,
+            'version': version,
+            'changed': known.get(product_id) != version,
+            'is_active': row['is_active'],
+            'available': row['is_active'] and row['stock_quantity'] >= quantity,
+            'stock_quantity': row['stock_quantity'],
+            'unit_price': row['effective_price'],
+            'total': row['effective_price'] * quantity,
+        }
+        if line['changed']:
+            line.update({
+                'name': row['name'],
+                'price': row['price'],
+                'discount_price': row['discount_price'],
+                'image': product_image_url(row),
+                'url': reverse('products:product-detail', args=[product_id]),
+            })
+        lines.append(line)
+
+    return {
+        'lines': lines,
+        'unavailable': quote.unavailable,
+        'valid': not quote.unavailable and all(line['available'] for line in lines),
+        **quote.summary(),
+    }
@@ -0,0 +1,172 @@
+"""
+Panier persistant côté serveur (modèles Cart / CartItem)
+
+Le panier du navigateur (localStorage) est recopié sur le serveur : panier
+de l'utilisateur connecté, ou panier anonyme rattaché à la session. Le
+navigateur n'envoie que les lignes modifiées depuis la dernière
+synchronisation, avec la version du panier qu'il connaît :
+
+    POST /api/cart/sync/
+    {"version": "12.7", "changes": [{"id": 3, "quantity": 2}], "removed": [8]}
+
+- `changes` : UN upsert bulk_create(update_conflicts=True) sur la contrainte
+  unique (cart, product) ; `removed` : UN DELETE ;
+- la version (« <id du panier>.<compteur> ») est incrémentée si le panier
+  change ; si le navigateur n'avait pas la dernière (autre appareil,
+  fusion à la connexion), la réponse contient le panier complet ;
+- version absente (première synchronisation) : les lignes envoyées sont
+  fusionnées au panier du serveur, qui est renvoyé en entier ;
+- version d'un autre panier (connexion, déconnexion) : {"resync": true},
+  le navigateur renvoie alors tout son panier sans version.
+
+À la connexion, le panier anonyme de la session est fusionné dans celui de
+l'utilisateur par des UPDATE ensemblistes (`merge_session_cart`, appelé par
+orders/signals.py) : aucune ligne n'est lue en Python.
+"""
+
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Subquery
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from products.api import product_image_url
+from products.models import Product
+
+from .cart import MAX_LINES
+from .checkout import CheckoutError, cart_quantities
+from .models import Cart, CartItem
+
+SESSION_KEY = 'cart_id'
+ITEM_FIELDS = {
+    'id': 'product_id',
+    'quantity': 'quantity',
+    'name': 'product__name',
+    'price': 'product__effective_price',
+    'main_image': 'product__main_image',
+    'image_variants': 'product__image_variants',
+}
+
+
+class StaleCart(CheckoutError):
+    """Version d'un autre panier : le navigateur doit tout renvoyer"""
+
+
+def version_token(cart):
+    return f"{cart.pk}.{cart.version}"
+
+
+def _parse_version(token, cart):
+    """None : première synchronisation ; lève StaleCart si la version vient d'un autre panier"""
+    if token is None:
+        return None
+    cart_id, _, version = str(token).partition('.')
+    if cart_id != str(cart.pk) or not version.isdigit():
+        raise StaleCart(f"Version de panier inconnue : {token}")
+    return int(version)
+
+
+def get_cart(request, create=True):
+    """Panier de l'utilisateur connecté, sinon panier anonyme de la session"""
+    if request.user.is_authenticated:
+        if create:
+            return Cart.objects.get_or_create(user=request.user)[0]
+        return Cart.objects.filter(user=request.user).first()
+
+    cart_id = request.session.get(SESSION_KEY)
+    cart = Cart.objects.filter(pk=cart_id, user=None).first() if cart_id else None
+    if cart is None and create:
+        if request.session.session_key is None:
+            request.session.save()
+        cart = Cart.objects.create(session_key=request.session.session_key)
+        request.session[SESSION_KEY] = cart.pk
+    return cart
+
+
+def cart_items(cart):
+    """Lignes complètes du panier (affichage), en une projection values()"""
+    rows = CartItem.objects.filter(cart=cart).order_by('added_at', 'pk').values(*ITEM_FIELDS.values())
+    items = []
+    for row in rows:
+        item = {name: row[column] for name, column in ITEM_FIELDS.items()}
+        item['image'] = product_image_url({
+            'main_image': item.pop('main_image'), 'image_variants': item.pop('image_variants'),
+        })
+        items.append(item)
+    return items
+
+
+def sync_cart(cart, version, changes=(), removed=()):
+    """
+    Applique au panier les lignes modifiées et supprimées par le navigateur.
+    Retourne {'success', 'version', 'rejected'} (produits inconnus ou retirés
+    de la vente, supprimés du panier), plus 'items' si le navigateur n'avait
+    pas la dernière version. Lève CheckoutError (StaleCart : version d'un
+    autre panier).
+    """
+    quantities = cart_quantities(changes) if changes else {}
+    try:
+        removed = {int(product_id) for product_id in removed} - set(quantities)
+    except (TypeError, ValueError):
+        raise CheckoutError('Article de panier invalide')
+    if len(quantities) + len(removed) > MAX_LINES:
+        raise CheckoutError(f"Au plus {MAX_LINES} produits par panier")
+    version = _parse_version(version, cart)
+
+    on_sale = set(
+        Product.objects.filter(pk__in=list(quantities), is_active=True).values_list('pk', flat=True)
+    ) if quantities else set()
+    rejected = sorted(set(quantities) - on_sale)
+    removed |= set(rejected)
+
+    with transaction.atomic():
+        # Verrou du panier : deux onglets ne se marchent pas sur la version
+        current = Cart.objects.select_for_update().values_list('version', flat=True).get(pk=cart.pk)
+        if on_sale:
+            CartItem.objects.bulk_create(
+                [CartItem(cart=cart, product_id=product_id, quantity=quantities[product_id])
+                 for product_id in sorted(on_sale)],
+                update_conflicts=True,
+                unique_fields=['cart', 'product'],
+                update_fields=['quantity'],
+            )
+        if removed:
+            CartItem.objects.filter(cart=cart, product_id__in=removed).delete()
+        if on_sale or removed:
+            Cart.objects.filter(pk=cart.pk).update(version=F('version') + 1, updated_at=timezone.now())
+            cart.version = current + 1
+        else:
+            cart.version = current
+
+    result = {'success': True, 'version': version_token(cart), 'rejected': rejected}
+    # Le navigateur n'a pas vu toutes les modifications : panier complet
+    if version is None or version != current or rejected:
+        result['items'] = cart_items(cart)
+    return result
+
+
+def merge_session_cart(request, user):
+    """
+    Fusionne le panier anonyme de la session dans celui de l'utilisateur
+    (quantité la plus grande si un produit est dans les deux), en trois
+    requêtes ensemblistes ; le panier anonyme est supprimé. Retourne le
+    panier de l'utilisateur (None sans panier anonyme).
+    """
+    cart_id = request.session.pop(SESSION_KEY, None)
+    guest = Cart.objects.filter(pk=cart_id, user=None).first() if cart_id else None
+    if guest is None:
+        return None
+
+    with transaction.atomic():
+        cart, created = Cart.objects.get_or_create(user=user)
+        if not created:
+            both = CartItem.objects.filter(cart=guest, product_id=OuterRef('product_id'))
+            # Produits déjà dans le panier de l'utilisateur : quantité max
+            CartItem.objects.filter(Exists(both), cart=cart).update(
+                quantity=Greatest('quantity', Subquery(both.values('quantity')[:1])),
+            )
+            guest.items.filter(product_id__in=cart.items.values('product_id')).delete()
+        # Les autres lignes changent simplement de panier
+        guest.items.update(cart=cart)
+        Cart.objects.filter(pk=cart.pk).update(version=F('version') + 1, updated_at=timezone.now())
+        guest.delete()
+    return cart
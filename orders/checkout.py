@@ -0,0 +1,93 @@
+"""
+Création d'une commande à partir du panier validé au paiement
+
+Tout est écrit dans UNE transaction, ou rien (plus de commande à moitié
+enregistrée) :
+
+1. le panier est tarifé par orders/pricing.py (produits lus en une
+   projection values() ; le vendeur n'est utile que par son id, déjà dans
+   la ligne produit) : prix, livraison et total ne viennent jamais du navigateur ;
+2. le stock de chaque ligne est réservé (orders/stock.py) ;
+3. la commande est insérée, puis toutes ses lignes en un seul bulk_create
+   (prix figés par la tarification : bulk_create n'appelle pas OrderItem.save).
+
+Le courriel de confirmation et la recompression de la preuve de paiement
+partent après le COMMIT.
+"""
+
+from django.db import transaction
+
+from accounts.emails import send_order_confirmation
+from products.jobs import enqueue
+
+from .models import Order, OrderItem
+from .stock import reservation_deadline, reserve
+
+
+class CheckoutError(ValueError):
+    pass
+
+
+def cart_quantities(items):
+    """{product_id: quantité} d'un panier [{'id', 'quantity'}] (un produit peut y figurer deux fois)"""
+    quantities = {}
+    for item in items:
+        try:
+            product_id, quantity = int(item['id']), int(item['quantity'])
+        except (KeyError, TypeError, ValueError):
+            raise CheckoutError('Article de panier invalide')
+        if quantity < 1:
+            raise CheckoutError('Quantité invalide')
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+    if not quantities:
+        raise CheckoutError('Panier vide')
+    return quantities
+
+
+def build_items(order, quote):
+    return [
+        OrderItem(
+            order=order,
+            product_id=line.product_id,
+            product_name=line.row['name'],
+            product_price=line.unit_price,
+            quantity=line.quantity,
+            total_price=line.total,
+            seller_id=line.row['seller_id'],
+        )
+        for line in quote.lines
+    ]
+
+
+def place_order(quote, **order_fields):
+    """
+    Réserve le stock et crée la commande et ses lignes à partir d'une
+    tarification (orders.pricing.price_cart) ; retourne la commande.
+    Lève CheckoutError (produit inconnu ou retiré) ou OutOfStock : rien n'est écrit.
+    `order_fields` : champs de Order (client, adresse, paiement) ; les
+    montants sont ceux de la tarification.
+    """
+    if quote.unavailable:
+        raise CheckoutError(f"Produit indisponible : {', '.join(map(str, sorted(quote.unavailable)))}")
+    if not quote.lines:
+        raise CheckoutError('Panier vide')
+
+    with transaction.atomic():
+        # Toutes les lignes ou aucune (OutOfStock annule la transaction)
+        reserve({line.product_id: line.quantity for line in quote.lines})
+        order = Order.objects.create(
+            status='awaiting_payment',
+            reservation_expires_at=reservation_deadline(),
+            subtotal=quote.subtotal,
+            shipping_cost=quote.shipping_cost,
+            total=quote.total,
+            commission_rate=quote.commission_rate,
+            **order_fields,
+        )
+        OrderItem.objects.bulk_create(build_items(order, quote))
+
+        if order.payment_proof:
+            # Recompression de la photo hors requête (run_image_worker)
+            transaction.on_commit(lambda: enqueue('payment_proof', order.pk))
+        transaction.on_commit(lambda: send_order_confirmation(order))
+    return order
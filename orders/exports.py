@@ -0,0 +1,139 @@
+"""
+Exports comptables en flux (CSV ou JSONL)
+
+Chaque export est une projection `values_list` parcourue avec
+`iterator(chunk_size=...)` et envoyée ligne par ligne dans une
+StreamingHttpResponse : la mémoire reste constante quel que soit le nombre
+de lignes (aucune instance de modèle, aucun cache de queryset).
+
+- products : catalogue (admin : tout ; vendeur : ses produits)
+- orders   : commandes (admin uniquement : une commande mêle plusieurs vendeurs)
+- sales    : lignes de commande OrderItem (admin : tout ; vendeur : ses ventes)
+
+Les filtres de dates portent sur created_at, indexé avec le vendeur pour
+les ventes (voir Meta.indexes de Order et OrderItem).
+"""
+
+import csv
+import json
+from datetime import datetime, time, timedelta
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from products.models import Product
+
+from .models import Order, OrderItem
+
+CHUNK_SIZE = 2000
+# Lignes regroupées par écriture réseau (une écriture par ligne serait coûteuse)
+LINES_PER_WRITE = 500
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+}
+
+# Nom -> (en-têtes, champs values_list)
+DATASETS = {
+    'products': (
+        ['id', 'sku', 'name', 'seller', 'category', 'price', 'discount_price',
+         'stock_quantity', 'is_active', 'created_at', 'updated_at'],
+        ['id', 'sku', 'name', 'seller__username', 'category__name', 'price', 'discount_price',
+         'stock_quantity', 'is_active', 'created_at', 'updated_at'],
+    ),
+    'orders': (
+        ['order_number', 'created_at', 'status', 'customer', 'guest_email', 'shipping_city',
+         'subtotal', 'shipping_cost', 'total', 'commission_amount', 'seller_amount',
+         'payment_method', 'payment_reference', 'is_payment_verified', 'is_payment_released'],
+        ['order_number', 'created_at', 'status', 'user__username', 'guest_email', 'shipping_city',
+         'subtotal', 'shipping_cost', 'total', 'commission_amount', 'seller_amount',
+         'payment_method', 'payment_reference', 'is_payment_verified', 'is_payment_released'],
+    ),
+    'sales': (
+        ['order_number', 'created_at', 'order_status', 'seller', 'product_id', 'product_name',
+         'product_price', 'quantity', 'total_price'],
+        ['order__order_number', 'created_at', 'order__status', 'seller__username', 'product_id',
+         'product_name', 'product_price', 'quantity', 'total_price'],
+    ),
+}
+SELLER_DATASETS = {'products', 'sales'}
+
+
+def date_range(start, end):
+    """(début, fin exclue) en datetimes du fuseau courant ; dates `date` ou None"""
+    tz = timezone.get_current_timezone()
+    since = datetime.combine(start, time.min, tzinfo=tz) if start else None
+    until = datetime.combine(end + timedelta(days=1), time.min, tzinfo=tz) if end else None
+    return since, until
+
+
+def export_queryset(dataset, seller=None, start=None, end=None):
+    """Projection values_list de l'export ; `seller` restreint aux données du vendeur"""
+    fields = DATASETS[dataset][1]
+    if dataset == 'products':
+        queryset = Product.objects.all()
+        if seller is not None:
+            queryset = queryset.filter(seller=seller)
+        queryset = queryset.order_by('id')
+    else:
+        queryset = (Order if dataset == 'orders' else OrderItem).objects.all()
+        if seller is not None:
+            queryset = queryset.filter(seller=seller)
+        since, until = date_range(start, end)
+        if since:
+            queryset = queryset.filter(created_at__gte=since)
+        if until:
+            queryset = queryset.filter(created_at__lt=until)
+        queryset = queryset.order_by('created_at')
+    return queryset.values_list(*fields)
+
+
+def _local(value):
+    return timezone.localtime(value).replace(microsecond=0) if isinstance(value, datetime) else value
+
+
+def _csv_cell(value):
+    value = _local(value)
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    # Un texte qui commence par = + - @ serait exécuté comme formule par Excel
+    if isinstance(value, str) and value[:1] in ('=', '+', '-', '@'):
+        return "'" + value
+    return value
+
+
+class _Echo:
+    """Pseudo-fichier : csv.writer retourne la ligne au lieu de l'écrire"""
+
+    def write(self, value):
+        return value
+
+
+def _lines(dataset, queryset, fmt):
+    header = DATASETS[dataset][0]
+    rows = queryset.iterator(chunk_size=CHUNK_SIZE)
+    if fmt == 'jsonl':
+        for row in rows:
+            yield json.dumps(
+                dict(zip(header, map(_local, row))), cls=DjangoJSONEncoder, ensure_ascii=False,
+            ) + '\n'
+    else:
+        writer = csv.writer(_Echo())
+        # BOM : Excel ouvre le fichier en UTF-8 (accents)
+        yield '\ufeff' + writer.writerow(header)
+        for row in rows:
+            yield writer.writerow([_csv_cell(value) for value in row])
+
+
+def stream_export(dataset, queryset, fmt):
+    """Générateur pour StreamingHttpResponse, par blocs de LINES_PER_WRITE lignes"""
+    buffer = []
+    for line in _lines(dataset, queryset, fmt):
+        buffer.append(line)
+        if len(buffer) >= LINES_PER_WRITE:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
@@ -0,0 +1,20 @@
+"""
+Libère le stock des commandes non payées dont la réservation a expiré
+
+    python manage.py release_expired_reservations
+
+À lancer régulièrement (cron, toutes les 10 minutes par exemple).
+Délai : STOCK_RESERVATION_HOURS (48 h par défaut).
+"""
+
+from django.core.management.base import BaseCommand
+
+from orders.stock import release_expired
+
+
+class Command(BaseCommand):
+    help = 'Annule les commandes non payées expirées et remet leur stock en vente'
+
+    def handle(self, *args, **options):
+        released = release_expired()
+        self.stdout.write(self.style.SUCCESS(f"✅ {released} commande(s) expirée(s) annulée(s), stock remis en vente"))
@@ -0,0 +1,28 @@
+# Generated by Django 6.0.2 on 2026-10-18 14:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_order_commission_amount_order_commission_rate_and_more'),
+        ('products', '0008_image_jobs'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['created_at'], name='order_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='orderitem',
+            index=models.Index(fields=['seller', 'created_at'], name='orderitem_seller_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='orderitem',
+            index=models.Index(fields=['created_at'], name='orderitem_created_idx'),
+        ),
+    ]
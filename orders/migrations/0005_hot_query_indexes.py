@@ -0,0 +1,40 @@
+# Generated by Django 6.0.2 on 2026-10-18 15:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0004_export_indexes'),
+        ('products', '0010_hot_query_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status'], name='order_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('is_payment_verified', False), ('payment_reference__gt', '')), fields=['-created_at'], name='order_to_verify_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('is_delivery_confirmed', True), ('is_payment_released', False), ('is_payment_verified', True)), fields=['-created_at'], name='order_to_release_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('is_payment_verified', True)), fields=['created_at'], name='order_verified_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', '-created_at'], name='order_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='orderitem',
+            index=models.Index(fields=['seller', 'order'], name='orderitem_seller_order_idx'),
+        ),
+    ]
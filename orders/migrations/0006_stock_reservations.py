@@ -0,0 +1,24 @@
+# Generated by Django 6.0.2 on 2026-10-18 16:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0005_hot_query_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='reservation_expires_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('reservation_expires_at__isnull', False)), fields=['reservation_expires_at'], name='order_reservation_idx'),
+        ),
+    ]
@@ -1,4 +1,7 @@
+from decimal import Decimal
 from django.db import models
+from django.db.models import F, Prefetch, Sum, Value
+from django.db.models.functions import Coalesce
 from accounts.models import User
 from products.models import Product
 import uuid
@@ -75,6 +78,10 @@ class Order(models.Model):
     
     # Tracking
     tracking_number = models.CharField(max_length=200, blank=True)
+
+    # Stock réservé jusqu'à cette date si le paiement n'est pas vérifié
+    # (None : réservation confirmée par le paiement, ou déjà libérée)
+    reservation_expires_at = models.DateTimeField(null=True, blank=True, editable=False)
     
     # Dates
     created_at = models.DateTimeField(auto_now_add=True)
@@ -91,6 +98,17 @@ class Order(models.Model):
         
         super().save(*args, **kwargs)
 
+    @classmethod
+    def for_seller(cls, seller):
+        """
+        Commandes contenant des produits du vendeur, plus récentes d'abord.
+        Semi-jointure (IN) plutôt que jointure + DISTINCT : servie par l'index
+        OrderItem(seller, order), sans dédoublonnage.
+        """
+        return cls.objects.filter(
+            pk__in=OrderItem.objects.filter(seller=seller).values('order_id')
+        ).order_by('-created_at')
+
     def get_customer_name(self):
         if self.user:
             return f"{self.user.first_name} {self.user.last_name}" if self.user.first_name else self.user.username
@@ -112,6 +130,29 @@ class Order(models.Model):
         verbose_name = 'Commande'
         verbose_name_plural = 'Commandes'
         ordering = ['-created_at']
+        indexes = [
+            # Exports et rapports par période
+            models.Index(fields=['created_at'], name='order_created_idx'),
+            # Compteurs par statut (dashboard admin)
+            models.Index(fields=['status'], name='order_status_idx'),
+            # États escrow : index partiels (un index sur des booléens seuls
+            # n'est pas sélectif, et SQLite ne s'en sert pas pour `WHERE col`)
+            models.Index(fields=['-created_at'],
+                         condition=models.Q(is_payment_verified=False, payment_reference__gt=''),
+                         name='order_to_verify_idx'),
+            models.Index(fields=['-created_at'],
+                         condition=models.Q(is_payment_verified=True, is_delivery_confirmed=True,
+                                            is_payment_released=False),
+                         name='order_to_release_idx'),
+            # Chiffre d'affaires (total et sur 30 jours)
+            models.Index(fields=['created_at'], condition=models.Q(is_payment_verified=True),
+                         name='order_verified_created_idx'),
+            # « Mes commandes »
+            models.Index(fields=['user', '-created_at'], name='order_user_created_idx'),
+            # Réservations à libérer (orders/stock.py)
+            models.Index(fields=['reservation_expires_at'], condition=models.Q(reservation_expires_at__isnull=False),
+                         name='order_reservation_idx'),
+        ]
 
 
 class OrderItem(models.Model):
@@ -145,6 +186,43 @@ class OrderItem(models.Model):
     class Meta:
         verbose_name = 'Article de commande'
         verbose_name_plural = 'Articles de commande'
+        indexes = [
+            # Export des ventes : par vendeur et par période, ou par période seule
+            models.Index(fields=['seller', 'created_at'], name='orderitem_seller_created_idx'),
+            models.Index(fields=['created_at'], name='orderitem_created_idx'),
+            # Commandes d'un vendeur (semi-jointure vendeur -> commandes)
+            models.Index(fields=['seller', 'order'], name='orderitem_seller_order_idx'),
+        ]
+
+
+def cart_summary_aggregates(prefix=''):
+    """
+    Nombre d'articles et total d'un panier, calculés par la base : quantité ×
+    prix effectif (Product.effective_price, colonne générée
+    Coalesce(NullIf(discount_price, 0), price), la règle de Product.get_price).
+    `prefix` : chemin vers les lignes ('items__' depuis Cart).
+    """
+    return {
+        'items_count': Coalesce(Sum(f'{prefix}quantity'), 0),
+        'items_total': Coalesce(
+            Sum(F(f'{prefix}quantity') * F(f'{prefix}product__effective_price'),
+                output_field=models.DecimalField(max_digits=12, decimal_places=2)),
+            Value(Decimal('0')),
+            output_field=models.DecimalField(max_digits=12, decimal_places=2),
+        ),
+    }
+
+
+class CartQuerySet(models.QuerySet):
+    def with_summary(self):
+        """Annote items_count et items_total (un agrégat, pas de ligne lue)"""
+        return self.annotate(**cart_summary_aggregates('items__'))
+
+    def with_items(self):
+        """Lignes et produits en une requête de plus, quel que soit le nombre de paniers"""
+        return self.prefetch_related(
+            Prefetch('items', queryset=CartItem.objects.select_related('product').order_by('added_at', 'pk'))
+        )
 
 
 class Cart(models.Model):
@@ -153,19 +231,38 @@ class Cart(models.Model):
     """
     session_key = models.CharField(max_length=255, unique=True, null=True, blank=True)
     user = models.OneToOneField(User, on_delete=models.CASCADE, null=True, blank=True, related_name='cart')
+    # Incrémentée à chaque synchronisation qui modifie le panier (orders/cart_sync.py)
+    version = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = CartQuerySet.as_manager()
+
     def __str__(self):
         return f"Panier de {self.user.username if self.user else 'Invité'}"
 
+    def summary(self):
+        """
+        {'items_count', 'items_total'} : annotation de with_summary() ou
+        lignes préchargées par with_items() si disponibles, sinon UN agrégat
+        """
+        if hasattr(self, 'items_total'):
+            return {'items_count': self.items_count, 'items_total': self.items_total}
+        if 'items' in getattr(self, '_prefetched_objects_cache', {}):
+            items = self.items.all()
+            return {
+                'items_count': sum(item.quantity for item in items),
+                'items_total': sum((item.get_subtotal() for item in items), Decimal('0')),
+            }
+        return self.items.aggregate(**cart_summary_aggregates())
+
     def get_total(self):
         """Calcule le total du panier"""
-        return sum(item.get_subtotal() for item in self.items.all())
+        return self.summary()['items_total']
 
     def get_items_count(self):
         """Compte le nombre total d'articles"""
-        return sum(item.quantity for item in self.items.all())
+        return self.summary()['items_count']
 
     class Meta:
         verbose_name = 'Panier'
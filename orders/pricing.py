@@ -0,0 +1,137 @@
+"""
+Tarification du panier côté serveur
+
+Les prix envoyés par le navigateur (panier localStorage) ne sont jamais
+repris : `price_cart` recalcule en une passe, à partir d'UNE projection
+values() des produits du panier, le prix de chaque ligne (règle de
+Product.get_price, promo comprise), les frais de livraison de la zone, le
+total et le partage commission / vendeur (même règle que Order.save).
+
+Utilisé par la création de commande (orders/checkout.py) et par la
+validation du panier (orders/cart.py). La zone de livraison vient d'une
+table en mémoire (ville, pays) -> zone, construite une fois au chargement
+du module ; le tarif de chaque zone, de settings.SHIPPING_RATES (tarif
+unique de 2000 XOF par défaut).
+"""
+
+import unicodedata
+from decimal import Decimal
+
+from django.conf import settings
+
+from products.models import Product
+
+# Colonnes lues : prix, figement des lignes de commande, disponibilité
+PRODUCT_FIELDS = ('id', 'name', 'effective_price', 'seller_id', 'stock_quantity', 'is_active')
+
+CENT = Decimal('0.01')
+COMMISSION_RATE = Decimal('5.00')  # en %, comme Order.commission_rate
+DEFAULT_COUNTRY = 'Togo'
+
+SHIPPING_LABELS = {
+    'grand_lome': 'Grand Lomé',
+    'togo': 'Togo (hors Grand Lomé)',
+    'international': 'International',
+}
+# Pays -> (zone par défaut, {zone: villes})
+SHIPPING_ZONES = {
+    'Togo': ('togo', {
+        'grand_lome': [
+            'Lomé', 'Agoè', 'Agoè-Nyivé', 'Adidogomé', 'Baguida', 'Bè', 'Tokoin',
+            'Kégué', 'Avédji', 'Hédzranawoé', 'Togblékopé', 'Adakpamé',
+        ],
+    }),
+}
+INTERNATIONAL_ZONE = 'international'
+
+
+def normalize(name):
+    """« Agoè-Nyivé » -> « agoe nyive » : casse, accents et séparateurs ignorés"""
+    text = unicodedata.normalize('NFKD', name or '').encode('ascii', 'ignore').decode().lower()
+    return ' '.join(text.replace('-', ' ').replace("'", ' ').split())
+
+
+def _build_zone_table():
+    countries, cities = {}, {}
+    for country, (default_zone, zones) in SHIPPING_ZONES.items():
+        countries[normalize(country)] = default_zone
+        for zone, names in zones.items():
+            for name in names:
+                cities[normalize(country), normalize(name)] = zone
+    return countries, cities
+
+
+_COUNTRY_ZONES, _CITY_ZONES = _build_zone_table()
+
+
+def shipping_zone(city, country=DEFAULT_COUNTRY):
+    country = normalize(country or DEFAULT_COUNTRY)
+    zone = _CITY_ZONES.get((country, normalize(city)))
+    return zone or _COUNTRY_ZONES.get(country, INTERNATIONAL_ZONE)
+
+
+def shipping_rate(zone):
+    """Frais de livraison de la zone (XOF), d'après settings.SHIPPING_RATES"""
+    return Decimal(settings.SHIPPING_RATES[zone])
+
+
+class QuoteLine:
+    """Ligne d'un produit en vente ; `row` : projection values() du produit"""
+
+    def __init__(self, row, quantity):
+        self.row = row
+        self.product_id = row['id']
+        self.quantity = quantity
+        # Colonne calculée par la base avec la règle de Product.get_price
+        # (prix promo s'il est renseigné, sinon prix normal)
+        self.unit_price = row['effective_price']
+        self.total = (self.unit_price * quantity).quantize(CENT)
+
+    @property
+    def in_stock(self):
+        return self.row['stock_quantity'] >= self.quantity
+
+
+class Quote:
+    """
+    Prix faisant foi d'un panier. `rows` : tous les produits trouvés (par
+    id), `unavailable` : ids inconnus ou produits retirés de la vente.
+    """
+
+    def __init__(self, rows, lines, unavailable, zone):
+        self.rows = rows
+        self.lines = lines
+        self.unavailable = unavailable
+        self.shipping_zone = zone
+        self.subtotal = sum((line.total for line in lines), Decimal('0')).quantize(CENT)
+        self.shipping_cost = shipping_rate(zone) if lines else Decimal('0')
+        self.total = self.subtotal + self.shipping_cost
+        self.commission_rate = COMMISSION_RATE
+        self.commission_amount = (self.total * COMMISSION_RATE / 100).quantize(CENT)
+        self.seller_amount = self.total - self.commission_amount
+
+    def summary(self):
+        return {
+            'subtotal': self.subtotal,
+            'shipping_zone': self.shipping_zone,
+            'shipping_label': SHIPPING_LABELS[self.shipping_zone],
+            'shipping': self.shipping_cost,
+            'total': self.total,
+        }
+
+
+def price_cart(quantities, city='', country=DEFAULT_COUNTRY, fields=()):
+    """
+    Quote d'un panier {product_id: quantité}, en une requête values() ;
+    `fields` : colonnes lues en plus de PRODUCT_FIELDS (affichage)
+    """
+    columns = dict.fromkeys(PRODUCT_FIELDS + tuple(fields))
+    rows = {row['id']: row for row in Product.objects.filter(pk__in=list(quantities)).values(*columns)}
+    lines, unavailable = [], []
+    for product_id, quantity in quantities.items():
+        row = rows.get(product_id)
+        if row is None or not row['is_active']:
+            unavailable.append(product_id)
+        else:
+            lines.append(QuoteLine(row, quantity))
+    return Quote(rows, lines, unavailable, shipping_zone(city, country))
@@ -0,0 +1,14 @@
+"""
+Fusion du panier anonyme de la session dans celui de l'utilisateur à la connexion
+"""
+
+from django.contrib.auth.signals import user_logged_in
+from django.dispatch import receiver
+
+from .cart_sync import merge_session_cart
+
+
+@receiver(user_logged_in)
+def merge_cart_on_login(sender, request, user, **kwargs):
+    if request is not None and hasattr(request, 'session'):
+        merge_session_cart(request, user)
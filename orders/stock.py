@@ -0,0 +1,97 @@
+"""
+Réservation du stock à la commande
+
+Le stock est décrémenté au moment de la commande, par un UPDATE
+conditionnel par ligne du panier, dans une seule transaction :
+
+    UPDATE products_product SET stock_quantity = stock_quantity - n
+    WHERE id = %s AND is_active AND stock_quantity >= n
+
+La base garantit qu'aucune ligne ne passe sous zéro : deux paniers
+concurrents sur le dernier article ne peuvent pas réussir tous les deux,
+sans SELECT ... FOR UPDATE préalable. Le verrou de ligne n'est tenu que le
+temps de la transaction de commande ; les produits sont traités par id
+croissant pour que deux paniers ne s'attendent jamais mutuellement.
+Chaque mouvement de stock change updated_at : cartes en cache et
+validateurs HTTP (products/conditional.py) suivent.
+
+Une commande non payée garde son stock STOCK_RESERVATION_HOURS heures
+(Order.reservation_expires_at) ; la vérification du paiement confirme la
+réservation, `python manage.py release_expired_reservations` (cron) annule
+les autres et remet le stock en vente.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from products.models import Product
+
+from .models import Order, OrderItem
+
+
+class OutOfStock(Exception):
+    def __init__(self, product_id, requested):
+        self.product_id = product_id
+        self.requested = requested
+        super().__init__(f"Stock insuffisant pour le produit {product_id} ({requested} demandés)")
+
+
+def reservation_deadline():
+    return timezone.now() + timedelta(hours=settings.STOCK_RESERVATION_HOURS)
+
+
+def reserve(lines):
+    """
+    Décrémente le stock de toutes les lignes {product_id: quantité} ou
+    d'aucune : lève OutOfStock à la première ligne impossible (la
+    transaction englobante, ou celle-ci, est annulée).
+    """
+    # Sans point de sauvegarde : dans la transaction de la commande, un
+    # échec annule de toute façon l'ensemble
+    with transaction.atomic(savepoint=False):
+        for product_id, quantity in sorted(lines.items()):
+            reserved = Product.objects.filter(
+                pk=product_id, is_active=True, stock_quantity__gte=quantity,
+            ).update(stock_quantity=F('stock_quantity') - quantity, updated_at=timezone.now())
+            if not reserved:
+                raise OutOfStock(product_id, quantity)
+
+
+def _restock(order_id):
+    quantities = {}
+    for product_id, quantity in OrderItem.objects.filter(
+        order_id=order_id, product__isnull=False,
+    ).values_list('product_id', 'quantity'):
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+    for product_id, quantity in sorted(quantities.items()):
+        Product.objects.filter(pk=product_id).update(
+            stock_quantity=F('stock_quantity') + quantity, updated_at=timezone.now(),
+        )
+
+
+def release(order_id, status='cancelled'):
+    """
+    Remet en stock les articles d'une commande dont la réservation court
+    encore. Retourne False si elle a déjà été confirmée ou libérée (un
+    seul appelant gagne, même en concurrence avec la vérification du paiement).
+    """
+    with transaction.atomic():
+        claimed = Order.objects.filter(
+            pk=order_id, reservation_expires_at__isnull=False, is_payment_verified=False,
+        ).update(reservation_expires_at=None, status=status, updated_at=timezone.now())
+        if not claimed:
+            return False
+        _restock(order_id)
+    return True
+
+
+def release_expired(now=None):
+    """Annule les commandes non payées dont la réservation a expiré ; retourne leur nombre"""
+    expired = Order.objects.filter(
+        reservation_expires_at__lt=now or timezone.now(), is_payment_verified=False,
+    ).values_list('pk', flat=True)
+    return sum(release(order_id) for order_id in list(expired))
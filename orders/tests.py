@@ -1,3 +1,405 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from datetime import datetime, timedelta
+
+from django.contrib.sessions.models import Session
+from django.db import IntegrityError, OperationalError, connection
+from django.http import StreamingHttpResponse
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from accounts.models import User
+from products.models import Product
+from products.query_plans import plan_problems
+
+from .checkout import CheckoutError, place_order
+from .models import Cart, CartItem, Order, OrderItem
+from .pricing import price_cart, shipping_zone
+from .stock import OutOfStock, reserve
+
+
+def create_products(seller, count, stock=10):
+    return Product.objects.bulk_create([
+        Product(seller=seller, name=f'Produit {i}', slug=f'produit-{i}', description='-',
+                price=Decimal(1000 + i), stock_quantity=stock, sku=f'SKU-{i}')
+        for i in range(count)
+    ])
+
+
+class CartSyncTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create(username='vendeur', is_seller=True)
+        cls.products = create_products(cls.seller, 3)
+
+    def _sync(self, body):
+        return self.client.post('/api/cart/sync/', json.dumps(body), content_type='application/json')
+
+    def test_empty_sync_creates_no_cart(self):
+        """Visiteur de passage au panier vide : ni session ni panier en base"""
+        for _ in range(2):
+            response = self._sync({'version': None, 'changes': [], 'removed': []})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['items'], [])
+            self.client.cookies.clear()
+        self.assertFalse(Cart.objects.exists())
+        self.assertFalse(Session.objects.exists())
+
+    def test_only_changed_lines_are_sent(self):
+        first = self._sync({'version': None, 'changes': [{'id': p.pk, 'quantity': 1} for p in self.products]})
+        self.assertEqual(len(first.json()['items']), 3)
+
+        second = self._sync({'version': first.json()['version'], 'changes': [{'id': self.products[0].pk, 'quantity': 4}],
+                             'removed': [self.products[1].pk]}).json()
+        self.assertNotIn('items', second)
+        cart = Cart.objects.get()
+        self.assertEqual(dict(cart.items.values_list('product_id', 'quantity')),
+                         {self.products[0].pk: 4, self.products[2].pk: 1})
+        self.assertEqual(second['version'], f'{cart.pk}.2')
+
+    def test_version_of_another_cart_asks_for_resync(self):
+        response = self._sync({'version': '999.3', 'changes': [{'id': self.products[0].pk, 'quantity': 1}]})
+        self.assertEqual(response.status_code, 409)
+        self.assertTrue(response.json()['resync'])
+
+    def test_concurrent_write_is_a_conflict(self):
+        with mock.patch('orders.views.sync_cart', side_effect=IntegrityError('duplicate key orders_cartitem')):
+            response = self._sync({'changes': [{'id': self.products[0].pk, 'quantity': 1}]})
+        self.assertEqual(response.status_code, 409)
+        self.assertNotIn('orders_cartitem', response.json()['error'])
+
+    def test_malformed_body_hides_exception_text(self):
+        response = self.client.post('/api/cart/sync/', '{"changes": ', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], 'Requête invalide')
+
+
+class CartValidateTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create(username='vendeur', is_seller=True)
+        cls.products = create_products(cls.seller, 3, stock=2)
+
+    def _validate(self, body):
+        return self.client.post('/api/cart/validate/', json.dumps(body), content_type='application/json')
+
+    def test_unavailable_product(self):
+        Product.objects.filter(pk=self.products[1].pk).update(is_active=False)
+        result = self._validate({'items': [{'id': self.products[0].pk, 'quantity': 1},
+                                           {'id': self.products[1].pk, 'quantity': 1},
+                                           {'id': 999999, 'quantity': 1}]}).json()
+        self.assertFalse(result['valid'])
+        self.assertEqual(sorted(result['unavailable']), sorted([self.products[1].pk, 999999]))
+        lines = {line['id']: line for line in result['lines']}
+        self.assertTrue(lines[self.products[0].pk]['available'])
+        self.assertFalse(lines[self.products[1].pk]['available'])
+        self.assertFalse(lines[999999]['is_active'])
+
+    def test_short_stock(self):
+        result = self._validate({'items': [{'id': self.products[0].pk, 'quantity': 3}]}).json()
+        self.assertFalse(result['valid'])
+        line = result['lines'][0]
+        self.assertFalse(line['available'])
+        self.assertEqual(line['stock_quantity'], 2)
+
+    def test_line_is_trimmed_when_version_matches(self):
+        first = self._validate({'items': [{'id': self.products[0].pk, 'quantity': 1}]}).json()['lines'][0]
+        self.assertTrue(first['changed'])
+        self.assertIn('name', first)
+
+        line = self._validate({'items': [{'id': self.products[0].pk, 'quantity': 1,
+                                          'version': first['version']}]}).json()['lines'][0]
+        self.assertFalse(line['changed'])
+        self.assertNotIn('name', line)
+        self.assertNotIn('image', line)
+        self.assertEqual(Decimal(str(line['unit_price'])), self.products[0].price)
+
+    def test_malformed_body_hides_exception_text(self):
+        for body in ('{"items": ', '[1, 2]', '{"city": "Lomé"}'):
+            with self.subTest(body=body):
+                response = self.client.post('/api/cart/validate/', body, content_type='application/json')
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json()['error'], 'Requête invalide')
+
+    def test_invalid_line_keeps_checkout_message(self):
+        response = self._validate({'items': [{'id': self.products[0].pk, 'quantity': 0}]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], 'Quantité invalide')
+
+
+class QueryPlanTests(TestCase):
+    """Les requêtes fréquentes des commandes sont servies par un index (EXPLAIN)"""
+
+    def test_order_queries_use_an_index(self):
+        # (requête, tri toléré : ensemble borné par un vendeur)
+        queries = {
+            'Commandes par statut': (Order.objects.filter(status='awaiting_payment').order_by().values('pk'), False),
+            'Paiements à vérifier': (Order.objects.filter(
+                is_payment_verified=False, payment_reference__gt='',
+            ).order_by('-created_at')[:10], False),
+            'Paiements à libérer': (Order.objects.filter(
+                is_payment_verified=True, is_delivery_confirmed=True, is_payment_released=False,
+            ).order_by().values('pk'), False),
+            "Chiffre d'affaires": (Order.objects.filter(is_payment_verified=True).order_by().values('total'), False),
+            "Chiffre d'affaires 30 jours": (Order.objects.filter(
+                is_payment_verified=True, created_at__gte=timezone.now() - timedelta(days=30),
+            ).order_by().values('total'), False),
+            'Dernières commandes': (Order.objects.order_by('-created_at')[:10], False),
+            'Mes commandes': (Order.objects.filter(user_id=1).order_by('-created_at'), False),
+            'Commandes du vendeur': (Order.for_seller(1), True),
+            'Ventes du vendeur': (OrderItem.objects.filter(seller_id=1).order_by().values('total_price'), False),
+        }
+        for name, (queryset, sort_allowed) in queries.items():
+            with self.subTest(name):
+                plan, problems = plan_problems(queryset, sort_allowed)
+                self.assertEqual(problems, [], plan)
+
+
+class StockReservationConcurrencyTests(TransactionTestCase):
+    """Réservations concurrentes sur un même produit : aucune survente"""
+
+    STOCK = 20
+    BUYERS = 60
+    THREADS = 8
+    MAX_RETRIES = 20
+
+    def test_no_oversell_under_concurrency(self):
+        seller = User.objects.create(username='vendeur', is_seller=True)
+        product = create_products(seller, 1, stock=self.STOCK)[0]
+        counts = {'sold': 0, 'rejected': 0, 'errors': 0}
+        lock = threading.Lock()
+
+        def buy(_):
+            try:
+                for _attempt in range(self.MAX_RETRIES):
+                    try:
+                        reserve({product.pk: 1})
+                        outcome = 'sold'
+                    except OutOfStock:
+                        outcome = 'rejected'
+                    except OperationalError:
+                        continue  # Base verrouillée (SQLite) : nouvel essai
+                    break
+                else:
+                    outcome = 'errors'
+                with lock:
+                    counts[outcome] += 1
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=self.THREADS) as pool:
+            list(pool.map(buy, range(self.BUYERS)))
+
+        final = Product.objects.values_list('stock_quantity', flat=True).get(pk=product.pk)
+        self.assertEqual(counts['errors'], 0)
+        self.assertGreaterEqual(final, 0)
+        self.assertEqual(counts['sold'], self.STOCK)
+        self.assertEqual(counts['rejected'], self.BUYERS - self.STOCK)
+        self.assertEqual(final, 0)
+
+
+class CheckoutTests(TestCase):
+    ITEMS = 20
+    CUSTOMER = {
+        'name': 'Client', 'email': '', 'phone': '90000000', 'address': 'Rue 1', 'city': 'Lomé',
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create(username='vendeur', is_seller=True)
+        cls.products = create_products(cls.seller, cls.ITEMS, stock=5)
+
+    def _confirm(self, items):
+        order_data = {'customer': self.CUSTOMER, 'payment_method': 'mobile_money', 'items': items}
+        return self.client.post('/orders/confirm-payment/', {
+            'order_data': json.dumps(order_data), 'payment_reference': 'REF-1',
+        })
+
+    def test_order_creation_query_count(self):
+        """Tarification, réservation, commande et lignes en lots : nombre de requêtes fixe"""
+        quantities = {product.pk: 1 for product in self.products}
+        with self.assertNumQueries(25):
+            order = place_order(price_cart(quantities, 'Lomé'), guest_name='Client', guest_phone='90000000',
+                                shipping_address='Rue 1', shipping_city='Lomé', payment_method='mobile_money',
+                                payment_reference='REF-1')
+        self.assertEqual(order.items.count(), self.ITEMS)
+
+    def test_checkout_creates_order_with_server_prices(self):
+        response = self._confirm([{'id': p.pk, 'quantity': 2, 'price': 1} for p in self.products[:2]])
+        self.assertEqual(response.status_code, 200)
+        order = Order.objects.get(order_number=response.json()['order_number'])
+        self.assertEqual(order.subtotal, 2 * (self.products[0].price + self.products[1].price))
+        self.assertEqual(Product.objects.get(pk=self.products[0].pk).stock_quantity, 3)
+
+    def test_out_of_stock_is_a_conflict(self):
+        response = self._confirm([{'id': self.products[0].pk, 'quantity': 1},
+                                  {'id': self.products[1].pk, 'quantity': 6}])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['product_id'], self.products[1].pk)
+        # Rien n'est écrit : ni commande ni stock réservé
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(Product.objects.get(pk=self.products[0].pk).stock_quantity, 5)
+
+    def test_unknown_product_is_a_bad_request(self):
+        response = self._confirm([{'id': self.products[0].pk, 'quantity': 1}, {'id': 999999, 'quantity': 1}])
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+    def test_malformed_order_hides_exception_text(self):
+        response = self.client.post('/orders/confirm-payment/', {
+            'order_data': json.dumps({'customer': [], 'items': []}), 'payment_reference': 'REF-1',
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], 'Requête invalide')
+
+    def test_unexpected_error_hides_exception_text(self):
+        with mock.patch('orders.views.place_order', side_effect=RuntimeError('relation orders_order')), \
+                self.assertLogs('orders.views', 'ERROR'):
+            response = self._confirm([{'id': self.products[0].pk, 'quantity': 1}])
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn('orders_order', response.json()['error'])
+
+    def test_unknown_product_raises_checkout_error(self):
+        with self.assertRaises(CheckoutError):
+            place_order(price_cart({999999: 1}), guest_name='Client')
+
+
+class ShippingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seller = User.objects.create(username='vendeur', is_seller=True)
+        cls.product = create_products(seller, 1)[0]
+
+    def test_flat_rate_by_default(self):
+        """Tarif unique de 2000 XOF tant que les tarifs par zone ne sont pas configurés"""
+        for city, country in [('Lomé', 'Togo'), ('Kara', 'Togo'), ('Paris', 'France')]:
+            with self.subTest(city=city):
+                quote = price_cart({self.product.pk: 1}, city, country)
+                self.assertEqual(quote.shipping_cost, Decimal('2000'))
+                self.assertEqual(quote.total, self.product.price + 2000)
+
+    @override_settings(SHIPPING_RATES={'grand_lome': 2000, 'togo': 3500, 'international': 10000})
+    def test_configured_zone_rates(self):
+        self.assertEqual(shipping_zone('agoe-nyive'), 'grand_lome')
+        self.assertEqual(price_cart({self.product.pk: 1}, 'Kara').shipping_cost, Decimal('3500'))
+        self.assertEqual(price_cart({self.product.pk: 1}, 'Paris', 'France').shipping_cost, Decimal('10000'))
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(username='admin', is_staff=True)
+        cls.seller = User.objects.create(username='vendeur', is_seller=True)
+        cls.other = User.objects.create(username='autre', is_seller=True)
+        cls.mine = Product.objects.create(seller=cls.seller, name='=HYPERLINK("http://x")', slug='mine',
+                                          description='-', price=1000, stock_quantity=1, sku='SKU-MINE')
+        cls.theirs = Product.objects.create(seller=cls.other, name='Produit autre', slug='theirs',
+                                            description='-', price=1000, stock_quantity=1, sku='SKU-THEIRS')
+        tz = timezone.get_current_timezone()
+        for day, product in [(1, cls.mine), (10, cls.mine), (10, cls.theirs), (20, cls.mine)]:
+            order = Order.objects.create(guest_name='Client', shipping_address='-', shipping_city='Lomé',
+                                         subtotal=1000, total=3000)
+            item = OrderItem.objects.create(order=order, product=product, product_name=product.name,
+                                            product_price=1000, quantity=1, total_price=1000,
+                                            seller=product.seller)
+            created = datetime(2026, 3, day, 12, tzinfo=tz)
+            Order.objects.filter(pk=order.pk).update(created_at=created)
+            OrderItem.objects.filter(pk=item.pk).update(created_at=created)
+
+    def _rows(self, dataset, **params):
+        response = self.client.get(f'/orders/export/{dataset}/', params)
+        self.assertEqual(response.status_code, 200)
+        body = b''.join(response.streaming_content).decode()
+        self.assertTrue(body.startswith('\ufeff'))
+        return list(csv.DictReader(io.StringIO(body[1:])))
+
+    def test_anonymous_user_is_redirected(self):
+        response = self.client.get('/orders/export/sales/')
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('login', response['Location'])
+
+    def test_seller_gets_only_own_rows(self):
+        self.client.force_login(self.seller)
+        self.assertEqual([row['sku'] for row in self._rows('products')], ['SKU-MINE'])
+        sales = self._rows('sales')
+        self.assertEqual(len(sales), 3)
+        self.assertEqual({row['seller'] for row in sales}, {'vendeur'})
+
+    def test_seller_cannot_export_orders(self):
+        self.client.force_login(self.seller)
+        response = self.client.get('/orders/export/orders/')
+        self.assertEqual(response.status_code, 302)
+        self.assertNotIsInstance(response, StreamingHttpResponse)
+
+    def test_admin_gets_everything(self):
+        self.client.force_login(self.admin)
+        self.assertEqual(len(self._rows('products')), 2)
+        self.assertEqual(len(self._rows('orders')), 4)
+        self.assertEqual(len(self._rows('sales')), 4)
+
+    def test_dates_filter_created_at(self):
+        self.client.force_login(self.admin)
+        self.assertEqual(len(self._rows('orders', start='2026-03-10', end='2026-03-10')), 2)
+        self.assertEqual(len(self._rows('sales', start='2026-03-05')), 3)
+        self.assertEqual(len(self._rows('sales', end='2026-03-09')), 1)
+        # Date invalide : ignorée
+        self.assertEqual(len(self._rows('sales', start='2026-13-45')), 4)
+
+    def test_csv_formulas_are_neutralised(self):
+        self.client.force_login(self.seller)
+        self.assertEqual(self._rows('products')[0]['name'], "'=HYPERLINK(\"http://x\")")
+        for value in ('+33', '-1', '@SUM(A1)'):
+            with self.subTest(value=value):
+                Product.objects.filter(pk=self.mine.pk).update(name=value)
+                self.assertEqual(self._rows('products')[0]['name'], "'" + value)
+
+    def test_jsonl_format(self):
+        self.client.force_login(self.seller)
+        response = self.client.get('/orders/export/products/', {'format': 'jsonl'})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)['sku'] for line in lines], ['SKU-MINE'])
+
+
+class CartSummaryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create(username='vendeur', is_seller=True)
+        cls.products = create_products(cls.seller, 3)
+        # Produit en promotion : compté à son prix effectif
+        Product.objects.filter(pk=cls.products[2].pk).update(discount_price=500)
+        cls.carts = Cart.objects.bulk_create([Cart(session_key=f'session-{i}') for i in range(4)])
+        CartItem.objects.bulk_create([
+            CartItem(cart=cart, product=product, quantity=quantity)
+            for cart in cls.carts[:3]
+            for product, quantity in zip(cls.products, (1, 2, 3))
+        ])
+        cls.empty = cls.carts[3]
+        # 1 × 1000 + 2 × 1001 + 3 × 500
+        cls.total = Decimal('4502')
+
+    def test_with_summary_is_one_query(self):
+        with self.assertNumQueries(1):
+            summaries = [cart.summary() for cart in Cart.objects.with_summary().order_by('pk')]
+        self.assertEqual(summaries[:3], [{'items_count': 6, 'items_total': self.total}] * 3)
+        self.assertEqual(summaries[3], {'items_count': 0, 'items_total': Decimal('0')})
+
+    def test_with_items_is_two_queries(self):
+        with self.assertNumQueries(2):
+            carts = list(Cart.objects.with_items().order_by('pk'))
+            summaries = [(cart.get_items_count(), cart.get_total()) for cart in carts]
+        self.assertEqual(summaries, [(6, self.total)] * 3 + [(0, Decimal('0'))])
+
+    def test_single_cart_is_one_aggregate(self):
+        cart = Cart.objects.get(pk=self.carts[0].pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(cart.summary(), {'items_count': 6, 'items_total': self.total})
+
+    def test_empty_cart(self):
+        cart = Cart.objects.get(pk=self.empty.pk)
+        self.assertEqual((cart.get_items_count(), cart.get_total()), (0, Decimal('0')))
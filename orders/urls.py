@@ -13,4 +13,5 @@ urlpatterns = [
     path('order/<str:order_number>/', views.order_detail_view, name='order-detail'),
     path('confirm-delivery/<str:order_number>/', views.confirm_delivery_view, name='confirm-delivery'),
     path('seller-orders/', views.seller_orders_view, name='seller-orders'),  # ← CETTE LIGNE
+    path('export/<str:dataset>/', views.export_view, name='export'),
 ]
\ No newline at end of file
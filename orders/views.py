@@ -1,13 +1,24 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.db import IntegrityError
+from django.utils.dateparse import parse_date
 from django.views.decorators.http import require_POST
 from django.utils import timezone
 import json
-from .models import Order, OrderItem
+import logging
+from .models import Order
+from .cart import validate_cart
+from .cart_sync import StaleCart, get_cart, sync_cart
+from .checkout import CheckoutError, cart_quantities, place_order
+from .pricing import DEFAULT_COUNTRY, price_cart
+from .stock import OutOfStock
+from .exports import DATASETS, FORMATS, SELLER_DATASETS, export_queryset, stream_export
 from products.models import Product
-from accounts.emails import send_order_confirmation, send_delivery_confirmed_to_seller
+from accounts.emails import send_delivery_confirmed_to_seller
+
+logger = logging.getLogger(__name__)
 
 def cart_view(request):
     """
@@ -15,6 +26,51 @@ def cart_view(request):
     """
     return render(request, 'orders/cart.html')
 
+@require_POST
+def cart_validate_api_view(request):
+    """
+    Revalide le panier localStorage en une requête : prix, stock, statut et
+    image de chaque ligne, montants faisant foi (livraison selon la ville)
+    """
+    try:
+        data = json.loads(request.body)
+        result = validate_cart(data['items'], data.get('city', ''), data.get('country') or DEFAULT_COUNTRY)
+    except CheckoutError as e:
+        return JsonResponse({'valid': False, 'error': str(e)}, status=400)
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return JsonResponse({'valid': False, 'error': 'Requête invalide'}, status=400)
+    return JsonResponse(result, json_dumps_params={'ensure_ascii': False, 'separators': (',', ':')})
+
+@require_POST
+def cart_sync_api_view(request):
+    """
+    Recopie sur le serveur les lignes du panier localStorage modifiées depuis
+    la dernière synchronisation (panier de l'utilisateur ou de la session)
+    """
+    try:
+        data = json.loads(request.body)
+        # {"cart": [...]} : ancien format, tout le panier sans version
+        changes = data.get('changes', data.get('cart', [])) or []
+        removed = data.get('removed') or []
+        # Rien à écrire : pas de session ni de panier créés pour un visiteur de passage
+        cart = get_cart(request, create=bool(changes or removed))
+        if cart is None:
+            if data.get('version') is not None:
+                raise StaleCart('Panier introuvable')
+            result = {'success': True, 'version': None, 'rejected': [], 'items': []}
+        else:
+            result = sync_cart(cart, data.get('version'), changes, removed)
+    except StaleCart:
+        return JsonResponse({'success': False, 'resync': True, 'error': 'Panier à resynchroniser'}, status=409)
+    except IntegrityError:
+        # Synchronisation concurrente (autre onglet, connexion) : le client réessaiera
+        return JsonResponse({'success': False, 'error': 'Panier modifié en même temps, réessayez'}, status=409)
+    except CheckoutError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return JsonResponse({'success': False, 'error': 'Requête invalide'}, status=400)
+    return JsonResponse(result, json_dumps_params={'ensure_ascii': False, 'separators': (',', ':')})
+
 def checkout_view(request):
     """
     Vue de la page de checkout
@@ -39,55 +95,51 @@ def confirm_payment_view(request):
         payment_proof = request.FILES.get('payment_proof')
         
         customer = order_data['customer']
-        items = order_data['items']
-        payment_method = order_data['payment_method']
-        
-        # Créer la commande
-        order = Order.objects.create(
+        country = customer.get('country') or DEFAULT_COUNTRY
+
+        # Montants recalculés par le serveur (ceux du navigateur sont ignorés)
+        quote = price_cart(cart_quantities(order_data['items']), customer['city'], country)
+        order = place_order(
+            quote,
             user=request.user if request.user.is_authenticated else None,
             guest_name=customer['name'],
             guest_email=customer['email'],
             guest_phone=customer['phone'],
             shipping_address=customer['address'],
             shipping_city=customer['city'],
-            subtotal=order_data['subtotal'],
-            shipping_cost=order_data['shipping'],
-            total=order_data['total'],
-            payment_method=payment_method,
+            shipping_country=country,
+            payment_method=order_data['payment_method'],
             payment_reference=payment_reference,
             payment_proof=payment_proof,
             customer_notes=order_data.get('notes', ''),
-            status='awaiting_payment'
         )
         
-        # Ajouter les articles
-        for item in items:
-            try:
-                product = Product.objects.get(id=item['id'])
-                OrderItem.objects.create(
-                    order=order,
-                    product=product,
-                    product_name=product.name,
-                    product_price=product.get_price(),
-                    quantity=item['quantity'],
-                    seller=product.seller
-                )
-            except Product.DoesNotExist:
-                pass
-        
-        # Envoyer email de confirmation
-        send_order_confirmation(order)
-        
         return JsonResponse({
             'success': True,
             'order_number': order.order_number,
+            'total': order.total,
             'message': 'Commande créée avec succès'
         })
         
-    except Exception as e:
+    except OutOfStock as e:
+        product = Product.objects.filter(pk=e.product_id).values_list('name', flat=True).first()
+        return JsonResponse({
+            'success': False,
+            'error': f"Stock insuffisant pour « {product or 'un produit'} ». Mettez à jour votre panier.",
+            'product_id': e.product_id,
+        }, status=409)
+
+    except CheckoutError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return JsonResponse({'success': False, 'error': 'Requête invalide'}, status=400)
+
+    except Exception:
+        logger.exception('Échec de la création de commande')
         return JsonResponse({
             'success': False,
-            'error': str(e)
+            'error': 'Commande impossible pour le moment, réessayez'
         }, status=400)
 
 def order_success_view(request, order_number):
@@ -148,9 +200,40 @@ def seller_orders_view(request):
         messages.error(request, 'Vous devez être vendeur pour accéder à cette page.')
         return redirect('accounts:dashboard')
     
-    # Récupérer toutes les commandes contenant des produits du vendeur
-    orders = Order.objects.filter(
-        items__seller=request.user
-    ).distinct().order_by('-created_at')
+    orders = Order.for_seller(request.user)
     
-    return render(request, 'orders/seller_orders.html', {'orders': orders})
\ No newline at end of file
+    return render(request, 'orders/seller_orders.html', {'orders': orders})
+
+
+@login_required
+def export_view(request, dataset):
+    """
+    Export en flux (CSV ou JSONL) : ?format=csv|jsonl&start=AAAA-MM-JJ&end=AAAA-MM-JJ
+    Admin : toutes les données ; vendeur : ses produits et ses ventes
+    """
+    if dataset not in DATASETS:
+        raise Http404
+    if request.user.is_staff:
+        seller = None
+    elif request.user.is_seller and dataset in SELLER_DATASETS:
+        seller = request.user
+    else:
+        messages.error(request, "Vous n'avez pas accès à cet export.")
+        return redirect('accounts:dashboard')
+
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in FORMATS:
+        fmt = 'csv'
+    try:
+        start = parse_date(request.GET.get('start', ''))
+        end = parse_date(request.GET.get('end', ''))
+    except ValueError:
+        start = end = None
+
+    queryset = export_queryset(dataset, seller=seller, start=start, end=end)
+    response = StreamingHttpResponse(stream_export(dataset, queryset, fmt), content_type=FORMATS[fmt])
+    filename = f"mykanty-{dataset}-{timezone.localdate():%Y%m%d}.{fmt}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    # Pas de mise en tampon par nginx : le téléchargement démarre tout de suite
+    response['X-Accel-Buffering'] = 'no'
+    return response
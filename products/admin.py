@@ -1,10 +1,17 @@
-from django.contrib import admin
-from .models import Category, Product
+from django.contrib import admin, messages
+from django.core.exceptions import PermissionDenied
+from django.shortcuts import render
+from django.urls import path
+
+from .forms import ProductImportForm
+from .importer import detect_format, import_catalog, text_stream
+from . import ratings
+from .models import Category, ImageJob, Product, Review
 
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
-    list_display = ['name', 'icon', 'is_active']
+    list_display = ['name', 'icon', 'active_product_count', 'is_active']
     list_filter = ['is_active']
     search_fields = ['name']
     prepopulated_fields = {'slug': ('name',)}
@@ -35,4 +42,78 @@ class ProductAdmin(admin.ModelAdmin):
             'fields': ('created_at', 'updated_at'),
             'classes': ('collapse',)
         }),
-    )
\ No newline at end of file
+    )
+
+    def get_urls(self):
+        urls = [
+            path('import/', self.admin_site.admin_view(self.import_view), name='products_product_import'),
+        ]
+        return urls + super().get_urls()
+
+    def import_view(self, request):
+        """Import CSV/JSONL depuis l'admin (même moteur que la commande)"""
+        if not self.has_add_permission(request) or not self.has_change_permission(request):
+            raise PermissionDenied
+
+        report = None
+        if request.method == 'POST':
+            form = ProductImportForm(request.POST, request.FILES)
+            if form.is_valid():
+                upload = form.cleaned_data['file']
+                report = import_catalog(
+                    text_stream(upload.file), detect_format(upload.name),
+                    default_seller=form.cleaned_data['seller'],
+                    dry_run=form.cleaned_data['dry_run'],
+                )
+                level = messages.WARNING if report.error_count else messages.SUCCESS
+                self.message_user(request, (
+                    f"{report.rows} lignes lues en {report.elapsed:.2f} s : "
+                    f"{report.created} créés, {report.updated} mis à jour, {report.error_count} erreurs"
+                    f"{' (simulation, rien enregistré)' if report.dry_run else ''}"
+                ), level)
+        else:
+            form = ProductImportForm()
+
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Importer des produits',
+            'form': form,
+            'report': report,
+        }
+        return render(request, 'admin/products/product/import.html', context)
+
+
+@admin.register(Review)
+class ReviewAdmin(admin.ModelAdmin):
+    list_display = ['product', 'user', 'guest_name', 'rating', 'is_verified_purchase', 'is_approved', 'created_at']
+    list_filter = ['is_approved', 'rating', 'is_verified_purchase']
+    search_fields = ['product__name', 'user__username', 'guest_name', 'comment']
+    list_editable = ['is_approved']
+    list_select_related = ['product', 'user']
+    raw_id_fields = ['product', 'user']
+    actions = ['approve_reviews', 'reject_reviews']
+
+    def _set_approved(self, request, queryset, approved):
+        # update() ne déclenche pas les signaux : on recalcule les notes ici
+        product_ids = set(queryset.values_list('product_id', flat=True))
+        updated = queryset.update(is_approved=approved)
+        ratings.refresh_ratings(product_ids)
+        return updated
+
+    @admin.action(description='Approuver les avis sélectionnés')
+    def approve_reviews(self, request, queryset):
+        updated = self._set_approved(request, queryset, True)
+        self.message_user(request, f"{updated} avis approuvés", messages.SUCCESS)
+
+    @admin.action(description='Retirer les avis sélectionnés')
+    def reject_reviews(self, request, queryset):
+        updated = self._set_approved(request, queryset, False)
+        self.message_user(request, f"{updated} avis retirés", messages.SUCCESS)
+
+
+@admin.register(ImageJob)
+class ImageJobAdmin(admin.ModelAdmin):
+    list_display = ['kind', 'object_id', 'status', 'attempts', 'run_after', 'finished_at']
+    list_filter = ['status', 'kind']
+    readonly_fields = ['kind', 'object_id', 'attempts', 'last_error', 'started_at', 'finished_at', 'created_at']
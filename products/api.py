@@ -0,0 +1,217 @@
+"""
+API JSON du catalogue en lecture seule (v1), pour la PWA et les scripts du panier
+
+    GET /api/v1/products/?fields=id,name,effective_price,image&category=3&sort=price_asc
+    GET /api/v1/products/?ids=12,7,31
+    GET /api/v1/categories/
+    GET /api/v1/sellers/?fields=username,business_name&cursor=...
+
+Chaque champ public correspond à une ou plusieurs colonnes lues par une
+projection values() : aucune instance de modèle n'est construite et seules
+les colonnes des champs demandés (plus la clé du curseur) sont lues.
+
+- `fields` : champs retournés (DEFAULT_FIELDS de la ressource sinon) ;
+- `ids` : au plus MAX_IDS objets, dans l'ordre demandé (les absents sont omis) ;
+- sinon pagination par curseur (products/pagination.py), `limit` objets par
+  page : {"results": [...], "next": "<curseur ou null>"}.
+
+Paramètre invalide : 400 {"error": "..."}.
+"""
+
+from operator import itemgetter
+
+from django.core.files.storage import default_storage
+from django.http import JsonResponse
+from django.urls import reverse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import require_GET
+
+from accounts.models import User
+
+from .images import current_sizes
+from .models import Category, Product
+from .pagination import PAGE_SIZE, InvalidCursor, paginate
+
+MAX_LIMIT = 100
+MAX_IDS = 100
+# Données publiques, identiques pour tous : cache navigateur / service worker
+API_MAX_AGE = 60
+JSON_PARAMS = {'ensure_ascii': False, 'separators': (',', ':')}
+
+
+class ApiError(ValueError):
+    pass
+
+
+def _media_url(name):
+    return default_storage.url(name) if name else None
+
+
+def product_image_url(row):
+    """
+    URL de la déclinaison JPEG « card » de l'image actuelle si elle existe,
+    sinon de l'image d'origine (ligne values() avec main_image et image_variants)
+    """
+    card = (current_sizes(row['image_variants'], row['main_image']) or {}).get('card')
+    return _media_url(card['jpeg'] if card and 'jpeg' in card else row['main_image'])
+
+
+# Champ public -> colonne, ou (colonnes, fonction(ligne))
+PRODUCT_FIELDS = {
+    'id': 'id',
+    'name': 'name',
+    'slug': 'slug',
+    'description': 'description',
+    'price': 'price',
+    'discount_price': 'discount_price',
+    'effective_price': 'effective_price',
+    'discount_percentage': 'discount_percentage',
+    'stock_quantity': 'stock_quantity',
+    'in_stock': (('stock_quantity',), lambda row: row['stock_quantity'] > 0),
+    'condition': 'condition',
+    'brand': 'brand',
+    'sku': 'sku',
+    'category': 'category_id',
+    'category_name': 'category__name',
+    'seller': 'seller_id',
+    'seller_username': 'seller__username',
+    'rating_avg': 'rating_avg',
+    'rating_count': 'rating_count',
+    'image': (('main_image', 'image_variants'), product_image_url),
+    'url': (('id',), lambda row: reverse('products:product-detail', args=[row['id']])),
+    'created_at': 'created_at',
+    'updated_at': 'updated_at',
+}
+CATEGORY_FIELDS = {
+    'id': 'id',
+    'name': 'name',
+    'slug': 'slug',
+    'description': 'description',
+    'icon': 'icon',
+    'image': (('image',), lambda row: _media_url(row['image'])),
+    'product_count': 'active_product_count',
+    'url': (('id',), lambda row: f"{reverse('products:product-list')}?category={row['id']}"),
+}
+SELLER_FIELDS = {
+    'id': 'id',
+    'username': 'username',
+    'name': (('first_name', 'last_name'), lambda row: f"{row['first_name']} {row['last_name']}".strip()),
+    'business_name': 'seller_profile__business_name',
+    'is_verified': 'seller_profile__is_verified',
+    'rating': 'seller_profile__rating',
+    'date_joined': 'date_joined',
+    'url': (('username',), lambda row: reverse('accounts:seller-profile', args=[row['username']])),
+}
+
+
+class Resource:
+    def __init__(self, queryset, fields, default_fields, sorts, default_sort, filters=None):
+        self.queryset = queryset  # callable : un queryset neuf par requête
+        self.fields = {
+            name: spec if isinstance(spec, tuple) else ((spec,), itemgetter(spec))
+            for name, spec in fields.items()
+        }
+        self.default_fields = default_fields
+        self.sorts = sorts
+        self.default_sort = default_sort
+        self.filters = filters or {}  # paramètre -> lookup (entier)
+
+    def _fields(self, param):
+        names = [name.strip() for name in param.split(',') if name.strip()] if param else self.default_fields
+        unknown = [name for name in names if name not in self.fields]
+        if unknown:
+            raise ApiError(f"Champs inconnus : {', '.join(unknown)} (disponibles : {', '.join(self.fields)})")
+        return list(dict.fromkeys(names))
+
+    def respond(self, params):
+        fields = self._fields(params.get('fields'))
+        columns = [column for name in fields for column in self.fields[name][0]]
+
+        queryset = self.queryset()
+        for param, lookup in self.filters.items():
+            if params.get(param):
+                queryset = queryset.filter(**{lookup: _integer(params[param], param)})
+
+        if 'ids' in params:
+            ids = [_integer(value, 'ids') for value in params['ids'].split(',') if value.strip()]
+            if len(ids) > MAX_IDS:
+                raise ApiError(f"Au plus {MAX_IDS} identifiants")
+            rows = {row['id']: row for row in queryset.filter(pk__in=ids).values(*dict.fromkeys(columns + ['id']))}
+            return {'results': [self._render(rows[pk], fields) for pk in dict.fromkeys(ids) if pk in rows]}
+
+        sort = params.get('sort', self.default_sort)
+        if sort not in self.sorts:
+            raise ApiError(f"Tri inconnu : {sort} (disponibles : {', '.join(self.sorts)})")
+        keys = self.sorts[sort]
+        limit = min(max(_integer(params.get('limit', PAGE_SIZE), 'limit'), 1), MAX_LIMIT)
+        projection = queryset.values(*dict.fromkeys(columns + [key.lstrip('-') for key in keys]))
+        try:
+            page = paginate(projection, keys, params.get('cursor'), page_size=limit)
+        except InvalidCursor:
+            raise ApiError("Curseur invalide")
+        return {'results': [self._render(row, fields) for row in page], 'next': page.next_cursor}
+
+    def _render(self, row, fields):
+        return {name: self.fields[name][1](row) for name in fields}
+
+
+def _integer(value, param):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ApiError(f"Paramètre {param} invalide : {value!r}")
+
+
+PRODUCTS = Resource(
+    lambda: Product.objects.filter(is_active=True),
+    PRODUCT_FIELDS,
+    default_fields=['id', 'name', 'effective_price', 'price', 'discount_percentage', 'in_stock',
+                    'category', 'seller', 'rating_avg', 'rating_count', 'image', 'url'],
+    sorts={
+        'newest': ('-created_at', '-id'),
+        'price_asc': ('effective_price', 'id'),
+        'price_desc': ('-effective_price', '-id'),
+    },
+    default_sort='newest',
+    filters={'category': 'category_id', 'seller': 'seller_id'},
+)
+CATEGORIES = Resource(
+    lambda: Category.objects.filter(is_active=True),
+    CATEGORY_FIELDS,
+    default_fields=['id', 'name', 'slug', 'icon', 'product_count', 'url'],
+    sorts={'name': ('name', 'id'), 'id': ('id',)},
+    default_sort='name',
+)
+SELLERS = Resource(
+    lambda: User.objects.filter(is_seller=True, is_active=True),
+    SELLER_FIELDS,
+    default_fields=['id', 'username', 'business_name', 'is_verified', 'rating', 'url'],
+    sorts={'id': ('id',), 'newest': ('-date_joined', '-id')},
+    default_sort='id',
+)
+
+
+def _respond(request, resource):
+    try:
+        data = resource.respond(request.GET)
+    except ApiError as error:
+        return JsonResponse({'error': str(error)}, status=400, json_dumps_params=JSON_PARAMS)
+    return JsonResponse(data, json_dumps_params=JSON_PARAMS)
+
+
+@require_GET
+@cache_control(public=True, max_age=API_MAX_AGE)
+def products_api_view(request):
+    return _respond(request, PRODUCTS)
+
+
+@require_GET
+@cache_control(public=True, max_age=API_MAX_AGE)
+def categories_api_view(request):
+    return _respond(request, CATEGORIES)
+
+
+@require_GET
+@cache_control(public=True, max_age=API_MAX_AGE)
+def sellers_api_view(request):
+    return _respond(request, SELLERS)
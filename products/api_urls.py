@@ -0,0 +1,10 @@
+from django.urls import path
+from . import api
+
+app_name = 'api-v1'
+
+urlpatterns = [
+    path('products/', api.products_api_view, name='products'),
+    path('categories/', api.categories_api_view, name='categories'),
+    path('sellers/', api.sellers_api_view, name='sellers'),
+]
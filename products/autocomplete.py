@@ -0,0 +1,251 @@
+"""
+Index de suggestions en mémoire pour la recherche instantanée
+
+Chaque processus garde un index préfixe + trigrammes des produits actifs,
+des catégories et des marques. Il est construit au premier appel, mis à
+jour par les signaux (save/delete) dans le processus courant, et vérifié
+toutes les INDEX_TTL secondes avec une requête d'agrégat pour rattraper
+les modifications faites par les autres workers.
+"""
+
+import heapq
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import Count, Max
+
+from .search import fold, TOKEN_RE
+
+INDEX_TTL = 30
+MAX_PREFIX = 12
+MIN_FUZZY_LENGTH = 4
+MIN_SHARED_TRIGRAMS = 0.25
+
+# Bonus par type : un produit exact passe avant une marque ou une catégorie
+KIND_BONUS = {'category': 0.3, 'brand': 0.2, 'product': 0.0}
+
+
+def words(text):
+    return TOKEN_RE.findall(fold(text))
+
+
+def trigrams(word):
+    padded = f'  {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def max_typos(token):
+    return 1 if len(token) < 8 else 2
+
+
+def typo_distance(a, b):
+    """Distance d'édition avec transpositions (Damerau restreinte)"""
+    previous2, previous = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+class SuggestionIndex:
+    """
+    Entrées : clé -> (type, données, mots normalisés). Les clés sont
+    ('product', id), ('category', id) et ('brand', marque normalisée).
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.signature = None
+        self.checked_at = 0
+        self._reset()
+
+    def _reset(self):
+        self.entries = {}
+        self.prefixes = defaultdict(set)
+        self.trigrams = defaultdict(set)
+        self.brand_counts = defaultdict(int)
+        self.product_brands = {}
+
+    # ── Construction ──
+
+    def build(self):
+        from .models import Category, Product
+
+        with self.lock:
+            self._reset()
+            products = Product.objects.filter(is_active=True).values_list(
+                'id', 'name', 'brand', 'price', 'discount_price', 'main_image'
+            )
+            for row in products.iterator(chunk_size=2000):
+                self._add_product(*row)
+            for pk, name in Category.objects.filter(is_active=True).values_list('id', 'name'):
+                self._add('category', pk, name, {'id': pk, 'name': name})
+            self.signature = self._current_signature()
+            self.checked_at = time.monotonic()
+
+    def _current_signature(self):
+        from .models import Category, Product
+
+        products = Product.objects.aggregate(n=Count('id'), last=Max('updated_at'))
+        categories = Category.objects.aggregate(n=Count('id'), last=Max('updated_at'))
+        return (products['n'], products['last'], categories['n'], categories['last'])
+
+    def ensure_fresh(self):
+        """Construit l'index au premier appel, puis le revalide toutes les INDEX_TTL s"""
+        if self.signature is None:
+            self.build()
+        elif time.monotonic() - self.checked_at > INDEX_TTL:
+            self.checked_at = time.monotonic()
+            if self._current_signature() != self.signature:
+                self.build()
+
+    # ── Mises à jour incrémentales ──
+
+    def _add(self, kind, pk, label, data):
+        key = (kind, pk)
+        label_words = tuple(words(label))
+        self.entries[key] = (kind, data, label_words)
+        for word in label_words:
+            for i in range(1, min(len(word), MAX_PREFIX) + 1):
+                self.prefixes[word[:i]].add(key)
+            for gram in trigrams(word):
+                self.trigrams[gram].add(key)
+
+    def _remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        for word in entry[2]:
+            for i in range(1, min(len(word), MAX_PREFIX) + 1):
+                self.prefixes[word[:i]].discard(key)
+            for gram in trigrams(word):
+                self.trigrams[gram].discard(key)
+
+    def _add_product(self, pk, name, brand, price, discount_price, image):
+        self._add('product', pk, name, {
+            'id': pk,
+            'name': name,
+            'price': float(discount_price or price),
+            'image': f'{settings.MEDIA_URL}{image}' if image else '',
+        })
+        brand = (brand or '').strip()
+        if brand:
+            self.product_brands[pk] = brand
+            folded = fold(brand)
+            self.brand_counts[folded] += 1
+            if self.brand_counts[folded] == 1:
+                self._add('brand', folded, brand, {'name': brand})
+
+    def _remove_product(self, pk):
+        self._remove(('product', pk))
+        brand = self.product_brands.pop(pk, None)
+        if brand:
+            folded = fold(brand)
+            self.brand_counts[folded] -= 1
+            if self.brand_counts[folded] <= 0:
+                del self.brand_counts[folded]
+                self._remove(('brand', folded))
+
+    def update_product(self, product):
+        if self.signature is None:
+            return
+        with self.lock:
+            self._remove_product(product.pk)
+            if product.is_active:
+                self._add_product(
+                    product.pk, product.name, product.brand, product.price,
+                    product.discount_price, product.main_image.name if product.main_image else '',
+                )
+
+    def remove_product(self, pk):
+        if self.signature is None:
+            return
+        with self.lock:
+            self._remove_product(pk)
+
+    def update_category(self, category):
+        if self.signature is None:
+            return
+        with self.lock:
+            self._remove(('category', category.pk))
+            if category.is_active:
+                self._add('category', category.pk, category.name,
+                          {'id': category.pk, 'name': category.name})
+
+    def remove_category(self, pk):
+        if self.signature is None:
+            return
+        with self.lock:
+            self._remove(('category', pk))
+
+    # ── Recherche ──
+
+    def _candidates(self, token):
+        """Clés qui contiennent un mot commençant par `token`, sinon proches (fautes de frappe)"""
+        exact = self.prefixes.get(token[:MAX_PREFIX], set())
+        if len(token) > MAX_PREFIX:
+            exact = {k for k in exact if any(w.startswith(token) for w in self.entries[k][2])}
+        if exact:
+            return {key: 1.0 for key in exact}
+
+        if len(token) < MIN_FUZZY_LENGTH:
+            return {}
+
+        # Tolérance aux fautes : présélection par trigrammes communs, puis
+        # distance d'édition avec le début de chaque mot (saisie en cours)
+        grams = trigrams(token)
+        shared = defaultdict(int)
+        for gram in grams:
+            for key in self.trigrams.get(gram, ()):
+                shared[key] += 1
+        allowed = max_typos(token)
+        scores = {}
+        for key, count in shared.items():
+            if count / len(grams) < MIN_SHARED_TRIGRAMS:
+                continue
+            distance = min(
+                min(typo_distance(token, word[:len(token)]), typo_distance(token, word))
+                for word in self.entries[key][2]
+            )
+            if distance <= allowed:
+                scores[key] = 1.0 - 0.3 * distance
+        return scores
+
+    def suggest(self, query, limit=8):
+        tokens = words(query)
+        if not tokens:
+            return []
+
+        with self.lock:
+            scores = None
+            for token in tokens:
+                candidates = self._candidates(token)
+                if scores is None:
+                    scores = candidates
+                else:
+                    scores = {k: s + candidates[k] for k, s in scores.items() if k in candidates}
+                if not scores:
+                    return []
+
+            ranked = heapq.nsmallest(
+                limit,
+                scores.items(),
+                key=lambda item: (
+                    -(item[1] + KIND_BONUS[item[0][0]]),
+                    len(self.entries[item[0]][2]),
+                ),
+            )
+            return [
+                dict(type=self.entries[key][0], **self.entries[key][1])
+                for key, _ in ranked
+            ]
+
+
+suggestion_index = SuggestionIndex()
@@ -0,0 +1,68 @@
+"""
+Cache des fragments HTML des cartes produit
+
+Clé : gabarit + id du produit + updated_at. Une modification du produit
+change sa clé (l'ancienne expire seule) ; une modification de sa catégorie
+ou de son vendeur, qui ne touche pas updated_at, supprime les clés de ses
+produits (products/signals.py). Une page de liste récupère toutes ses
+cartes en un seul get_many() et ne rend que les absentes.
+"""
+
+from django.core.cache import cache
+from django.template.loader import render_to_string
+
+from .models import Product
+
+CARD_CACHE_VERSION = 3
+CARD_TIMEOUT = 24 * 3600
+
+# Gabarits de carte mis en cache (un fragment par produit et par gabarit)
+CARD_TEMPLATES = (
+    'includes/product_card.html',
+    'includes/seller_product_card.html',
+    'includes/home_product_card.html',
+)
+
+
+def card_key(template_name, product_id, updated_at):
+    stamp = updated_at.timestamp() if updated_at else 0
+    return f'product-card:{CARD_CACHE_VERSION}:{template_name}:{product_id}:{stamp}'
+
+
+def render_cards(products, template_name):
+    """Retourne le HTML des cartes de `products`, dans l'ordre"""
+    products = list(products)
+    keys = [card_key(template_name, p.pk, p.updated_at) for p in products]
+    cached = cache.get_many(keys)
+
+    missing = {}
+    fragments = []
+    for key, product in zip(keys, products):
+        html = cached.get(key)
+        if html is None:
+            html = render_to_string(template_name, {'product': product})
+            missing[key] = html
+        fragments.append(html)
+
+    if missing:
+        cache.set_many(missing, CARD_TIMEOUT)
+    return ''.join(fragments)
+
+
+def invalidate_cards(products):
+    """Supprime les fragments de (id, updated_at) donnés, pour tous les gabarits"""
+    keys = [
+        card_key(template_name, pk, updated_at)
+        for pk, updated_at in products
+        for template_name in CARD_TEMPLATES
+    ]
+    if keys:
+        cache.delete_many(keys)
+
+
+def invalidate_category_cards(category_id):
+    invalidate_cards(Product.objects.filter(category_id=category_id).values_list('id', 'updated_at'))
+
+
+def invalidate_seller_cards(seller_id):
+    invalidate_cards(Product.objects.filter(seller_id=seller_id).values_list('id', 'updated_at'))
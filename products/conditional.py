@@ -0,0 +1,126 @@
+"""
+GET conditionnel (ETag / Last-Modified) des pages catalogue
+
+Les validateurs sont calculés AVANT le rendu, à partir des dates
+updated_at de ce que la page affiche :
+
+- fiche produit : le produit, sa catégorie, son vendeur et son profil
+  (déjà chargés par select_related), les produits voisins affichés (une
+  requête) ;
+- profil vendeur : le vendeur, son profil (note, déjà chargé par
+  select_related) et (nombre, dernier updated_at) de ses produits ;
+- catalogue : la signature du catalogue (nombres et derniers updated_at des
+  produits, catégories et vendeurs), en cache CATALOG_SIGNATURE_TTL
+  secondes et effacée par les signaux à chaque enregistrement.
+
+L'ETag dépend aussi du visiteur (en-tête : utilisateur connecté, jeton CSRF
+du formulaire de déconnexion) ; il est faible car le jeton CSRF masqué
+change à chaque rendu. Pas de validation quand un message flash attend
+d'être affiché. Les réponses sont `Cache-Control: private, no-cache` : le
+navigateur garde sa copie, la revalide à chaque visite et reçoit un 304
+vide si rien n'a changé.
+"""
+
+import hashlib
+
+from django.contrib import messages
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+from accounts.models import User
+
+from .models import Category, Product, ProductNeighbor
+
+# À incrémenter quand les gabarits des pages changent : les copies déjà
+# validées par les navigateurs seraient sinon resservies
+PAGE_VERSION = 1
+CATALOG_SIGNATURE_KEY = 'catalog-signature'
+CATALOG_SIGNATURE_TTL = 30
+
+
+def _validators(request, parts, stamps):
+    """(ETag, Last-Modified) de la page, None si elle ne doit pas être validée"""
+    if request.method not in ('GET', 'HEAD') or len(messages.get_messages(request)):
+        return None
+    user = request.user
+    viewer = (user.pk, getattr(user, 'updated_at', None), request.META.get('CSRF_COOKIE', ''))
+    digest = hashlib.md5(repr((PAGE_VERSION, viewer, parts)).encode()).hexdigest()
+    stamps = [stamp for stamp in stamps if stamp]
+    return f'W/"{digest}"', max(stamps) if stamps else None
+
+
+def not_modified(request, validators):
+    """Réponse 304 (ou 412) si la copie du client est à jour, sinon None"""
+    if validators is None:
+        return None
+    etag, last_modified = validators
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified and int(last_modified.timestamp()),
+    )
+    return response and with_validators(response, validators)
+
+
+def with_validators(response, validators):
+    """Ajoute ETag, Last-Modified et Cache-Control à la réponse"""
+    if validators is not None:
+        etag, last_modified = validators
+        response.headers.setdefault('ETag', etag)
+        if last_modified:
+            response.headers.setdefault('Last-Modified', http_date(last_modified.timestamp()))
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ['Cookie'])
+    return response
+
+
+# ── Pages ──
+
+def product_page(request, product):
+    """Fiche produit ; `product` chargé avec select_related('category', 'seller__seller_profile')"""
+    seller = product.seller
+    profile = getattr(seller, 'seller_profile', None)
+    neighbors = list(ProductNeighbor.objects.filter(product=product).order_by('kind', 'rank').values_list(
+        'kind', 'rank', 'neighbor_id', 'neighbor__is_active', 'neighbor__updated_at',
+    ))
+    if not any(kind == 'similar' for kind, *_ in neighbors):
+        # Même repli que la vue : produits de la même catégorie
+        neighbors += Product.objects.filter(
+            category_id=product.category_id, is_active=True,
+        ).exclude(id=product.id).values_list('id', 'updated_at')[:4]
+    stamps = [
+        product.updated_at,
+        product.category and product.category.updated_at,
+        seller.updated_at,
+        profile and profile.updated_at,
+    ]
+    return _validators(request, (product.pk, stamps, neighbors), stamps + [row[-1] for row in neighbors])
+
+
+def seller_page(request, seller):
+    """Profil vendeur ; `seller` chargé avec select_related('seller_profile')"""
+    profile = getattr(seller, 'seller_profile', None)
+    products = seller.products.order_by().aggregate(n=Count('id'), last=Max('updated_at'))
+    stamps = [seller.updated_at, profile and profile.updated_at, products['last']]
+    return _validators(request, (seller.pk, stamps, products['n']), stamps)
+
+
+def catalog_signature():
+    signature = cache.get(CATALOG_SIGNATURE_KEY)
+    if signature is None:
+        products = Product.objects.order_by().aggregate(n=Count('id'), last=Max('updated_at'))
+        categories = Category.objects.order_by().aggregate(n=Count('id'), last=Max('updated_at'))
+        sellers = User.objects.filter(is_seller=True).order_by().aggregate(last=Max('updated_at'))
+        signature = (products['n'], products['last'], categories['n'], categories['last'], sellers['last'])
+        cache.set(CATALOG_SIGNATURE_KEY, signature, CATALOG_SIGNATURE_TTL)
+    return signature
+
+
+def invalidate_catalog_signature():
+    cache.delete(CATALOG_SIGNATURE_KEY)
+
+
+def catalog_page(request):
+    signature = catalog_signature()
+    products_last, categories_last, sellers_last = signature[1], signature[3], signature[4]
+    return _validators(request, signature, [products_last, categories_last, sellers_last])
@@ -0,0 +1,243 @@
+"""
+Facettes du catalogue (catégorie, état, stock, tranches de prix, remise)
+
+Toutes les facettes sont calculées en UNE requête groupée sur l'ensemble
+recherché, sans les filtres de facettes :
+
+    GROUP BY category_id, condition, en_stock, tranche_de_prix, remise, dans_la_fourchette
+
+Chaque ligne est une combinaison de valeurs avec son nombre de produits.
+Le décompte d'une facette applique ensuite en Python tous les AUTRES
+filtres sélectionnés (facettes disjonctives : cocher « Neuf » n'efface
+pas le nombre de produits « Occasion »).
+
+Les prix sont ceux que paie le client (Product.effective_price, promo
+comprise), comme le tri par prix.
+"""
+
+import hashlib
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db.models import Case, Count, IntegerField, Q, Value, When
+
+from .models import Product
+from .pagination import COUNT_CACHE_TIMEOUT, EXACT_COUNT_LIMIT
+
+# Tranches de prix en XOF : (borne basse incluse, borne haute exclue)
+PRICE_BUCKETS = [
+    (None, 5000),
+    (5000, 25000),
+    (25000, 100000),
+    (100000, 500000),
+    (500000, None),
+]
+
+# Niveaux de remise proposés (« 10 % et plus »...), du plus haut au plus bas
+DISCOUNT_LEVELS = [50, 30, 20, 10]
+
+
+def price_bucket_label(low, high):
+    if low is None:
+        return f'Moins de {high:,} XOF'.replace(',', ' ')
+    if high is None:
+        return f'Plus de {low:,} XOF'.replace(',', ' ')
+    return f'{low:,} - {high:,} XOF'.replace(',', ' ')
+
+
+def discount_label(level):
+    return f'{level} % et plus'
+
+
+def _bucket_q(index):
+    low, high = PRICE_BUCKETS[index]
+    condition = Q()
+    if low is not None:
+        condition &= Q(effective_price__gte=low)
+    if high is not None:
+        condition &= Q(effective_price__lt=high)
+    return condition
+
+
+def _bucket_expression():
+    whens = [When(_bucket_q(index), then=Value(index)) for index in range(len(PRICE_BUCKETS))]
+    return Case(*whens, output_field=IntegerField())
+
+
+def _discount_expression():
+    """Plus haut niveau de DISCOUNT_LEVELS atteint par la remise (0 sinon)"""
+    whens = [When(discount_percentage__gte=level, then=Value(level)) for level in DISCOUNT_LEVELS]
+    return Case(*whens, default=Value(0), output_field=IntegerField())
+
+
+def _range_q(min_price, max_price):
+    condition = Q()
+    if min_price is not None:
+        condition &= Q(effective_price__gte=min_price)
+    if max_price is not None:
+        condition &= Q(effective_price__lte=max_price)
+    return condition
+
+
+class FacetFilters:
+    """Filtres de facettes validés (voir ProductSearchForm)"""
+
+    def __init__(self, category=None, condition='', in_stock=False,
+                 min_price=None, max_price=None, price_bucket=None, min_discount=None):
+        self.category = category
+        self.condition = condition or ''
+        self.in_stock = bool(in_stock)
+        self.min_price = min_price
+        self.max_price = max_price
+        self.price_bucket = price_bucket
+        self.min_discount = min_discount
+
+    @classmethod
+    def from_form(cls, form):
+        # Un champ invalide est simplement ignoré, les autres filtres s'appliquent
+        form.is_valid()
+        data = form.cleaned_data
+        return cls(
+            category=data.get('category'),
+            condition=data.get('condition'),
+            in_stock=data.get('in_stock'),
+            min_price=data.get('min_price'),
+            max_price=data.get('max_price'),
+            price_bucket=data.get('price_bucket'),
+            min_discount=data.get('min_discount'),
+        )
+
+    def apply(self, queryset):
+        """Applique tous les filtres de facettes à un queryset de produits"""
+        if self.category is not None:
+            queryset = queryset.filter(category=self.category)
+        if self.condition:
+            queryset = queryset.filter(condition=self.condition)
+        if self.in_stock:
+            queryset = queryset.filter(stock_quantity__gt=0)
+        if self.price_bucket is not None:
+            queryset = queryset.filter(_bucket_q(self.price_bucket))
+        if self.min_price is not None or self.max_price is not None:
+            queryset = queryset.filter(_range_q(self.min_price, self.max_price))
+        if self.min_discount:
+            queryset = queryset.filter(discount_percentage__gte=self.min_discount)
+        return queryset
+
+    def matches(self, row, skip=None):
+        """La combinaison `row` passe-t-elle tous les filtres sauf `skip` ?"""
+        if skip != 'category' and self.category is not None and row['category'] != self.category.pk:
+            return False
+        if skip != 'condition' and self.condition and row['condition'] != self.condition:
+            return False
+        if skip != 'in_stock' and self.in_stock and not row['in_stock']:
+            return False
+        if skip != 'price_bucket' and self.price_bucket is not None and row['price_bucket'] != self.price_bucket:
+            return False
+        if skip != 'discount' and self.min_discount and row['discount'] < self.min_discount:
+            return False
+        if skip != 'price_range' and not row['price_range']:
+            return False
+        return True
+
+
+def _grouped_rows(queryset, filters):
+    """Une seule requête GROUP BY sur toutes les dimensions de facettes"""
+    price_range = _range_q(filters.min_price, filters.max_price)
+    if price_range:
+        in_range = Case(
+            When(price_range, then=Value(1)),
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+    else:
+        in_range = Value(1, output_field=IntegerField())
+
+    rows = queryset.order_by().annotate(
+        facet_in_stock=Case(
+            When(stock_quantity__gt=0, then=Value(1)),
+            default=Value(0),
+            output_field=IntegerField(),
+        ),
+        facet_price_bucket=_bucket_expression(),
+        facet_discount=_discount_expression(),
+        facet_price_range=in_range,
+    ).values(
+        'category_id', 'condition', 'facet_in_stock', 'facet_price_bucket', 'facet_discount', 'facet_price_range',
+    ).annotate(n=Count('id'))
+
+    return [
+        {
+            'category': row['category_id'],
+            'condition': row['condition'],
+            'in_stock': bool(row['facet_in_stock']),
+            'price_bucket': row['facet_price_bucket'],
+            'discount': row['facet_discount'],
+            'price_range': bool(row['facet_price_range']),
+            'n': row['n'],
+        }
+        for row in rows
+    ]
+
+
+def compute_facets(queryset, filters):
+    """
+    Retourne (facettes, total, estimé) pour le queryset recherché (avant
+    filtres de facettes). Les grands ensembles sont gardés en cache
+    COUNT_CACHE_TIMEOUT secondes, comme les totaux de pagination.
+
+    Le total est la somme des lignes groupées, pas pagination.estimate_count :
+    la requête des facettes lit de toute façon chaque ligne de l'ensemble,
+    le total exact ne coûte donc aucune requête de plus, et il reste
+    cohérent avec les décomptes affichés à côté (la somme des catégories
+    vaut le total). `estimé` signale un total servi depuis le cache.
+    """
+    sql, params = queryset.order_by().values('pk').query.sql_with_params()
+    key = 'catalog-facets:v2:' + hashlib.md5(
+        f'{sql}|{params}|{filters.min_price}|{filters.max_price}'.encode()
+    ).hexdigest()
+    rows = cache.get(key)
+    cached = rows is not None
+    if rows is None:
+        rows = _grouped_rows(queryset, filters)
+        if sum(row['n'] for row in rows) > EXACT_COUNT_LIMIT:
+            cache.set(key, rows, COUNT_CACHE_TIMEOUT)
+
+    categories = defaultdict(int)
+    conditions = defaultdict(int)
+    buckets = defaultdict(int)
+    discounts = defaultdict(int)
+    in_stock = 0
+    total = 0
+    for row in rows:
+        if filters.matches(row, skip='category'):
+            categories[row['category']] += row['n']
+        if filters.matches(row, skip='condition'):
+            conditions[row['condition']] += row['n']
+        if filters.matches(row, skip='in_stock') and row['in_stock']:
+            in_stock += row['n']
+        if filters.matches(row, skip='price_bucket'):
+            buckets[row['price_bucket']] += row['n']
+        if filters.matches(row, skip='discount'):
+            discounts[row['discount']] += row['n']
+        if filters.matches(row):
+            total += row['n']
+
+    facets = {
+        'categories': dict(categories),
+        'conditions': [
+            {'value': value, 'label': label, 'count': conditions.get(value, 0)}
+            for value, label in Product.CONDITION_CHOICES
+        ],
+        'in_stock': in_stock,
+        'price_buckets': [
+            {'value': index, 'label': price_bucket_label(low, high), 'count': buckets.get(index, 0)}
+            for index, (low, high) in enumerate(PRICE_BUCKETS)
+        ],
+        # « X % et plus » : cumul des niveaux supérieurs ou égaux
+        'discounts': [
+            {'value': level, 'label': discount_label(level),
+             'count': sum(n for found, n in discounts.items() if found >= level)}
+            for level in reversed(DISCOUNT_LEVELS)
+        ],
+    }
+    return facets, total, cached
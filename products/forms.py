@@ -1,5 +1,8 @@
 from django import forms
+from django.db.models import Q
+from accounts.models import User
 from .models import Product, ProductImage, Review, Category
+from .facets import DISCOUNT_LEVELS, PRICE_BUCKETS, discount_label, price_bucket_label
 
 class ProductForm(forms.ModelForm):
     """
@@ -187,3 +190,41 @@ class ProductSearchForm(forms.Form):
             'class': 'form-checkbox'
         })
     )
+    price_bucket = forms.TypedChoiceField(
+        choices=[('', 'Tous les prix')] + [
+            (index, price_bucket_label(low, high)) for index, (low, high) in enumerate(PRICE_BUCKETS)
+        ],
+        coerce=int,
+        empty_value=None,
+        required=False,
+        widget=forms.RadioSelect()
+    )
+    min_discount = forms.TypedChoiceField(
+        choices=[('', 'Toutes')] + [(level, discount_label(level)) for level in reversed(DISCOUNT_LEVELS)],
+        coerce=int,
+        empty_value=None,
+        required=False,
+        widget=forms.RadioSelect()
+    )
+
+
+class ProductImportForm(forms.Form):
+    """
+    Formulaire d'import du catalogue (admin), même moteur que
+    `python manage.py import_products`
+    """
+    file = forms.FileField(
+        label='Fichier CSV ou JSONL',
+        help_text='Colonnes : name, description, price, category, stock, vendor_username...',
+    )
+    seller = forms.ModelChoiceField(
+        queryset=User.objects.filter(Q(is_seller=True) | Q(is_superuser=True)).order_by('username'),
+        required=False,
+        label='Vendeur par défaut',
+        help_text='Pour les lignes sans vendor_username',
+    )
+    dry_run = forms.BooleanField(
+        required=False,
+        initial=True,
+        label='Simulation (ne rien enregistrer)',
+    )
@@ -0,0 +1,168 @@
+"""
+Déclinaisons des images produit (Pillow)
+
+À chaque nouvelle image principale, on génère des versions de largeur fixe
+(DERIVATIVES) en WebP, JPEG et AVIF si Pillow le supporte. Les noms sont
+adressés par le contenu de l'original :
+
+    products/derived/ab/ab12…ef-320.webp
+
+Un même fichier a donc toujours le même nom et peut être mis en cache
+indéfiniment (Cache-Control: immutable côté serveur web) ; une nouvelle
+image donne de nouveaux noms. Les chemins sont gardés dans
+Product.image_variants et utilisés par le tag {% product_image %}.
+
+Ces fonctions tournent dans le worker (products/jobs.py), pas dans la requête.
+"""
+
+import hashlib
+import io
+import os
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from PIL import features, Image, ImageOps
+
+from .models import Product
+
+# Nom -> largeur en pixels (jamais agrandie au-delà de l'original)
+DERIVATIVES = {
+    'card': 320,
+    'detail': 800,
+    'zoom': 1600,
+}
+DERIVED_DIR = 'products/derived'
+HASH_LENGTH = 20
+
+# Format -> (extension, options Pillow) ; l'ordre est celui des <source>
+FORMATS = {
+    'avif': ('avif', {'quality': 50}),
+    'webp': ('webp', {'quality': 78, 'method': 6}),
+    'jpeg': ('jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def available_formats():
+    formats = ['webp', 'jpeg']
+    if features.check('avif'):
+        formats.insert(0, 'avif')
+    return formats
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+
+
+def _encode(image, fmt):
+    extension, options = FORMATS[fmt]
+    if fmt == 'jpeg' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt.upper(), **options)
+    return extension, buffer.getvalue()
+
+
+def build_variants(data):
+    """
+    Génère (si absentes) les déclinaisons d'une image source.
+    Retourne {'hash', 'width', 'height', 'sizes': {nom: {'width', format: chemin}}}
+    """
+    digest = content_hash(data)
+    with Image.open(io.BytesIO(data)) as source:
+        source = ImageOps.exif_transpose(source)
+        if source.mode not in ('RGB', 'RGBA'):
+            source = source.convert('RGBA' if 'transparency' in source.info else 'RGB')
+        width, height = source.size
+
+        sizes = {}
+        for name, target in DERIVATIVES.items():
+            target = min(target, width)
+            variant = {'width': target, 'height': round(height * target / width)}
+            resized = None
+            for fmt in available_formats():
+                extension = FORMATS[fmt][0]
+                # Même contenu et même largeur -> même nom : inutile de réencoder
+                # (une petite image donne la même largeur pour plusieurs tailles)
+                path = f'{DERIVED_DIR}/{digest[:2]}/{digest}-{target}.{extension}'
+                if not default_storage.exists(path):
+                    if resized is None:
+                        resized = source
+                        if target < width:
+                            resized = source.resize((target, variant['height']), Image.Resampling.LANCZOS)
+                    _, encoded = _encode(resized, fmt)
+                    path = default_storage.save(path, ContentFile(encoded))
+                variant[fmt] = path
+            sizes[name] = variant
+
+    return {'hash': digest, 'width': width, 'height': height, 'sizes': sizes}
+
+
+def current_sizes(image_variants, image_name):
+    """
+    Déclinaisons {'card': {...}, ...} si elles ont été générées depuis
+    `image_name` ; None sinon (image changée, worker pas encore passé)
+    """
+    variants = image_variants or {}
+    if not image_name or variants.get('source') != image_name:
+        return None
+    return variants.get('sizes') or None
+
+
+def generate_product_variants(product_id):
+    """Génère les déclinaisons de l'image principale d'un produit"""
+    product = Product.objects.filter(pk=product_id).only('id', 'main_image').first()
+    if product is None or not product.main_image:
+        return None
+    name = product.main_image.name
+    # Les erreurs (fichier absent, image illisible) remontent : le worker retente
+    with product.main_image.open('rb') as handle:
+        variants = build_variants(handle.read())
+
+    variants['source'] = name
+    # updated_at change : les fragments de cartes en cache sont renouvelés ;
+    # on ne touche pas un produit dont l'image a changé entre-temps
+    Product.objects.filter(pk=product_id, main_image=name).update(
+        image_variants=variants, updated_at=timezone.now(),
+    )
+    return variants
+
+
+# Preuves de paiement : photos de téléphone souvent > 3 Mo, lisibles à 1600 px
+PROOF_MAX_SIZE = 1600
+
+
+def compress_payment_proof(order_id):
+    """
+    Réduit et recompresse en JPEG la preuve de paiement (image) d'une
+    commande. L'original est conservé sur le stockage (pièce justificative
+    en cas de litige) ; la commande pointe vers la version légère.
+    """
+    from orders.models import Order
+
+    order = Order.objects.filter(pk=order_id).only('id', 'payment_proof').first()
+    if order is None or not order.payment_proof:
+        return None
+    name = order.payment_proof.name
+    with order.payment_proof.open('rb') as handle:
+        data = handle.read()
+    try:
+        source = Image.open(io.BytesIO(data))
+        source.load()
+    except Image.UnidentifiedImageError:
+        return None  # PDF ou autre document : gardé tel quel
+
+    with source:
+        image = ImageOps.exif_transpose(source).convert('RGB')
+        image.thumbnail((PROOF_MAX_SIZE, PROOF_MAX_SIZE), Image.Resampling.LANCZOS)
+        _, encoded = _encode(image, 'jpeg')
+    if len(encoded) >= len(data):
+        return name
+
+    directory = os.path.dirname(name)
+    new_name = default_storage.save(
+        f'{directory}/{content_hash(encoded)}.jpg', ContentFile(encoded)
+    )
+    if not Order.objects.filter(pk=order_id, payment_proof=name).update(payment_proof=new_name):
+        default_storage.delete(new_name)  # Preuve remplacée entre-temps
+    return new_name
@@ -0,0 +1,366 @@
+"""
+Moteur d'import du catalogue (CSV ou JSONL, taille quelconque)
+
+Utilisé par `python manage.py import_products` et par le formulaire
+d'import de l'admin. Le fichier est lu en flux et traité par lots de
+CHUNK_SIZE lignes ; chaque lot coûte quelques requêtes :
+
+- vendeurs et catégories résolus depuis des dictionnaires en mémoire
+  (une requête par lot pour les vendeurs pas encore vus) ;
+- produits existants retrouvés par SKU, ou par (vendeur, nom) comme
+  l'ancien update_or_create ;
+- écriture en une transaction par `bulk_create(update_conflicts=True)`
+  sur la clé unique `sku`. Seules les colonnes présentes dans le fichier
+  sont mises à jour : une colonne absente (promo, marque, état...) garde
+  la valeur en base au lieu de recevoir la valeur par défaut de la ligne.
+
+Les signaux ne sont pas déclenchés par bulk_create : l'index de recherche
+et les compteurs de catégories sont mis à jour par lot.
+"""
+
+import csv
+import hashlib
+import io
+import json
+import time
+from decimal import Decimal, InvalidOperation
+
+from django.db import IntegrityError, transaction
+from django.utils.text import slugify
+
+from accounts.models import User
+
+from . import conditional, search
+from .models import Category, Product
+
+CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 200
+
+CATEGORY_MAPPING = {
+    'Téléphonie': 'telephonie',
+    'Énergie Solaire': 'energie-solaire',
+    'Mode & Vêtements': 'mode-vetements',
+    'Bébé & Enfants': 'bebe-enfants',
+    'Alimentation': 'alimentation',
+    'Maison & Cuisine': 'maison-cuisine',
+    'Beauté & Santé': 'beaute-sante',
+    'Art & Artisanat': 'art-artisanat',
+    'Électronique': 'electronique',
+}
+
+UPDATE_FIELDS = [
+    'name', 'description', 'price', 'discount_price', 'category', 'stock_quantity',
+    'brand', 'condition', 'is_active', 'updated_at',
+]
+# Champs toujours réécrits (colonnes obligatoires) ; les autres seulement
+# si leur colonne figure dans la ligne
+ALWAYS_UPDATED = {'name', 'price', 'updated_at'}
+COLUMN_FIELDS = {
+    'description': 'description',
+    'discount_price': 'discount_price',
+    'category': 'category',
+    'stock': 'stock_quantity',
+    'stock_quantity': 'stock_quantity',
+    'brand': 'brand',
+    'condition': 'condition',
+    'is_active': 'is_active',
+}
+CONDITIONS = {value for value, _ in Product.CONDITION_CHOICES}
+TRUE_VALUES = {'1', 'true', 'vrai', 'oui', 'yes'}
+
+
+class RowError(ValueError):
+    pass
+
+
+class ImportReport:
+    def __init__(self, dry_run=False):
+        self.dry_run = dry_run
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.errors = []  # (ligne, message)
+        self.error_count = 0
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def add_error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+
+def read_rows(stream, fmt):
+    """Itère (numéro de ligne, dict) sur un flux texte CSV ou JSONL"""
+    if fmt == 'jsonl':
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as error:
+                yield line_number, RowError(f"JSON invalide : {error}")
+                continue
+            yield line_number, row if isinstance(row, dict) else RowError("Objet JSON attendu")
+    else:
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+
+
+def detect_format(filename):
+    return 'jsonl' if filename.lower().endswith(('.jsonl', '.ndjson')) else 'csv'
+
+
+def text_stream(binary_file):
+    """Flux texte UTF-8 (BOM Excel toléré) sur un fichier binaire ou un upload"""
+    return io.TextIOWrapper(binary_file, encoding='utf-8-sig', newline='')
+
+
+def _text(row, key, default=''):
+    value = row.get(key)
+    return default if value is None else str(value).strip()
+
+
+def _decimal(value, label, required=True):
+    if value in ('', None):
+        if required:
+            raise RowError(f"{label} manquant")
+        return None
+    try:
+        number = Decimal(str(value).replace(' ', '').replace(',', '.'))
+    except InvalidOperation:
+        raise RowError(f"{label} invalide : {value!r}")
+    if number < 0 or not number.is_finite():
+        raise RowError(f"{label} invalide : {value!r}")
+    return number.quantize(Decimal('0.01'))
+
+
+def update_fields(row):
+    """Champs à réécrire sur un produit existant : ceux des colonnes présentes"""
+    present = ALWAYS_UPDATED | {field for column, field in COLUMN_FIELDS.items() if column in row}
+    return tuple(field for field in UPDATE_FIELDS if field in present)
+
+
+def _generated_sku(seller_id, name):
+    return 'IMP-' + hashlib.md5(f'{seller_id}|{name}'.encode()).hexdigest()[:16].upper()
+
+
+class CatalogImporter:
+    def __init__(self, default_seller=None, dry_run=False, chunk_size=CHUNK_SIZE):
+        self.default_seller = default_seller
+        self.dry_run = dry_run
+        self.chunk_size = chunk_size
+        self.sellers = {default_seller.username: default_seller.pk} if default_seller else {}
+        self.categories = {c.slug: c for c in Category.objects.all()}
+        self.report = ImportReport(dry_run)
+
+    # ── Résolution ──
+
+    def _load_sellers(self, usernames):
+        unknown = {u for u in usernames if u and u not in self.sellers}
+        if unknown:
+            for user in User.objects.filter(username__in=unknown).only('id', 'username'):
+                self.sellers[user.username] = user.pk
+            for username in unknown:
+                self.sellers.setdefault(username, None)
+
+    def _category(self, name):
+        if not name:
+            return None
+        slug = CATEGORY_MAPPING.get(name) or slugify(name)[:200]
+        if not slug:
+            raise RowError(f"Catégorie invalide : {name!r}")
+        category = self.categories.get(slug)
+        if category is None:
+            category = Category(name=name, slug=slug, is_active=True)
+            if not self.dry_run:
+                category.save()
+            self.categories[slug] = category
+        return category
+
+    def _build(self, row):
+        """Produit non enregistré à partir d'une ligne ; lève RowError"""
+        name = _text(row, 'name')
+        if not name:
+            raise RowError("Nom manquant")
+        username = _text(row, 'vendor_username') or (self.default_seller.username if self.default_seller else '')
+        seller_id = self.sellers.get(username)
+        if seller_id is None:
+            raise RowError(f"Vendeur inconnu : {username!r}" if username else "Vendeur manquant")
+
+        stock = _text(row, 'stock', _text(row, 'stock_quantity', '0')) or '0'
+        try:
+            stock_quantity = int(stock)
+        except ValueError:
+            raise RowError(f"Stock invalide : {stock!r}")
+        if stock_quantity < 0:
+            raise RowError(f"Stock invalide : {stock!r}")
+
+        condition = _text(row, 'condition', 'new') or 'new'
+        if condition not in CONDITIONS:
+            raise RowError(f"État invalide : {condition!r}")
+
+        price = _decimal(_text(row, 'price'), 'Prix')
+        discount_price = _decimal(_text(row, 'discount_price'), 'Prix promo', required=False)
+        if discount_price is not None and discount_price >= price:
+            discount_price = None
+
+        return Product(
+            seller_id=seller_id,
+            category=self._category(_text(row, 'category')),
+            name=name[:300],
+            description=_text(row, 'description'),
+            price=price,
+            discount_price=discount_price,
+            stock_quantity=stock_quantity,
+            brand=_text(row, 'brand')[:200],
+            condition=condition,
+            sku=_text(row, 'sku')[:100],
+            is_active=_text(row, 'is_active', '1').lower() in TRUE_VALUES,
+        )
+
+    # ── Lots ──
+
+    def _assign_skus(self, products):
+        """SKU du produit existant (même vendeur, même nom), sinon une valeur stable"""
+        without_sku = [p for p in products if not p.sku]
+        if not without_sku:
+            return
+        rows = Product.objects.filter(
+            seller_id__in={p.seller_id for p in without_sku},
+            name__in={p.name for p in without_sku},
+        ).values_list('id', 'seller_id', 'name', 'sku')
+        existing = {}
+        for pk, seller_id, name, sku in rows:
+            if not sku:
+                # Produit créé sans référence : on lui donne celle de l'import
+                # pour que l'upsert sur `sku` le retrouve
+                sku = _generated_sku(seller_id, name)
+                if not self.dry_run:
+                    Product.objects.filter(pk=pk, sku='').update(sku=sku)
+            existing[(seller_id, name)] = sku
+        for product in without_sku:
+            product.sku = existing.get((product.seller_id, product.name)) or _generated_sku(product.seller_id, product.name)
+
+    def _assign_slugs(self, products):
+        """Garde le slug des produits existants ; retourne leurs SKU"""
+        existing = dict(Product.objects.filter(
+            sku__in=[p.sku for p in products]
+        ).values_list('sku', 'slug'))
+
+        wanted = {}
+        for product in products:
+            if product.sku in existing:
+                product.slug = existing[product.sku]
+            else:
+                product.slug = slugify(product.name)[:250] or product.sku.lower()
+                wanted.setdefault(product.slug, []).append(product)
+        taken = set(Product.objects.filter(slug__in=list(wanted)).values_list('slug', flat=True))
+        for slug, same_slug in wanted.items():
+            for index, product in enumerate(same_slug):
+                if slug in taken or index > 0:
+                    product.slug = f'{slug}-{product.sku.lower()}'[:300]
+        return set(existing)
+
+    def _write(self, entries):
+        """entries : [(ligne, produit, champs)] ; un upsert par jeu de colonnes"""
+        groups = {}
+        for _, product, fields in entries:
+            groups.setdefault(fields, []).append(product)
+        for fields, products in groups.items():
+            Product.objects.bulk_create(
+                products,
+                update_conflicts=True,
+                unique_fields=['sku'],
+                update_fields=list(fields),
+            )
+
+    def _current_categories(self, products):
+        """Catégories actuelles des produits déjà en base (avant l'upsert)"""
+        return set(Product.objects.filter(sku__in=[p.sku for p in products]).values_list('category_id', flat=True))
+
+    def _after_write(self, products, previous_categories=()):
+        """Ce que feraient les signaux post_save, une fois par lot"""
+        rows = list(Product.objects.filter(sku__in=[p.sku for p in products]).values_list('id', 'category_id'))
+        search.index_products([pk for pk, _ in rows])
+        # Anciennes et nouvelles catégories (produit déplacé par l'import)
+        Category.refresh_product_counts({category_id for _, category_id in rows} | set(previous_categories))
+        conditional.invalidate_catalog_signature()
+
+    def _flush(self, chunk):
+        """chunk : [(ligne, dict)]"""
+        self._load_sellers({_text(row, 'vendor_username') for _, row in chunk})
+
+        entries = []
+        for line, row in chunk:
+            try:
+                entries.append((line, self._build(row), update_fields(row)))
+            except RowError as error:
+                self.report.add_error(line, str(error))
+        if not entries:
+            return
+
+        self._assign_skus([product for _, product, _ in entries])
+        # Même SKU plusieurs fois dans le lot : la dernière ligne l'emporte
+        entries = list({entry[1].sku: entry for entry in entries}.values())
+        products = [product for _, product, _ in entries]
+        existing = self._assign_slugs(products)
+
+        if not self.dry_run:
+            try:
+                with transaction.atomic():
+                    previous_categories = self._current_categories(products)
+                    self._write(entries)
+                    self._after_write(products, previous_categories)
+            except IntegrityError:
+                # Conflit sur une autre contrainte : on isole les lignes fautives
+                entries = self._write_one_by_one(entries)
+                products = [product for _, product, _ in entries]
+
+        for product in products:
+            if product.sku in existing:
+                self.report.updated += 1
+            else:
+                self.report.created += 1
+
+    def _write_one_by_one(self, entries):
+        written = []
+        for line, product, fields in entries:
+            try:
+                with transaction.atomic():
+                    previous_categories = self._current_categories([product])
+                    self._write([(line, product, fields)])
+                    self._after_write([product], previous_categories)
+                written.append((line, product, fields))
+            except IntegrityError as error:
+                self.report.add_error(line, f"Conflit en base : {error}")
+        return written
+
+    def run(self, rows):
+        """rows : itérable de (numéro de ligne, dict ou RowError)"""
+        chunk = []
+        for line, row in rows:
+            self.report.rows += 1
+            if isinstance(row, Exception):
+                self.report.add_error(line, str(row))
+                continue
+            chunk.append((line, row))
+            if len(chunk) >= self.chunk_size:
+                self._flush(chunk)
+                chunk = []
+        if chunk:
+            self._flush(chunk)
+        self.report.errors.sort()
+        self.report.elapsed = time.perf_counter() - self.report.started
+        return self.report
+
+
+def import_catalog(stream, fmt='csv', default_seller=None, dry_run=False, chunk_size=CHUNK_SIZE):
+    """Importe un flux texte ; retourne un ImportReport"""
+    importer = CatalogImporter(default_seller=default_seller, dry_run=dry_run, chunk_size=chunk_size)
+    return importer.run(read_rows(stream, fmt))
@@ -0,0 +1,104 @@
+"""
+File de traitements d'images (table ImageJob)
+
+Les requêtes ne font qu'insérer une tâche (enqueue) ; le worker
+`python manage.py run_image_worker` les réserve par lots et les exécute
+dans un pool multiprocessing (un processus par cœur par défaut).
+
+Une tâche en échec est retentée avec un délai croissant
+(RETRY_DELAY * 2^(tentatives - 1)) jusqu'à max_attempts, puis marquée
+« failed » avec la dernière erreur. Une tâche restée « running » plus de
+STALE_AFTER (worker tué) est remise en attente.
+"""
+
+import importlib
+import traceback
+from datetime import timedelta
+
+from django.db import connections
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import ImageJob
+
+# Type de tâche -> fonction (chemin pointé) appelée avec object_id
+HANDLERS = {
+    'product_variants': 'products.images.generate_product_variants',
+    'payment_proof': 'products.images.compress_payment_proof',
+}
+RETRY_DELAY = timedelta(seconds=30)
+STALE_AFTER = timedelta(minutes=15)
+
+
+def enqueue(kind, object_id):
+    """Ajoute une tâche, sauf si la même est déjà en attente"""
+    if kind not in HANDLERS:
+        raise ValueError(f"Type de tâche inconnu : {kind}")
+    job, _ = ImageJob.objects.get_or_create(kind=kind, object_id=object_id, status='pending')
+    return job
+
+
+def claim(limit):
+    """Réserve jusqu'à `limit` tâches prêtes ; sûr avec plusieurs workers"""
+    now = timezone.now()
+    candidates = ImageJob.objects.filter(
+        status='pending', run_after__lte=now,
+    ).order_by('run_after', 'id').values_list('id', flat=True)[:limit * 2]
+
+    claimed = []
+    for job_id in candidates:
+        # UPDATE conditionnel : un seul worker passe la tâche en « running »
+        if ImageJob.objects.filter(pk=job_id, status='pending').update(status='running', started_at=now):
+            claimed.append(job_id)
+            if len(claimed) >= limit:
+                break
+    return list(ImageJob.objects.filter(pk__in=claimed).values_list('id', 'kind', 'object_id'))
+
+
+def run(job, close_connections=True):
+    """
+    Exécute une tâche (dans un processus du pool) ; retourne (id, erreur ou '').
+    close_connections=False : exécution dans le processus principal (--processes 0)
+    """
+    job_id, kind, object_id = job
+    try:
+        module_name, function_name = HANDLERS[kind].rsplit('.', 1)
+        getattr(importlib.import_module(module_name), function_name)(object_id)
+        return job_id, ''
+    except Exception:
+        return job_id, traceback.format_exc(limit=5)
+    finally:
+        # Pas de connexion ouverte qui traîne entre deux tâches du même processus
+        if close_connections:
+            connections.close_all()
+
+
+def finish(job_id, error):
+    """Enregistre le résultat d'une tâche (processus principal)"""
+    job = ImageJob.objects.get(pk=job_id)
+    job.attempts += 1
+    job.finished_at = timezone.now()
+    if not error:
+        job.status = 'done'
+        job.last_error = ''
+    elif job.attempts >= job.max_attempts:
+        job.status = 'failed'
+        job.last_error = error
+    else:
+        job.status = 'pending'
+        job.last_error = error
+        job.run_after = job.finished_at + RETRY_DELAY * 2 ** (job.attempts - 1)
+    job.save(update_fields=['attempts', 'finished_at', 'status', 'last_error', 'run_after'])
+    return job
+
+
+def requeue_stale():
+    """Remet en attente les tâches « running » abandonnées par un worker arrêté"""
+    return ImageJob.objects.filter(
+        status='running', started_at__lt=timezone.now() - STALE_AFTER,
+    ).update(status='pending', run_after=timezone.now())
+
+
+def status_counts():
+    counts = dict(ImageJob.objects.values_list('status').annotate(n=Count('id')).order_by())
+    return {status: counts.get(status, 0) for status, _ in ImageJob.STATUS_CHOICES}
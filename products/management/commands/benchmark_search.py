@@ -0,0 +1,124 @@
+"""
+Mesure la latence de la recherche produits (icontains vs plein texte)
+sur un catalogue synthétique de 10k, 100k et 1M produits.
+
+    python manage.py benchmark_search --sizes 10000 100000 1000000
+
+Tout est fait dans une transaction annulée à la fin : la base n'est pas modifiée.
+"""
+
+import random
+import time
+from statistics import median
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+
+from accounts.models import User
+from products import search
+from products.models import Category, Product
+
+WORDS = [
+    'téléphone', 'téléphonie', 'smartphone', 'écran', 'batterie', 'solaire',
+    'panneau', 'lampe', 'chargeur', 'câble', 'tissu', 'wax', 'boubou', 'robe',
+    'pagne', 'karité', 'savon', 'huile', 'coco', 'arachide', 'épices', 'mil',
+    'gari', 'riz', 'bébé', 'poussette', 'jouet', 'chaise', 'table', 'bois',
+    'rotin', 'calebasse', 'djembé', 'masque', 'perles', 'sac', 'cuir', 'mixeur',
+    'ventilateur', 'télévision', 'ordinateur', 'portable', 'enceinte', 'casque',
+]
+BRANDS = ['Samsung', 'Tecno', 'Infinix', 'HP', 'JBL', 'Itel', 'Nasco', '']
+QUERIES = ['telephone', 'panneau solaire', 'karite', 'bebe chaise', 'ordinateur portable hp']
+CHUNK = 10000
+PAGE = 24
+FILLER_SIZE = 20000
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmark de la recherche produits (icontains vs plein texte)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[10000, 100000, 1000000])
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        if search.get_backend() is None:
+            self.stdout.write(self.style.ERROR(f"❌ Pas de moteur plein texte pour {connection.vendor}"))
+            return
+
+        self.stdout.write(f"🚀 Benchmark recherche ({connection.vendor})")
+        self.stdout.write(f"{'produits':>10} {'requête':<25} {'icontains ms':>13} {'plein texte ms':>15}")
+        try:
+            with transaction.atomic():
+                self.run(sorted(options['sizes']), options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, sizes, repeat):
+        rng = random.Random(42)
+        # Vocabulaire de remplissage : les mots réels restent minoritaires
+        filler = [
+            ''.join(rng.choices('abcdefghijklmnopqrstuvwxyz', k=rng.randint(4, 9)))
+            for _ in range(FILLER_SIZE)
+        ]
+        seller = User.objects.create(username='benchmark-search-seller')
+        categories = [
+            Category.objects.create(name=name, slug=f'benchmark-{i}')
+            for i, name in enumerate(['Téléphonie', 'Énergie Solaire', 'Beauté & Santé', 'Bébé & Enfants'])
+        ]
+
+        created = 0
+        for size in sizes:
+            while created < size:
+                batch = min(CHUNK, size - created)
+                first_id = self.insert(rng, filler, seller, categories, created, batch)
+                with connection.cursor() as cursor:
+                    search.get_backend().refresh(cursor, 'p.id >= %s', [first_id])
+                created += batch
+
+            for query in QUERIES:
+                # Comme product_list_view : première page + nombre de résultats
+                legacy = self.measure(repeat, Product.objects.filter(is_active=True).filter(
+                    Q(name__icontains=query) |
+                    Q(description__icontains=query) |
+                    Q(category__name__icontains=query)
+                ).order_by('-created_at'))
+                fulltext = self.measure(repeat, search.search_products(
+                    Product.objects.filter(is_active=True), query
+                ).order_by('-search_rank', '-created_at'))
+                self.stdout.write(f"{size:>10} {query:<25} {legacy:>13.1f} {fulltext:>15.1f}")
+
+    def insert(self, rng, filler, seller, categories, offset, count):
+        products = []
+        for i in range(offset, offset + count):
+            name = ' '.join([rng.choice(WORDS)] + rng.choices(filler, k=2)).capitalize()
+            products.append(Product(
+                seller=seller,
+                category=rng.choice(categories),
+                name=name,
+                slug=f'benchmark-{i}',
+                sku=f'BENCH-{i}',
+                description=' '.join(rng.choices(filler, k=20) + rng.choices(WORDS, k=2)),
+                brand=rng.choice(BRANDS),
+                price=rng.randint(500, 500000),
+                stock_quantity=rng.randint(0, 50),
+                main_image='products/benchmark.jpg',
+            ))
+        created = Product.objects.bulk_create(products)
+        if created[0].pk is not None:
+            return created[0].pk
+        return Product.objects.filter(slug=f'benchmark-{offset}').values_list('pk', flat=True).get()
+
+    def measure(self, repeat, queryset):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            list(queryset.all()[:PAGE])
+            queryset.count()
+            timings.append((time.perf_counter() - start) * 1000)
+        return median(timings)
@@ -0,0 +1,25 @@
+"""
+Met à jour les recommandations « Souvent achetés ensemble » à partir des
+nouvelles commandes. À lancer périodiquement (cron) :
+
+    python manage.py build_recommendations
+    python manage.py build_recommendations --rebuild   # relit tout l'historique
+"""
+
+from django.core.management.base import BaseCommand
+
+from products.recommendations import TOP_K, update_co_purchases
+
+
+class Command(BaseCommand):
+    help = 'Met à jour les produits souvent achetés ensemble (incrémental)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true', help="Repartir de zéro et relire toutes les commandes")
+        parser.add_argument('--top', type=int, default=TOP_K, help='Nombre de voisins gardés par produit')
+
+    def handle(self, *args, **options):
+        orders, products = update_co_purchases(top_k=options['top'], rebuild=options['rebuild'])
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {orders} commandes intégrées, voisins recalculés pour {products} produits"
+        ))
@@ -0,0 +1,28 @@
+"""
+Met à jour les produits similaires (contenu : nom, description, marque,
+catégorie). Incrémental par défaut, à lancer périodiquement (cron) :
+
+    python manage.py build_similar_products
+    python manage.py build_similar_products --rebuild   # tout recalculer
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Met à jour les produits similaires par le contenu (TF-IDF)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true', help='Revectoriser et recalculer tous les produits')
+        parser.add_argument('--top', type=int, help='Nombre de voisins gardés par produit (défaut : similarity.TOP_K)')
+
+    def handle(self, *args, **options):
+        try:
+            from products.similarity import TOP_K, update_similar_products
+        except ImportError:
+            raise CommandError("NumPy est requis : pip install numpy")
+
+        vectorized, lists = update_similar_products(top_k=options['top'] or TOP_K, rebuild=options['rebuild'])
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {vectorized} produits vectorisés, {lists} listes de voisins mises à jour"
+        ))
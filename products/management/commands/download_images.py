@@ -1,13 +1,34 @@
 """
-COMMANDE DJANGO - VERSION CORRIGÉE POUR WINDOWS
-Remplacez le contenu de : products/management/commands/download_images.py
+Télécharge les images des produits (PRODUCT_IMAGES) en parallèle
+
+- pool de threads borné, une connexion HTTP persistante par hôte et par thread
+- débit adaptatif par hôte : ralentit sur 429/503 (Retry-After), réaccélère ensuite
+- produits trouvés en une seule requête au départ
+- reprise : un manifeste JSON garde les URL déjà téléchargées
+- dédoublonnage : une URL n'est téléchargée qu'une fois et les fichiers sont
+  nommés par leur empreinte SHA-256 (même contenu -> même fichier)
+
+    python manage.py download_images
+    python manage.py download_images --workers 4 --force
+    python manage.py download_images --mirror http://127.0.0.1:8001   # serveur local de test
 """
 
+import hashlib
+import http.client
+import io
+import json
 import os
-import urllib.request
+import threading
 import time
-from django.core.management.base import BaseCommand
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urljoin, urlsplit
+
+from django.conf import settings
 from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from PIL import Image
+
 from products.models import Product
 
 # Mapping COMPLET des 50 produits
@@ -64,58 +85,242 @@ PRODUCT_IMAGES = {
     'Biberons Anti-Coliques Set 3': 'https://images.unsplash.com/photo-1515488042361-ee00e0ddd4e4?w=800&q=80',
 }
 
+USER_AGENT = 'Mozilla/5.0 (compatible; MyKantyImageBot/1.0)'
+MAX_ATTEMPTS = 4
+MAX_REDIRECTS = 3
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+FORMAT_EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp', 'GIF': 'gif'}
+
+
+class DownloadError(Exception):
+    pass
+
+
+class HostRateLimiter:
+    """
+    Intervalle minimal entre deux requêtes vers un même hôte. Doublé (ou
+    fixé par Retry-After) quand l'hôte sature, réduit de 10 % à chaque succès.
+    """
+
+    def __init__(self, interval=0.05, min_interval=0.02, max_interval=30.0):
+        self.lock = threading.Lock()
+        self.initial = interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.intervals = {}
+        self.next_slot = {}
+
+    def wait(self, host):
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(host, now))
+            self.next_slot[host] = slot + self.intervals.get(host, self.initial)
+        if slot > now:
+            time.sleep(slot - now)
+
+    def success(self, host):
+        with self.lock:
+            interval = self.intervals.get(host, self.initial)
+            self.intervals[host] = max(self.min_interval, interval * 0.9)
+
+    def throttled(self, host, retry_after=None):
+        with self.lock:
+            interval = self.intervals.get(host, self.initial)
+            interval = retry_after if retry_after else interval * 2
+            self.intervals[host] = min(self.max_interval, max(interval, self.min_interval))
+            self.next_slot[host] = time.monotonic() + self.intervals[host]
+
+
+class Fetcher:
+    """Client HTTP : connexions persistantes par (thread, hôte)"""
+
+    def __init__(self, limiter, timeout):
+        self.limiter = limiter
+        self.timeout = timeout
+        self.local = threading.local()
+
+    def _connection(self, scheme, netloc):
+        connections = getattr(self.local, 'connections', None)
+        if connections is None:
+            connections = self.local.connections = {}
+        key = (scheme, netloc)
+        if key not in connections:
+            connection_class = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+            connections[key] = connection_class(netloc, timeout=self.timeout)
+        return connections[key]
+
+    def _drop(self, scheme, netloc):
+        connection = self.local.connections.pop((scheme, netloc), None)
+        if connection is not None:
+            connection.close()
+
+    def _request(self, url):
+        parts = urlsplit(url)
+        path = parts.path or '/'
+        if parts.query:
+            path = f'{path}?{parts.query}'
+        self.limiter.wait(parts.netloc)
+        for reused in (True, False):
+            connection = self._connection(parts.scheme, parts.netloc)
+            try:
+                connection.request('GET', path, headers={'User-Agent': USER_AGENT, 'Accept': 'image/*'})
+                response = connection.getresponse()
+                return parts, response, response.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                # Connexion persistante fermée par le serveur : une nouvelle suffit
+                self._drop(parts.scheme, parts.netloc)
+                if not reused:
+                    raise
+            except (OSError, http.client.HTTPException):
+                self._drop(parts.scheme, parts.netloc)
+                raise
+
+    def get(self, url):
+        last_error = None
+        for attempt in range(MAX_ATTEMPTS):
+            try:
+                current = url
+                for _ in range(MAX_REDIRECTS + 1):
+                    parts, response, body = self._request(current)
+                    if response.status in (301, 302, 303, 307, 308) and response.getheader('Location'):
+                        current = urljoin(current, response.getheader('Location'))
+                        continue
+                    break
+            except (OSError, http.client.HTTPException) as error:
+                last_error = str(error)
+                time.sleep(2 ** attempt * 0.5)
+                continue
+
+            if response.status == 200:
+                self.limiter.success(parts.netloc)
+                return body
+            last_error = f'HTTP {response.status}'
+            if response.status not in RETRY_STATUSES:
+                break
+            retry_after = response.getheader('Retry-After')
+            self.limiter.throttled(parts.netloc, float(retry_after) if retry_after and retry_after.isdigit() else None)
+        raise DownloadError(last_error)
+
+
+class Manifest:
+    """URL -> fichier déjà téléchargé ; réécrit de façon atomique après chaque image"""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.urls = {}
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as handle:
+                self.urls = json.load(handle).get('urls', {})
+
+    def get(self, url):
+        entry = self.urls.get(url)
+        if entry and default_storage.exists(entry['path']):
+            return entry
+        return None
+
+    def add(self, url, entry):
+        with self.lock:
+            self.urls[url] = entry
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            temporary = f'{self.path}.tmp'
+            with open(temporary, 'w', encoding='utf-8') as handle:
+                json.dump({'urls': self.urls}, handle, indent=1, ensure_ascii=False)
+            os.replace(temporary, self.path)
+
+
+def store_image(data):
+    """Vérifie l'image et l'enregistre sous son empreinte ; retourne l'entrée du manifeste"""
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image_format = image.format
+            image.verify()
+    except Exception:
+        raise DownloadError("Le contenu reçu n'est pas une image")
+
+    digest = hashlib.sha256(data).hexdigest()
+    path = f"products/{digest[:20]}.{FORMAT_EXTENSIONS.get(image_format, 'jpg')}"
+    if not default_storage.exists(path):
+        path = default_storage.save(path, ContentFile(data))
+    return {'path': path, 'sha256': digest, 'size': len(data)}
+
+
 class Command(BaseCommand):
-    help = 'Télécharge et associe des images aux produits'
+    help = 'Télécharge et associe des images aux produits (parallèle, reprise possible)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8, help='Téléchargements simultanés')
+        parser.add_argument('--timeout', type=float, default=15.0)
+        parser.add_argument('--force', action='store_true',
+                            help='Ignorer le manifeste et remplacer les images existantes')
+        parser.add_argument('--manifest', default=os.path.join(settings.MEDIA_ROOT, 'products', '.download_manifest.json'))
+        parser.add_argument('--mirror', default='',
+                            help='Remplace schéma + hôte des URL (ex. http://127.0.0.1:8001 pour un serveur de test)')
 
-    def handle(self, *args, **kwargs):
+    def handle(self, *args, **options):
         self.stdout.write("📸 Début du téléchargement...")
-        
-        success_count = 0
-        error_count = 0
-        skipped_count = 0
-        
+
+        # Une seule requête : tous les produits, appariés en mémoire
+        products = list(Product.objects.only('id', 'name', 'main_image'))
+        by_url = {}
+        missing = skipped = 0
         for product_name, image_url in PRODUCT_IMAGES.items():
-            try:
-                # Chercher le produit
-                product = Product.objects.filter(name__icontains=product_name[:30]).first()
-                
-                if not product:
-                    error_count += 1
-                    continue
-                
-                # Vérifier si image existe déjà
-                if product.main_image:
-                    skipped_count += 1
+            needle = product_name[:30].casefold()
+            product = next((p for p in products if needle in p.name.casefold()), None)
+            if product is None:
+                missing += 1
+                continue
+            if product.main_image and not options['force']:
+                skipped += 1
+                continue
+            by_url.setdefault(self.rewrite(image_url, options['mirror']), []).append(product)
+
+        manifest = Manifest(options['manifest'])
+        fetcher = Fetcher(HostRateLimiter(), options['timeout'])
+        success_count = error_count = resumed = 0
+
+        pending = {}
+        for url, url_products in by_url.items():
+            entry = None if options['force'] else manifest.get(url)
+            if entry:
+                resumed += 1
+                success_count += self.assign(url_products, entry['path'])
+            else:
+                pending[url] = url_products
+
+        with ThreadPoolExecutor(max_workers=max(1, options['workers'])) as pool:
+            futures = {pool.submit(fetcher.get, url): url for url in pending}
+            for future in as_completed(futures):
+                url = futures[future]
+                names = ', '.join(p.name[:35] for p in pending[url])
+                try:
+                    entry = store_image(future.result())
+                except DownloadError as error:
+                    error_count += len(pending[url])
+                    self.stdout.write(self.style.ERROR(f"❌ {names} : {error}"))
                     continue
-                
-                self.stdout.write(f"📥 {product_name[:35]}...")
-                
-                # Télécharger directement en mémoire (pas de fichier temporaire)
-                req = urllib.request.Request(
-                    image_url,
-                    headers={'User-Agent': 'Mozilla/5.0'}
-                )
-                
-                with urllib.request.urlopen(req, timeout=10) as response:
-                    image_data = response.read()
-                
-                # Sauvegarder avec ContentFile (pas de fichier temporaire)
-                img_name = f"{product.slug}.jpg"
-                product.main_image.save(img_name, ContentFile(image_data), save=True)
-                
-                success_count += 1
-                self.stdout.write(self.style.SUCCESS(f"✅ {product_name[:35]}..."))
-                
-                # Petit délai pour éviter rate limiting
-                time.sleep(0.3)
-                
-            except Exception as e:
-                error_count += 1
-                self.stdout.write(self.style.ERROR(f"❌ {str(e)[:50]}"))
-        
-        self.stdout.write("\n" + "="*60)
+                manifest.add(url, entry)
+                success_count += self.assign(pending[url], entry['path'])
+                self.stdout.write(self.style.SUCCESS(f"✅ {names}"))
+
+        self.stdout.write("\n" + "=" * 60)
         self.stdout.write(self.style.SUCCESS(f"✅ Nouvelles images: {success_count}"))
-        self.stdout.write(f"⏭️  Déjà présentes: {skipped_count}")
+        self.stdout.write(f"♻️  Reprises depuis le manifeste: {resumed} URL")
+        self.stdout.write(f"⏭️  Déjà présentes: {skipped}")
+        self.stdout.write(f"🔍 Produits introuvables: {missing}")
         self.stdout.write(f"❌ Erreurs: {error_count}")
-        self.stdout.write(self.style.SUCCESS(f"📦 Total: {success_count + skipped_count}/50"))
-        self.stdout.write("="*60)
\ No newline at end of file
+        self.stdout.write(self.style.SUCCESS(f"📦 Total: {success_count + skipped}/{len(PRODUCT_IMAGES)}"))
+        self.stdout.write("=" * 60)
+
+    def rewrite(self, url, mirror):
+        if not mirror:
+            return url
+        parts = urlsplit(url)
+        return mirror.rstrip('/') + parts.path + (f'?{parts.query}' if parts.query else '')
+
+    def assign(self, products, path):
+        for product in products:
+            product.main_image.name = path
+            # save() : signaux (recherche, cache des cartes, déclinaisons d'images)
+            product.save(update_fields=['main_image', 'updated_at'])
+        return len(products)
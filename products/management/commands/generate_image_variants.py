@@ -0,0 +1,36 @@
+"""
+Génère les déclinaisons (card, detail, zoom en WebP/JPEG/AVIF) des images
+produit. Par défaut seulement les produits qui n'en ont pas encore :
+
+    python manage.py generate_image_variants
+    python manage.py generate_image_variants --all
+"""
+
+from django.core.management.base import BaseCommand
+from PIL import Image
+
+from products.images import generate_product_variants
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Génère les déclinaisons responsives des images produit'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Regénérer aussi les produits déjà traités')
+
+    def handle(self, *args, **options):
+        products = Product.objects.exclude(main_image='')
+        if not options['all']:
+            products = products.filter(image_variants={})
+
+        done = failed = 0
+        for product_id in products.values_list('id', flat=True).iterator():
+            try:
+                generate_product_variants(product_id)
+                done += 1
+            except (OSError, Image.DecompressionBombError):
+                failed += 1
+        self.stdout.write(self.style.SUCCESS(f"✅ {done} images déclinées"))
+        if failed:
+            self.stdout.write(self.style.WARNING(f"⚠️  {failed} images illisibles ou absentes"))
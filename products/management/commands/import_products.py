@@ -1,72 +1,76 @@
+"""
+Import du catalogue depuis un fichier CSV ou JSONL (moteur products/importer.py)
+
+    python manage.py import_products                          # produits_mykanty.csv
+    python manage.py import_products catalogue.jsonl --seller boutique
+    python manage.py import_products gros.csv --dry-run --errors-file erreurs.csv
+
+Colonnes reconnues : name, description, price, discount_price, category,
+stock (ou stock_quantity), brand, condition, sku, is_active, vendor_username.
+Une ligne sans vendor_username est attribuée au vendeur --seller.
+"""
+
 import csv
 import os
-from django.core.management.base import BaseCommand
-from products.models import Product, Category
+
+from django.core.management.base import BaseCommand, CommandError
+
 from accounts.models import User
+from products.importer import CHUNK_SIZE, detect_format, import_catalog, text_stream
+
+DEFAULT_SELLER = 'Abdoul-Hamid'
 
-CATEGORY_MAPPING = {
-    'Téléphonie': 'telephonie',
-    'Énergie Solaire': 'energie-solaire',
-    'Mode & Vêtements': 'mode-vetements',
-    'Bébé & Enfants': 'bebe-enfants',
-    'Alimentation': 'alimentation',
-    'Maison & Cuisine': 'maison-cuisine',
-    'Beauté & Santé': 'beaute-sante',
-    'Art & Artisanat': 'art-artisanat',
-    'Électronique': 'electronique',
-}
 
 class Command(BaseCommand):
-    help = 'Importe les produits depuis le fichier CSV'
-
-    def handle(self, *args, **kwargs):
-        self.stdout.write("🚀 Début de l'import...")
-        
-        try:
-            admin_user = User.objects.get(username='Abdoul-Hamid')
-        except User.DoesNotExist:
-            self.stdout.write("❌ Utilisateur admin non trouvé")
-            return
-        
-        products_created = 0
-        csv_file = 'produits_mykanty.csv'
-        
-        if not os.path.exists(csv_file):
-            self.stdout.write(f"❌ Fichier {csv_file} non trouvé")
-            return
-        
-        with open(csv_file, 'r', encoding='utf-8') as file:
-            reader = csv.DictReader(file)
-            
-            for row in reader:
-                try:
-                    category_slug = CATEGORY_MAPPING.get(row['category'])
-                    if not category_slug:
-                        continue
-                    
-                    category, _ = Category.objects.get_or_create(
-                        slug=category_slug,
-                        defaults={'name': row['category'], 'is_active': True}
-                    )
-                    
-                    product, created = Product.objects.update_or_create(
-                        name=row['name'],
-                        seller=admin_user,
-                        defaults={
-                            'description': row['description'],
-                            'price': float(row['price']),
-                            'category': category,
-                            'stock_quantity': int(row['stock']),
-                            'is_active': True,
-			    'sku': f"SKU-{row['name'][:20].upper().replace(' ', '-')}-{products_created}",
-                        }
-                    )
-                    
-                    if created:
-                        products_created += 1
-                        self.stdout.write(f"✅ {row['name'][:40]}...")
-                
-                except Exception as e:
-                    self.stdout.write(f"❌ Erreur: {str(e)}")
-        
-        self.stdout.write(f"\n✅ {products_created} produits créés!")
\ No newline at end of file
+    help = 'Importe les produits depuis un fichier CSV ou JSONL'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='produits_mykanty.csv', help='Fichier à importer')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help="Format (défaut : d'après l'extension)")
+        parser.add_argument('--seller', default=DEFAULT_SELLER,
+                            help='Vendeur des lignes sans vendor_username (défaut : %(default)s)')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='Lignes par transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Valider sans rien enregistrer')
+        parser.add_argument('--errors-file', help='Écrire les lignes en erreur dans ce fichier CSV')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f"❌ Fichier {path} non trouvé")
+
+        seller = User.objects.filter(username=options['seller']).first()
+        if seller is None:
+            self.stdout.write(self.style.WARNING(
+                f"⚠️  Vendeur {options['seller']} non trouvé : seules les lignes avec vendor_username seront importées"
+            ))
+
+        fmt = options['format'] or detect_format(path)
+        self.stdout.write(f"🚀 Début de l'import ({fmt.upper()}){' — simulation' if options['dry_run'] else ''}...")
+
+        with open(path, 'rb') as handle:
+            report = import_catalog(
+                text_stream(handle), fmt,
+                default_seller=seller,
+                dry_run=options['dry_run'],
+                chunk_size=max(1, options['chunk_size']),
+            )
+
+        for line, message in report.errors:
+            self.stdout.write(self.style.ERROR(f"❌ Ligne {line} : {message}"))
+        if report.error_count > len(report.errors):
+            self.stdout.write(self.style.ERROR(f"❌ ... et {report.error_count - len(report.errors)} autres erreurs"))
+
+        if options['errors_file'] and report.errors:
+            with open(options['errors_file'], 'w', encoding='utf-8', newline='') as output:
+                writer = csv.writer(output)
+                writer.writerow(['line', 'error'])
+                writer.writerows(report.errors)
+            self.stdout.write(f"📝 Erreurs écrites dans {options['errors_file']}")
+
+        verb = 'seraient' if options['dry_run'] else 'ont été'
+        self.stdout.write(self.style.SUCCESS(
+            f"\n✅ {report.rows} lignes lues en {report.elapsed:.2f} s ({report.rows_per_second:,.0f} lignes/s)"
+        ))
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {report.created} produits {verb} créés, {report.updated} mis à jour, {report.error_count} erreurs"
+        ))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from products.models import Category
+
+
+class Command(BaseCommand):
+    help = 'Recalcule le nombre de produits actifs de chaque catégorie'
+
+    def handle(self, *args, **kwargs):
+        updated = Category.refresh_product_counts()
+        self.stdout.write(self.style.SUCCESS(f"✅ Compteurs recalculés pour {updated} catégories"))
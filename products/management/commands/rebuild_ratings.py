@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from products import ratings
+
+
+class Command(BaseCommand):
+    help = 'Recalcule les notes moyennes des produits et des vendeurs'
+
+    def handle(self, *args, **kwargs):
+        products = ratings.refresh_product_ratings()
+        sellers = ratings.refresh_seller_ratings()
+        self.stdout.write(self.style.SUCCESS(f"✅ Notes recalculées pour {products} produits et {sellers} vendeurs"))
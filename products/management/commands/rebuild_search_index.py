@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from products.search import get_backend, rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Reconstruit l'index de recherche plein texte des produits"
+
+    def handle(self, *args, **kwargs):
+        backend = get_backend()
+        if backend is None:
+            self.stdout.write(self.style.WARNING("⚠️  Base sans moteur plein texte : rien à faire"))
+            return
+
+        total = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f"✅ {total} produits indexés ({backend.vendor})"))
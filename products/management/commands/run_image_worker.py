@@ -0,0 +1,96 @@
+"""
+Worker des traitements d'images (déclinaisons produit, preuves de paiement)
+
+    python manage.py run_image_worker              # tourne en continu
+    python manage.py run_image_worker --once       # vide la file puis s'arrête
+    python manage.py run_image_worker --status     # état de la file
+    python manage.py run_image_worker --processes 2
+    python manage.py run_image_worker --processes 0  # sans pool (tests, débogage)
+
+Procfile : `worker: python manage.py run_image_worker`
+"""
+
+import multiprocessing
+import os
+import time
+from contextlib import ExitStack
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from products import jobs
+from products.models import ImageJob
+
+
+def _init_process():
+    # Nécessaire avec la méthode « spawn » (Windows, macOS) ; sans effet avec « fork »
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'marketplace.settings')
+    django.setup()
+
+
+class Command(BaseCommand):
+    help = "Traite les tâches d'images en arrière-plan (pool multiprocessing)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=os.cpu_count() or 1,
+                            help='Nombre de processus (défaut : nombre de cœurs ; 0 : processus courant)')
+        parser.add_argument('--poll', type=float, default=2.0, help='Attente (s) quand la file est vide')
+        parser.add_argument('--once', action='store_true', help="S'arrêter quand la file est vide")
+        parser.add_argument('--status', action='store_true', help="Afficher l'état de la file et quitter")
+
+    def handle(self, *args, **options):
+        if options['status']:
+            self.show_status()
+            return
+
+        processes = max(0, options['processes'])
+        batch_size = max(1, processes) * 4
+        self.stdout.write(f"🚀 Worker images : {f'{processes} processus' if processes else 'processus courant'}")
+
+        with ExitStack() as stack:
+            if processes:
+                # Les processus enfants ne doivent pas hériter de la connexion du parent
+                connections.close_all()
+                pool = stack.enter_context(multiprocessing.Pool(processes, initializer=_init_process))
+                execute = lambda batch: pool.imap_unordered(jobs.run, batch)
+            else:
+                execute = lambda batch: (jobs.run(job, close_connections=False) for job in batch)
+
+            done = failed = 0
+            while True:
+                requeued = jobs.requeue_stale()
+                if requeued:
+                    self.stdout.write(self.style.WARNING(f"⚠️  {requeued} tâches abandonnées remises en attente"))
+
+                batch = jobs.claim(batch_size)
+                if not batch:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll'])
+                    continue
+
+                for job_id, error in execute(batch):
+                    job = jobs.finish(job_id, error)
+                    if job.status == 'done':
+                        done += 1
+                    elif job.status == 'failed':
+                        failed += 1
+                        self.stdout.write(self.style.ERROR(
+                            f"❌ {job} : {error.strip().splitlines()[-1]}"
+                        ))
+                    else:
+                        self.stdout.write(self.style.WARNING(
+                            f"🔁 {job} : nouvel essai après {job.run_after:%H:%M:%S}"
+                        ))
+
+        self.stdout.write(self.style.SUCCESS(f"✅ {done} tâches terminées, {failed} en échec définitif"))
+
+    def show_status(self):
+        counts = jobs.status_counts()
+        labels = dict(ImageJob.STATUS_CHOICES)
+        for status, count in counts.items():
+            self.stdout.write(f"{labels[status]:<12} {count:>8}")
+        for job in ImageJob.objects.filter(status='failed').order_by('-finished_at')[:10]:
+            last_line = job.last_error.strip().splitlines()[-1] if job.last_error else ''
+            self.stdout.write(self.style.ERROR(f"❌ {job} : {last_line}"))
@@ -0,0 +1,47 @@
+# Generated by Django 6.0.2 on 2026-10-18 09:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def create_search_index(apps, schema_editor):
+    from products.search import BACKENDS
+
+    backend_class = BACKENDS.get(schema_editor.connection.vendor)
+    if backend_class is None:
+        return
+    backend = backend_class()
+    with schema_editor.connection.cursor() as cursor:
+        backend.create_index(cursor)
+        backend.refresh(cursor)
+
+
+def drop_search_index(apps, schema_editor):
+    from products.search import BACKENDS
+
+    backend_class = BACKENDS.get(schema_editor.connection.vendor)
+    if backend_class is None:
+        return
+    with schema_editor.connection.cursor() as cursor:
+        backend_class().drop_index(cursor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0002_remove_category_parent_category_image_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSearchDocument',
+            fields=[
+                ('product', models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_document', serialize=False, to='products.product')),
+            ],
+            options={
+                'db_table': 'products_product_search',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
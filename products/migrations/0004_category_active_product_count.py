@@ -0,0 +1,30 @@
+# Generated by Django 6.0.2 on 2026-10-18 11:02
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_active_product_counts(apps, schema_editor):
+    Category = apps.get_model('products', 'Category')
+    Product = apps.get_model('products', 'Product')
+    active = Product.objects.filter(
+        category=OuterRef('pk'), is_active=True
+    ).order_by().values('category').annotate(n=Count('id')).values('n')
+    Category.objects.update(active_product_count=Coalesce(Subquery(active), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0003_product_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='active_product_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_active_product_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 6.0.2 on 2026-10-18 12:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_product_neighbors'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductTextVector',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='text_vector', serialize=False, to='products.product')),
+                ('signature', models.CharField(max_length=32)),
+                ('vector', models.BinaryField()),
+                ('updated_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='productneighbor',
+            name='kind',
+            field=models.CharField(choices=[('bought_together', 'Souvent achetés ensemble'), ('similar', 'Produits similaires')], max_length=20),
+        ),
+    ]
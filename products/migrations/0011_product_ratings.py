@@ -0,0 +1,54 @@
+# Generated by Django 6.0.2 on 2026-10-18 15:45
+
+from django.db import migrations, models
+from django.db.models import Avg, Count, DecimalField, OuterRef, Subquery, Value
+from django.db.models.functions import Cast, Coalesce
+
+RATING_FIELD = DecimalField(max_digits=3, decimal_places=2)
+
+
+def _average(reviews, group_by):
+    return Coalesce(
+        Subquery(
+            reviews.order_by().values(group_by).annotate(avg=Cast(Avg('rating'), RATING_FIELD)).values('avg'),
+            output_field=RATING_FIELD,
+        ),
+        Value(0, output_field=RATING_FIELD),
+    )
+
+
+def fill_ratings(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    Review = apps.get_model('products', 'Review')
+    SellerProfile = apps.get_model('accounts', 'SellerProfile')
+
+    approved = Review.objects.filter(product=OuterRef('pk'), is_approved=True)
+    count = approved.order_by().values('product').annotate(n=Count('id')).values('n')
+    Product.objects.update(
+        rating_avg=_average(approved, 'product'),
+        rating_count=Coalesce(Subquery(count), 0),
+    )
+    by_seller = Review.objects.filter(product__seller=OuterRef('user_id'), is_approved=True)
+    SellerProfile.objects.update(rating=_average(by_seller, 'product__seller'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_hot_query_indexes'),
+        ('products', '0010_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='rating_avg',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=3),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_ratings, migrations.RunPython.noop),
+    ]
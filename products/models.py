@@ -1,4 +1,7 @@
 from django.db import models
+from django.db.models import Case, Count, F, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce, NullIf
+from django.utils import timezone
 from accounts.models import User
 from django.utils.text import slugify
 
@@ -9,11 +12,28 @@ class Category(models.Model):
     icon = models.CharField(max_length=50, default='tag', help_text="Nom icône Font Awesome (ex: laptop, tshirt)")
     image = models.ImageField(upload_to='categories/', null=True, blank=True)
     is_active = models.BooleanField(default=True)
+    # Nombre de produits actifs, tenu à jour par products/signals.py
+    active_product_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
 
+    @classmethod
+    def refresh_product_counts(cls, category_ids=None):
+        """
+        Recalcule active_product_count en une requête UPDATE ... (SELECT COUNT)
+        pour les catégories données, ou toutes si category_ids est None.
+        """
+        active = Product.objects.filter(
+            category=OuterRef('pk'), is_active=True
+        ).order_by().values('category').annotate(n=Count('id')).values('n')
+        categories = cls.objects.all()
+        if category_ids is not None:
+            categories = categories.filter(pk__in=[pk for pk in category_ids if pk is not None])
+        return categories.update(active_product_count=Coalesce(Subquery(active), 0))
+
     class Meta:
         verbose_name = 'Catégorie'
         verbose_name_plural = 'Catégories'
@@ -42,10 +62,29 @@ class Product(models.Model):
     # Prix et stock
     price = models.DecimalField(max_digits=10, decimal_places=2)
     discount_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    # Colonnes calculées par la base (toujours à jour, y compris après bulk_create
+    # et update()) : tri et filtres de prix sur ce que paie réellement le client
+    effective_price = models.GeneratedField(
+        expression=Coalesce(NullIf('discount_price', Value(0)), 'price'),
+        output_field=models.DecimalField(max_digits=10, decimal_places=2),
+        db_persist=True,
+    )
+    discount_percentage = models.GeneratedField(
+        expression=Case(
+            When(discount_price__gt=0, discount_price__lt=F('price'),
+                 then=(F('price') - F('discount_price')) * Value(100) / F('price')),
+            default=Value(0),
+            output_field=models.DecimalField(max_digits=5, decimal_places=2),
+        ),
+        output_field=models.DecimalField(max_digits=5, decimal_places=2),
+        db_persist=True,
+    )
     stock_quantity = models.IntegerField(default=0)
     
     # Images
     main_image = models.ImageField(upload_to='products/')
+    # Déclinaisons générées par products/images.py (tailles, WebP/JPEG/AVIF)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     
     # Informations supplémentaires
     brand = models.CharField(max_length=200, blank=True)
@@ -55,6 +94,9 @@ class Product(models.Model):
     # Statistiques
     views_count = models.IntegerField(default=0)
     sales_count = models.IntegerField(default=0)
+    # Avis approuvés, tenus à jour par products/ratings.py (signaux sur Review)
+    rating_avg = models.DecimalField(max_digits=3, decimal_places=2, default=0, editable=False)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
     
     # États
     is_active = models.BooleanField(default=True)
@@ -90,6 +132,17 @@ class Product(models.Model):
         verbose_name = 'Produit'
         verbose_name_plural = 'Produits'
         ordering = ['-created_at']
+        indexes = [
+            # Catalogue et accueil : produits actifs, plus récents d'abord (clé created_at, id)
+            models.Index(fields=['-created_at', '-id'], condition=models.Q(is_active=True),
+                         name='product_active_newest_idx'),
+            # Filtre par catégorie et produits similaires de repli
+            models.Index(fields=['category', '-created_at', '-id'], condition=models.Q(is_active=True),
+                         name='product_active_category_idx'),
+            # Tri price_asc / price_desc (clé de pagination effective_price, id)
+            models.Index(fields=['effective_price', 'id'], name='product_effective_price_idx'),
+            models.Index(fields=['discount_percentage'], name='product_discount_idx'),
+        ]
 
 
 class ProductImage(models.Model):
@@ -134,3 +187,111 @@ class Review(models.Model):
         verbose_name = 'Avis'
         verbose_name_plural = 'Avis'
         ordering = ['-created_at']
+
+
+class ProductSearchDocument(models.Model):
+    """
+    Index plein texte d'un produit (table gérée par products/search.py :
+    FTS5 sous SQLite, tsvector + GIN sous PostgreSQL)
+    """
+    product = models.OneToOneField(
+        Product, on_delete=models.DO_NOTHING, primary_key=True,
+        related_name='search_document', db_constraint=False,
+    )
+
+    class Meta:
+        managed = False
+        db_table = 'products_product_search'
+
+
+class ProductCoPurchase(models.Model):
+    """
+    Matrice creuse des achats communs : nombre de commandes contenant à la
+    fois `product` et `other` (stockée dans les deux sens). La diagonale
+    (product = other) est le nombre de commandes contenant le produit.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    other = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ['product', 'other']
+
+
+class ProductNeighbor(models.Model):
+    """
+    Top K des produits voisins d'un produit, précalculé hors ligne
+    (products/recommendations.py) et lu en une requête indexée
+    """
+    KIND_CHOICES = [
+        ('bought_together', 'Souvent achetés ensemble'),
+        ('similar', 'Produits similaires'),
+    ]
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='neighbors')
+    neighbor = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='neighbor_of')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        unique_together = ['product', 'kind', 'rank']
+        ordering = ['product', 'kind', 'rank']
+
+
+class RecommendationCheckpoint(models.Model):
+    """Dernier identifiant traité par un calcul incrémental de recommandations"""
+    name = models.CharField(max_length=50, unique=True)
+    last_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} : {self.last_id}"
+
+
+class ProductTextVector(models.Model):
+    """
+    Vecteur texte (termes hachés, TF pondéré par champ) d'un produit, en
+    float32 brut. `signature` évite de revectoriser un texte inchangé.
+    """
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='text_vector')
+    signature = models.CharField(max_length=32)
+    vector = models.BinaryField()
+    updated_at = models.DateTimeField()
+
+
+class ImageJob(models.Model):
+    """
+    Traitement d'image en attente, exécuté hors requête par
+    `python manage.py run_image_worker` (products/jobs.py)
+    """
+    KIND_CHOICES = [
+        ('product_variants', 'Déclinaisons image produit'),
+        ('payment_proof', 'Compression preuve de paiement'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'En attente'),
+        ('running', 'En cours'),
+        ('done', 'Terminé'),
+        ('failed', 'Échec'),
+    ]
+
+    kind = models.CharField(max_length=30, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    last_error = models.TextField(blank=True)
+    run_after = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.object_id} ({self.get_status_display()})"
+
+    class Meta:
+        verbose_name = 'Tâche image'
+        verbose_name_plural = 'Tâches images'
+        ordering = ['-created_at']
+        indexes = [models.Index(fields=['status', 'run_after'])]
@@ -0,0 +1,208 @@
+"""
+Pagination par curseur (keyset) du catalogue
+
+Chaque tri est une clé composite terminée par l'id, ce qui rend l'ordre
+total : la page suivante est `WHERE (clé, id) > (dernière clé, dernier id)`
+servie par l'index, au lieu d'un OFFSET qui relit toutes les pages précédentes.
+
+Le curseur porte une empreinte de la clé de tri : un curseur obtenu avec un
+autre tri (ou falsifié) lève InvalidCursor au lieu de faire échouer la requête.
+
+`estimate_count` (page vendeur) : total exact pour les petits ensembles et
+estimé pour les grands (statistiques du planificateur PostgreSQL, sinon
+COUNT mis en cache). Le catalogue prend celui de ses facettes (products/facets.py).
+"""
+
+import base64
+import binascii
+import datetime
+import hashlib
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db import connections, models
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+PAGE_SIZE = 24
+
+# Tri -> clé composite (l'id départage toujours les égalités)
+SORT_KEYS = {
+    'newest': ('-created_at', '-id'),
+    '-created_at': ('-created_at', '-id'),
+    # Prix payé (promo comprise), colonne calculée et indexée
+    'price_asc': ('effective_price', 'id'),
+    'price_desc': ('-effective_price', '-id'),
+    'relevance': ('-search_rank', '-id'),
+}
+DEFAULT_SORT = 'newest'
+
+# Au-delà de ce nombre de lignes estimées, on n'exécute pas de COUNT(*)
+EXACT_COUNT_LIMIT = 10000
+COUNT_CACHE_TIMEOUT = 300
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _dump(value):
+    if isinstance(value, datetime.datetime):
+        return {'dt': value.isoformat()}
+    if isinstance(value, Decimal):
+        return {'dec': str(value)}
+    return value
+
+
+def _load(value):
+    if isinstance(value, dict):
+        if 'dt' in value:
+            parsed = parse_datetime(value['dt'])
+            if parsed is None:
+                raise InvalidCursor(value)
+            return parsed
+        if 'dec' in value:
+            try:
+                return Decimal(value['dec'])
+            except InvalidOperation:
+                raise InvalidCursor(value)
+        raise InvalidCursor(value)
+    return value
+
+
+def _keys_tag(keys):
+    return hashlib.md5(','.join(keys).encode()).hexdigest()[:8]
+
+
+def encode_cursor(values, keys):
+    payload = json.dumps({'k': _keys_tag(keys), 'v': [_dump(v) for v in values]}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, keys):
+    """Valeurs du curseur ; lève InvalidCursor s'il est illisible ou vient d'un autre tri"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, ValueError, UnicodeDecodeError):
+        raise InvalidCursor(cursor)
+    if not isinstance(payload, dict) or payload.get('k') != _keys_tag(keys):
+        raise InvalidCursor(cursor)
+    values = payload.get('v')
+    if not isinstance(values, list) or len(values) != len(keys):
+        raise InvalidCursor(cursor)
+    return [_load(v) for v in values]
+
+
+def _clean(model, keys, values):
+    """Convertit chaque valeur au type du champ de sa clé ; lève InvalidCursor"""
+    cleaned = []
+    for key, value in zip(keys, values):
+        try:
+            field = model._meta.get_field(key.lstrip('-'))
+        except FieldDoesNotExist:
+            # Annotation (search_rank) ou champ d'une relation : pas de contrôle
+            cleaned.append(value)
+            continue
+        if isinstance(field, models.GeneratedField):
+            field = field.output_field
+        try:
+            cleaned.append(None if value is None else field.to_python(value))
+        except (ValidationError, TypeError, ValueError):
+            raise InvalidCursor(value)
+    return cleaned
+
+
+def _after(keys, values):
+    """Condition « strictement après (values) » pour une clé composite"""
+    condition = Q()
+    for i, key in enumerate(keys):
+        field = key.lstrip('-')
+        lookup = 'lt' if key.startswith('-') else 'gt'
+        step = Q(**{f'{field}__{lookup}': values[i]})
+        for previous, value in zip(keys[:i], values[:i]):
+            step &= Q(**{previous.lstrip('-'): value})
+        condition |= step
+    return condition
+
+
+class KeysetPage:
+    def __init__(self, items, next_cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def _key_value(item, field):
+    # Instance de modèle, ou dict d'une projection values()
+    return item[field] if isinstance(item, dict) else getattr(item, field)
+
+
+def paginate(queryset, sort=DEFAULT_SORT, cursor=None, page_size=PAGE_SIZE):
+    """
+    Retourne une page de `queryset` triée selon `sort` (nom de SORT_KEYS ou
+    clé composite terminée par l'id). Le queryset peut être une projection
+    values() contenant les champs de la clé.
+    Lève InvalidCursor si le curseur est illisible ou vient d'un autre tri.
+    """
+    keys = sort if isinstance(sort, tuple) else SORT_KEYS.get(sort, SORT_KEYS[DEFAULT_SORT])
+    queryset = queryset.order_by(*keys)
+    if cursor:
+        values = _clean(queryset.model, keys, decode_cursor(cursor, keys))
+        queryset = queryset.filter(_after(keys, values))
+
+    items = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        last = items[-1]
+        next_cursor = encode_cursor([_key_value(last, key.lstrip('-')) for key in keys], keys)
+    return KeysetPage(items, next_cursor)
+
+
+def _planner_estimate(queryset):
+    """Nombre de lignes estimé par le planificateur PostgreSQL (sans exécuter la requête)"""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    sql, params = queryset.order_by().values('pk').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def estimate_count(queryset):
+    """
+    Retourne (total, estimé). Les petits ensembles sont comptés exactement ;
+    au-delà de EXACT_COUNT_LIMIT on utilise l'estimation du planificateur
+    ou un COUNT(*) gardé en cache COUNT_CACHE_TIMEOUT secondes.
+    """
+    queryset = queryset.order_by()
+    estimate = _planner_estimate(queryset)
+    if estimate is not None and estimate > EXACT_COUNT_LIMIT:
+        return estimate, True
+
+    sql, params = queryset.values('pk').query.sql_with_params()
+    key = 'catalog-count:' + hashlib.md5(f'{sql}|{params}'.encode()).hexdigest()
+    total = cache.get(key)
+    if total is not None:
+        return total, True
+
+    total = queryset.count()
+    if total > EXACT_COUNT_LIMIT:
+        cache.set(key, total, COUNT_CACHE_TIMEOUT)
+    return total, False
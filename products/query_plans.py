@@ -0,0 +1,57 @@
+"""
+Lecture des plans d'exécution (EXPLAIN) des requêtes fréquentes
+
+Utilisé par les tests (products, orders, accounts) pour vérifier qu'une
+requête ne revient pas à un parcours complet de table ou à un tri
+temporaire :
+
+- SQLite : « SCAN table » sans index, « USE TEMP B-TREE » ;
+- PostgreSQL : « Seq Scan », nœud « Sort ». La base de test est petite et
+  le planificateur préfère alors un parcours séquentiel ; on le décourage
+  (enable_seqscan/enable_sort = off, le temps de la transaction) pour
+  vérifier qu'un index utilisable EXISTE.
+
+Le plan ne dépend pas de l'existence des lignes : des ids quelconques suffisent.
+"""
+
+import re
+
+from django.db import connections, transaction
+
+# (motif, libellé, est un tri)
+SQLITE_PROBLEMS = [
+    (re.compile(r'\bSCAN (?!CONSTANT ROW)(?!.*\bUSING\b)'), 'parcours complet de table', False),
+    (re.compile(r'USE TEMP B-TREE'), 'tri temporaire', True),
+]
+POSTGRES_PROBLEMS = [
+    (re.compile(r'Seq Scan'), 'parcours séquentiel', False),
+    (re.compile(r'(^|->)\s*(Incremental )?Sort\b'), 'tri', True),
+]
+
+
+def explain(queryset):
+    """Plan texte de la requête (sans l'exécuter)"""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.explain()
+    with transaction.atomic(using=queryset.db), connection.cursor() as cursor:
+        cursor.execute('SET LOCAL enable_seqscan = off')
+        cursor.execute('SET LOCAL enable_sort = off')
+        return queryset.explain()
+
+
+def plan_problems(queryset, sort_allowed=False):
+    """
+    (plan, problèmes) : lignes du plan révélant un parcours complet ou un
+    tri. Un tri est toléré (`sort_allowed`) quand l'ensemble trié est borné
+    par un utilisateur (les commandes d'UN vendeur) : aucun index ne le
+    servirait mieux. Les décomptes se vérifient sans tri (order_by()).
+    """
+    plan = explain(queryset)
+    patterns = POSTGRES_PROBLEMS if connections[queryset.db].vendor == 'postgresql' else SQLITE_PROBLEMS
+    found = []
+    for line in plan.splitlines():
+        for pattern, label, is_sort in patterns:
+            if pattern.search(line) and not (is_sort and sort_allowed):
+                found.append(f'{label} : {line.strip()}')
+    return plan, found
@@ -0,0 +1,70 @@
+"""
+Notes moyennes dénormalisées (avis approuvés)
+
+Product.rating_avg / rating_count et SellerProfile.rating sont recalculés
+pour les seuls produits et vendeurs touchés, en une requête UPDATE ...
+(SELECT AVG, COUNT) chacun, à chaque création, modification ou suppression
+d'un avis approuvé (voir products/signals.py). Les cartes du catalogue
+affichent les étoiles sans aucune requête supplémentaire.
+
+`python manage.py rebuild_ratings` recalcule tout (après un import ou une
+modification en masse faite sans signaux).
+"""
+
+from django.db.models import Avg, Count, DecimalField, OuterRef, Subquery, Value
+from django.db.models.functions import Cast, Coalesce
+from django.utils import timezone
+
+from accounts.models import SellerProfile
+
+from .models import Product, Review
+
+RATING_FIELD = DecimalField(max_digits=3, decimal_places=2)
+
+
+def _average(reviews, group_by):
+    return Coalesce(
+        Subquery(
+            reviews.order_by().values(group_by).annotate(
+                avg=Cast(Avg('rating'), RATING_FIELD)
+            ).values('avg'),
+            output_field=RATING_FIELD,
+        ),
+        Value(0, output_field=RATING_FIELD),
+    )
+
+
+def refresh_product_ratings(product_ids=None):
+    """Recalcule rating_avg / rating_count des produits donnés (tous si None)"""
+    approved = Review.objects.filter(product=OuterRef('pk'), is_approved=True)
+    count = approved.order_by().values('product').annotate(n=Count('id')).values('n')
+    products = Product.objects.all()
+    if product_ids is not None:
+        products = products.filter(pk__in=[pk for pk in product_ids if pk is not None])
+    # updated_at change : les cartes en cache (étoiles) sont renouvelées
+    return products.update(
+        rating_avg=_average(approved, 'product'),
+        rating_count=Coalesce(Subquery(count), 0),
+        updated_at=timezone.now(),
+    )
+
+
+def refresh_seller_ratings(seller_ids=None):
+    """Recalcule SellerProfile.rating (moyenne de tous les avis approuvés du vendeur)"""
+    approved = Review.objects.filter(product__seller=OuterRef('user_id'), is_approved=True)
+    profiles = SellerProfile.objects.all()
+    if seller_ids is not None:
+        profiles = profiles.filter(user_id__in=[pk for pk in seller_ids if pk is not None])
+    # updated_at change : validateur de la page vendeur (products/conditional.py)
+    return profiles.update(rating=_average(approved, 'product__seller'), updated_at=timezone.now())
+
+
+def refresh_ratings(product_ids):
+    """Produits donnés puis leurs vendeurs"""
+    product_ids = [pk for pk in product_ids if pk is not None]
+    if not product_ids:
+        return
+    refresh_product_ratings(product_ids)
+    refresh_seller_ratings(set(
+        Product.objects.filter(pk__in=product_ids).values_list('seller_id', flat=True)
+    ))
@@ -0,0 +1,159 @@
+"""
+Recommandations « Souvent achetés ensemble »
+
+Le calcul est incrémental : seules les commandes créées depuis le dernier
+passage (RecommendationCheckpoint) sont lues. Leurs paires de produits
+sont ajoutées à la matrice creuse ProductCoPurchase par un
+INSERT ... ON CONFLICT DO UPDATE SET count = count + excluded.count,
+puis le top K n'est recalculé que pour les produits affectés : ceux des
+nouvelles commandes, et ceux qui ont déjà été achetés avec l'un d'eux (le
+score d'une paire dépend du total de chaque produit). Le résultat est
+identique à une reconstruction complète (--rebuild).
+
+Score de (a, b) : commandes(a, b) / sqrt(commandes(a) * commandes(b)),
+ce qui évite que les best-sellers soient voisins de tout le monde.
+"""
+
+import math
+from datetime import timedelta
+from collections import Counter, defaultdict
+from itertools import combinations
+
+from django.db import connection, transaction
+from django.db.models import F, Max
+from django.utils import timezone
+
+from orders.models import Order, OrderItem
+
+from .models import Product, ProductCoPurchase, ProductNeighbor, RecommendationCheckpoint
+
+KIND = 'bought_together'
+CHECKPOINT = 'co_purchase'
+TOP_K = 8
+# Un panier de plus de MAX_BASKET produits (grossiste, test) ne dit rien des affinités
+MAX_BASKET = 50
+BATCH = 1000
+# Les articles d'une commande sont créés après elle : on laisse les plus récentes mûrir
+SETTLE_DELAY = timedelta(minutes=5)
+
+
+def _new_baskets(last_id, until_id):
+    """Produits distincts de chaque commande d'id dans ]last_id, until_id]"""
+    baskets = defaultdict(set)
+    rows = OrderItem.objects.filter(
+        order_id__gt=last_id, order_id__lte=until_id, product__isnull=False,
+    ).exclude(order__status='cancelled').values_list('order_id', 'product_id')
+    for order_id, product_id in rows.iterator(chunk_size=BATCH):
+        baskets[order_id].add(product_id)
+    return baskets.values()
+
+
+def _pair_counts(baskets):
+    pairs = Counter()
+    for basket in baskets:
+        if len(basket) > MAX_BASKET:
+            continue
+        for product_id in basket:
+            pairs[(product_id, product_id)] += 1
+        for a, b in combinations(sorted(basket), 2):
+            pairs[(a, b)] += 1
+            pairs[(b, a)] += 1
+    return pairs
+
+
+def _add_pair_counts(pairs):
+    table = ProductCoPurchase._meta.db_table
+    rows = [(a, b, n) for (a, b), n in pairs.items()]
+    sql = (
+        f"INSERT INTO {table} (product_id, other_id, count) VALUES (%s, %s, %s) "
+        f"ON CONFLICT (product_id, other_id) DO UPDATE SET count = {table}.count + excluded.count"
+    )
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), BATCH):
+            cursor.executemany(sql, rows[start:start + BATCH])
+
+
+def _recompute_neighbors(product_ids, top_k):
+    """Recalcule le top K des produits donnés à partir de la matrice"""
+    product_ids = sorted(product_ids)
+    for start in range(0, len(product_ids), BATCH):
+        chunk = product_ids[start:start + BATCH]
+        rows = list(ProductCoPurchase.objects.filter(product_id__in=chunk).values_list(
+            'product_id', 'other_id', 'count'
+        ))
+        others = {other for _, other, _ in rows}
+        totals = dict(ProductCoPurchase.objects.filter(
+            product_id__in=others, other_id=F('product_id')
+        ).values_list('product_id', 'count'))
+
+        candidates = defaultdict(list)
+        for product_id, other_id, count in rows:
+            if product_id == other_id:
+                continue
+            norm = math.sqrt(totals.get(product_id, count) * totals.get(other_id, count))
+            candidates[product_id].append((count / norm, count, other_id))
+
+        neighbors = []
+        for product_id, scored in candidates.items():
+            scored.sort(key=lambda item: (-item[0], -item[1], item[2]))
+            for rank, (score, _, other_id) in enumerate(scored[:top_k], start=1):
+                neighbors.append(ProductNeighbor(
+                    product_id=product_id, neighbor_id=other_id, kind=KIND, rank=rank, score=score,
+                ))
+
+        ProductNeighbor.objects.filter(kind=KIND, product_id__in=chunk).delete()
+        ProductNeighbor.objects.bulk_create(neighbors, batch_size=BATCH)
+
+
+def _affected_products(touched):
+    """
+    Produits touchés et leurs voisins dans la matrice : le total d'un produit
+    touché entre dans le score de chacune de ses paires (matrice symétrique)
+    """
+    affected = set(touched)
+    touched = sorted(touched)
+    for start in range(0, len(touched), BATCH):
+        affected.update(ProductCoPurchase.objects.filter(
+            other_id__in=touched[start:start + BATCH],
+        ).values_list('product_id', flat=True).distinct())
+    return affected
+
+
+def update_co_purchases(top_k=TOP_K, rebuild=False):
+    """
+    Intègre les nouvelles commandes dans la matrice et met à jour le top K
+    des produits affectés. Retourne (commandes lues, produits recalculés).
+    """
+    with transaction.atomic():
+        checkpoint, _ = RecommendationCheckpoint.objects.select_for_update().get_or_create(name=CHECKPOINT)
+        if rebuild:
+            ProductCoPurchase.objects.all().delete()
+            ProductNeighbor.objects.filter(kind=KIND).delete()
+            checkpoint.last_id = 0
+
+        until_id = Order.objects.filter(
+            created_at__lte=timezone.now() - SETTLE_DELAY
+        ).aggregate(last=Max('id'))['last'] or 0
+        if until_id <= checkpoint.last_id:
+            return 0, 0
+
+        baskets = list(_new_baskets(checkpoint.last_id, until_id))
+        pairs = _pair_counts(baskets)
+        _add_pair_counts(pairs)
+        affected = _affected_products({a for a, _ in pairs})
+        _recompute_neighbors(affected, top_k)
+
+        checkpoint.last_id = until_id
+        checkpoint.save()
+    return len(baskets), len(affected)
+
+
+def neighbors(product, kind, limit=4):
+    """Voisins actifs de `product`, dans l'ordre du score (une requête indexée)"""
+    return Product.objects.filter(
+        neighbor_of__product=product, neighbor_of__kind=kind, is_active=True,
+    ).order_by('neighbor_of__rank')[:limit]
+
+
+def bought_together(product, limit=4):
+    return neighbors(product, KIND, limit)
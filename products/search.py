@@ -0,0 +1,253 @@
+"""
+Recherche plein texte des produits
+
+- SQLite : table virtuelle FTS5 (tokenizer unicode61, accents supprimés)
+- PostgreSQL : colonne tsvector pondérée + index GIN (français + unaccent)
+
+Dans les deux cas l'index est la table `products_product_search`
+(modèle non géré ProductSearchDocument), jointe au produit par product_id.
+Elle est tenue à jour par products/signals.py et reconstructible avec
+`python manage.py rebuild_search_index`.
+"""
+
+import re
+import unicodedata
+
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+
+SEARCH_TABLE = 'products_product_search'
+PG_CONFIG = 'mykanty_french'
+
+# Poids des colonnes : nom, marque, catégorie, description
+WEIGHTS = (10.0, 5.0, 3.0, 1.0)
+
+# Suffixes français retirés des termes de recherche (du plus long au plus court)
+FRENCH_SUFFIXES = (
+    'issements', 'issement', 'ations', 'ation', 'ements', 'ement',
+    'iques', 'ique', 'euses', 'euse', 'eurs', 'eur', 'ies', 'ie',
+    'es', 'e', 's', 'x',
+)
+MIN_STEM_LENGTH = 4
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def fold(text):
+    """Minuscules sans accents : 'Téléphonie' -> 'telephonie'"""
+    text = unicodedata.normalize('NFKD', text or '')
+    return ''.join(c for c in text if not unicodedata.combining(c)).lower()
+
+
+def stem(term):
+    """Racinisation légère : 'telephone' et 'telephonie' -> 'telephon'"""
+    for suffix in FRENCH_SUFFIXES:
+        if term.endswith(suffix) and len(term) - len(suffix) >= MIN_STEM_LENGTH:
+            return term[:-len(suffix)]
+    return term
+
+
+def tokenize(query):
+    """Découpe une requête utilisateur en termes normalisés"""
+    return [stem(t) for t in TOKEN_RE.findall(fold(query))]
+
+
+class SQLiteSearchBackend:
+    """Index FTS5 : rowid = product_id (colonne non indexée pour la jointure)"""
+
+    vendor = 'sqlite'
+
+    def create_index(self, cursor):
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+            "product_id UNINDEXED, name, brand, category, description, "
+            "tokenize = 'unicode61 remove_diacritics 2')"
+        )
+
+    def drop_index(self, cursor):
+        cursor.execute(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+
+    def refresh(self, cursor, where='1 = 1', params=()):
+        """(Ré)indexe les produits qui satisfont `where` (alias p)"""
+        cursor.execute(
+            f"DELETE FROM {SEARCH_TABLE} WHERE rowid IN "
+            f"(SELECT p.id FROM products_product p WHERE {where})",
+            params,
+        )
+        cursor.execute(
+            f"INSERT INTO {SEARCH_TABLE} "
+            "(rowid, product_id, name, brand, category, description) "
+            "SELECT p.id, p.id, p.name, p.brand, COALESCE(c.name, ''), p.description "
+            "FROM products_product p "
+            f"LEFT JOIN products_category c ON c.id = p.category_id WHERE {where}",
+            params,
+        )
+
+    def delete(self, cursor, product_ids):
+        cursor.executemany(
+            f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s",
+            [(pk,) for pk in product_ids],
+        )
+
+    def build_query(self, terms):
+        # "telephon"* "mobil"* -> ET implicite, recherche par préfixe
+        return ' '.join(f'"{t}"*' for t in terms)
+
+    def match_sql(self):
+        return f"{SEARCH_TABLE} MATCH %s"
+
+    def rank_sql(self, match):
+        # Poids de product_id (non indexé) puis des quatre colonnes texte ;
+        # bm25() est négatif : on l'inverse pour trier par score décroissant
+        weights = ', '.join(str(w) for w in (0.0,) + WEIGHTS)
+        return f"-bm25({SEARCH_TABLE}, {weights})", ()
+
+
+class PostgresSearchBackend:
+    """Table tsvector pondérée (A à D) avec index GIN"""
+
+    vendor = 'postgresql'
+
+    def create_index(self, cursor):
+        cursor.execute("CREATE EXTENSION IF NOT EXISTS unaccent")
+        cursor.execute(
+            "DO $$ BEGIN "
+            f"IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = '{PG_CONFIG}') THEN "
+            f"CREATE TEXT SEARCH CONFIGURATION {PG_CONFIG} (COPY = french); "
+            f"ALTER TEXT SEARCH CONFIGURATION {PG_CONFIG} "
+            "ALTER MAPPING FOR hword, hword_part, word WITH unaccent, french_stem; "
+            "END IF; END $$"
+        )
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {SEARCH_TABLE} ("
+            "product_id bigint PRIMARY KEY REFERENCES products_product (id) "
+            "ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+            "document tsvector NOT NULL)"
+        )
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS {SEARCH_TABLE}_document_gin "
+            f"ON {SEARCH_TABLE} USING gin (document)"
+        )
+
+    def drop_index(self, cursor):
+        cursor.execute(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+
+    def refresh(self, cursor, where='1 = 1', params=()):
+        """(Ré)indexe les produits qui satisfont `where` (alias p)"""
+        cursor.execute(
+            f"INSERT INTO {SEARCH_TABLE} (product_id, document) SELECT p.id, "
+            f"setweight(to_tsvector('{PG_CONFIG}', p.name), 'A') || "
+            f"setweight(to_tsvector('{PG_CONFIG}', p.brand), 'B') || "
+            f"setweight(to_tsvector('{PG_CONFIG}', COALESCE(c.name, '')), 'C') || "
+            f"setweight(to_tsvector('{PG_CONFIG}', p.description), 'D') "
+            "FROM products_product p "
+            f"LEFT JOIN products_category c ON c.id = p.category_id WHERE {where} "
+            "ON CONFLICT (product_id) DO UPDATE SET document = EXCLUDED.document",
+            params,
+        )
+
+    def delete(self, cursor, product_ids):
+        cursor.execute(
+            f"DELETE FROM {SEARCH_TABLE} WHERE product_id = ANY(%s)",
+            [list(product_ids)],
+        )
+
+    def build_query(self, terms):
+        # telephon:* & mobil:* -> la configuration française racinise aussi
+        return ' & '.join(f'{t}:*' for t in terms)
+
+    def match_sql(self):
+        return f"{SEARCH_TABLE}.document @@ to_tsquery('{PG_CONFIG}', %s)"
+
+    def rank_sql(self, match):
+        # ts_rank attend les poids dans l'ordre D, C, B, A
+        weights = ', '.join(str(w / WEIGHTS[0]) for w in reversed(WEIGHTS))
+        return (
+            f"ts_rank('{{{weights}}}'::float4[], {SEARCH_TABLE}.document, "
+            f"to_tsquery('{PG_CONFIG}', %s))"
+        ), (match,)
+
+
+BACKENDS = {
+    'sqlite': SQLiteSearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+def get_backend():
+    """Retourne le backend de la base courante, ou None (repli icontains)"""
+    backend_class = BACKENDS.get(connection.vendor)
+    return backend_class() if backend_class else None
+
+
+def index_products(product_ids):
+    """Ajoute ou remplace les produits donnés dans l'index"""
+    backend = get_backend()
+    if backend is None or not product_ids:
+        return
+    placeholders = ', '.join(['%s'] * len(product_ids))
+    with connection.cursor() as cursor:
+        backend.refresh(cursor, f'p.id IN ({placeholders})', list(product_ids))
+
+
+def index_category(category_id):
+    """Réindexe les produits d'une catégorie (renommage)"""
+    backend = get_backend()
+    if backend is None:
+        return
+    with connection.cursor() as cursor:
+        backend.refresh(cursor, 'p.category_id = %s', [category_id])
+
+
+def unindex_products(product_ids):
+    """Retire des produits de l'index"""
+    backend = get_backend()
+    if backend is None or not product_ids:
+        return
+    with connection.cursor() as cursor:
+        backend.delete(cursor, product_ids)
+
+
+def rebuild_index():
+    """Reconstruit l'index complet en une requête INSERT ... SELECT"""
+    backend = get_backend()
+    if backend is None:
+        return 0
+    with connection.cursor() as cursor:
+        backend.drop_index(cursor)
+        backend.create_index(cursor)
+        backend.refresh(cursor)
+        cursor.execute("SELECT COUNT(*) FROM products_product")
+        return cursor.fetchone()[0]
+
+
+def search_products(queryset, query, rank=True):
+    """
+    Filtre un queryset de produits par recherche plein texte.
+    Ajoute l'annotation `search_rank` (plus grand = plus pertinent).
+    """
+    terms = tokenize(query)
+    if not terms:
+        return queryset
+
+    backend = get_backend()
+    if backend is None:
+        # Base sans moteur plein texte : ancien comportement
+        return queryset.filter(
+            Q(name__icontains=query) |
+            Q(description__icontains=query) |
+            Q(category__name__icontains=query)
+        )
+
+    match = backend.build_query(terms)
+    # La jointure sur search_document fait piloter la requête par l'index
+    queryset = queryset.filter(search_document__isnull=False).filter(
+        RawSQL(backend.match_sql(), (match,), output_field=BooleanField())
+    )
+    if rank:
+        sql, params = backend.rank_sql(match)
+        queryset = queryset.annotate(
+            search_rank=RawSQL(sql, params, output_field=FloatField())
+        )
+    return queryset
@@ -0,0 +1,189 @@
+"""
+Signaux produits : synchronisation de l'index de recherche, des suggestions,
+des compteurs de produits actifs par catégorie, du cache des cartes, des
+déclinaisons d'images, des notes moyennes et de la signature du catalogue
+(GET conditionnel)
+"""
+
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import cards, conditional, jobs, ratings, search
+from .autocomplete import suggestion_index
+from .models import Category, Product, ProductTextVector, Review
+
+
+def _counted_state(instance):
+    """(catégorie, actif) tels que comptés dans Category.active_product_count"""
+    fields = instance.__dict__
+    if 'category_id' not in fields or 'is_active' not in fields:
+        return None  # Champs différés : état inconnu
+    return fields['category_id'], fields['is_active']
+
+
+@receiver(post_init, sender=Product)
+def remember_counted_state(sender, instance, **kwargs):
+    instance._counted_state = _counted_state(instance) if instance.pk else (None, False)
+
+
+def _image_name(instance):
+    image = instance.__dict__.get('main_image')
+    return str(image or '')
+
+
+@receiver(post_init, sender=Product)
+def remember_image_name(sender, instance, **kwargs):
+    instance._image_name = _image_name(instance)
+
+
+@receiver(post_save, sender=Product)
+def generate_image_variants_on_upload(sender, instance, raw=False, **kwargs):
+    if raw or 'main_image' not in instance.__dict__:
+        return
+    name = _image_name(instance)
+    if name and name != instance._image_name:
+        # Traité par le worker (run_image_worker), pas dans la requête
+        jobs.enqueue('product_variants', instance.pk)
+    instance._image_name = name
+
+
+@receiver(post_save, sender=Product)
+def index_product_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    search.index_products([instance.pk])
+    suggestion_index.update_product(instance)
+
+
+@receiver(post_save, sender=Product)
+def update_category_counts_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = instance._counted_state
+    current = _counted_state(instance)
+    if previous is None or current is None or previous != current:
+        # Ancienne et nouvelle catégorie (changement de catégorie ou d'activation)
+        affected = {state[0] for state in (previous, current) if state is not None}
+        affected.add(instance.category_id)
+        Category.refresh_product_counts(affected)
+    instance._counted_state = current
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product_on_delete(sender, instance, **kwargs):
+    search.unindex_products([instance.pk])
+    suggestion_index.remove_product(instance.pk)
+
+
+@receiver(post_delete, sender=Product)
+def invalidate_card_on_delete(sender, instance, **kwargs):
+    cards.invalidate_cards([(instance.pk, instance.updated_at)])
+
+
+@receiver(post_delete, sender=Product)
+def update_category_counts_on_delete(sender, instance, **kwargs):
+    if instance.category_id is not None:
+        Category.refresh_product_counts([instance.category_id])
+
+
+@receiver(post_save, sender=Category)
+def reindex_category_products(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    suggestion_index.update_category(instance)
+    # Le nom de la catégorie fait partie du document indexé et des cartes
+    if not created:
+        search.index_category(instance.pk)
+        cards.invalidate_category_cards(instance.pk)
+        # Revectorisés au prochain build_similar_products
+        ProductTextVector.objects.filter(product__category=instance).delete()
+
+
+@receiver(pre_delete, sender=Category)
+def invalidate_cards_before_category_delete(sender, instance, **kwargs):
+    # Les produits passent à category=NULL sans changer updated_at
+    cards.invalidate_category_cards(instance.pk)
+
+
+@receiver(post_delete, sender=Category)
+def remove_category_suggestion(sender, instance, **kwargs):
+    suggestion_index.remove_category(instance.pk)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_catalog_signature(sender, raw=False, **kwargs):
+    # Sinon recalculée au plus tard après CATALOG_SIGNATURE_TTL secondes
+    if not raw:
+        conditional.invalidate_catalog_signature()
+
+
+# Champs d'un vendeur visibles dans le catalogue
+SELLER_VISIBLE_FIELDS = ('username', 'first_name', 'last_name', 'is_seller', 'is_active')
+
+
+def _seller_state(instance):
+    fields = instance.__dict__
+    return {name: fields.get(name) for name in SELLER_VISIBLE_FIELDS}
+
+
+@receiver(post_init, sender=get_user_model())
+def remember_seller_state(sender, instance, **kwargs):
+    instance._seller_state = _seller_state(instance)
+
+
+@receiver(post_save, sender=get_user_model())
+def invalidate_catalog_signature_for_seller(sender, instance, created=False, raw=False, update_fields=None,
+                                            **kwargs):
+    # Une connexion (last_login) ou un champ privé ne change pas le catalogue
+    if raw or (update_fields is not None and not set(update_fields) & set(SELLER_VISIBLE_FIELDS)):
+        return
+    previous, state = instance._seller_state, _seller_state(instance)
+    instance._seller_state = state
+    if (created or state != previous) and (state['is_seller'] or previous['is_seller']):
+        conditional.invalidate_catalog_signature()
+
+
+@receiver(post_save, sender=get_user_model())
+def invalidate_seller_cards(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    # Les cartes affichent le nom du vendeur ; une connexion (last_login) ne change rien
+    if raw or created or (update_fields is not None and 'username' not in update_fields):
+        return
+    cards.invalidate_seller_cards(instance.pk)
+
+
+def _rated_state(instance):
+    """(produit, note) tels que comptés dans les moyennes, None si non approuvé"""
+    fields = instance.__dict__
+    if not {'product_id', 'rating', 'is_approved'} <= fields.keys():
+        return ()  # Champs différés : état inconnu
+    return (fields['product_id'], fields['rating']) if fields['is_approved'] else None
+
+
+@receiver(post_init, sender=Review)
+def remember_rated_state(sender, instance, **kwargs):
+    instance._rated_state = _rated_state(instance) if instance.pk else None
+
+
+@receiver(post_save, sender=Review)
+def update_ratings_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = instance._rated_state
+    current = _rated_state(instance)
+    if previous != current:
+        # Ancien et nouveau produit (avis déplacé, approuvé, retiré, note modifiée)
+        affected = {state[0] for state in (previous, current) if state}
+        if previous == () or current == ():
+            affected.add(instance.product_id)
+        ratings.refresh_ratings(affected)
+    instance._rated_state = current
+
+
+@receiver(post_delete, sender=Review)
+def update_ratings_on_delete(sender, instance, **kwargs):
+    if instance.is_approved:
+        ratings.refresh_ratings([instance.product_id])
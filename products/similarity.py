@@ -0,0 +1,267 @@
+"""
+Produits similaires par le contenu (TF-IDF sur termes hachés, NumPy)
+
+1. Vectorisation incrémentale : seuls les produits sans vecteur ou modifiés
+   depuis leur vectorisation sont relus ; un texte inchangé (même
+   signature) n'est pas recalculé. Chaque terme (nom, marque, catégorie,
+   description, normalisés comme la recherche) est haché dans DIMENSIONS
+   colonnes avec un poids par champ.
+2. Voisins : la matrice des produits actifs est pondérée par l'IDF puis
+   normalisée ; les similarités cosinus sont des produits matriciels par
+   blocs de BLOCK lignes, dont on garde le top K (argpartition).
+
+En incrémental, seuls les produits revectorisés sont recalculés ; ils sont
+aussi insérés dans les listes des produits qu'ils dépassent. --rebuild
+recalcule tout (l'IDF dérive lentement avec le catalogue).
+"""
+
+import hashlib
+import zlib
+from collections import defaultdict
+
+import numpy as np
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Product, ProductNeighbor, ProductTextVector
+from .search import tokenize
+
+KIND = 'similar'
+TOP_K = 8
+DIMENSIONS = 512
+BLOCK = 256
+BATCH = 1000
+
+# Poids des champs dans le vecteur
+FIELD_WEIGHTS = (('name', 3.0), ('brand', 2.0), ('category', 2.0), ('description', 1.0))
+MIN_TERM_LENGTH = 3
+STOP_WORDS = {
+    'les', 'des', 'une', 'pour', 'avec', 'dans', 'sur', 'par', 'est', 'qui',
+    'que', 'aux', 'votre', 'vos', 'nos', 'notre', 'tres', 'plus', 'sans', 'tout',
+}
+
+
+def _fields(product):
+    return {
+        'name': product.name,
+        'brand': product.brand,
+        'category': product.category.name if product.category else '',
+        'description': product.description,
+    }
+
+
+def text_signature(fields):
+    raw = '\x1f'.join(fields[name] or '' for name, _ in FIELD_WEIGHTS)
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def vectorize(fields):
+    """Vecteur float32 des termes hachés (TF sous-linéaire pondéré par champ)"""
+    counts = defaultdict(float)
+    for name, weight in FIELD_WEIGHTS:
+        for term in tokenize(fields[name] or ''):
+            if len(term) < MIN_TERM_LENGTH or term in STOP_WORDS or term.isdigit():
+                continue
+            counts[term] += weight
+
+    vector = np.zeros(DIMENSIONS, dtype=np.float32)
+    for term, count in counts.items():
+        # crc32 est stable d'un processus à l'autre (contrairement à hash())
+        bucket = zlib.crc32(term.encode())
+        sign = 1.0 if bucket & 0x80000000 else -1.0
+        vector[bucket % DIMENSIONS] += sign * (1.0 + np.log(count))
+    return vector
+
+
+def update_vectors(rebuild=False):
+    """(Re)vectorise les produits modifiés ; retourne les ids dont le texte a changé"""
+    products = Product.objects.select_related('category').only(
+        'id', 'name', 'brand', 'description', 'updated_at', 'category__name',
+    )
+    if not rebuild:
+        products = products.filter(
+            Q(text_vector__isnull=True) | Q(updated_at__gt=F('text_vector__updated_at'))
+        )
+
+    changed = []
+    now = timezone.now()
+    chunk = []
+    for product in products.iterator(chunk_size=BATCH):
+        chunk.append(product)
+        if len(chunk) >= BATCH:
+            changed += _vectorize_chunk(chunk, rebuild, now)
+            chunk = []
+    changed += _vectorize_chunk(chunk, rebuild, now)
+    return changed
+
+
+def _vectorize_chunk(products, rebuild, now):
+    """Vectorise un lot de produits ; seules leurs signatures sont relues"""
+    if not products:
+        return []
+    existing = {} if rebuild else dict(ProductTextVector.objects.filter(
+        product_id__in=[product.pk for product in products],
+    ).values_list('product_id', 'signature'))
+
+    changed = []
+    unchanged = []
+    vectors = []
+    for product in products:
+        fields = _fields(product)
+        signature = text_signature(fields)
+        if existing.get(product.pk) == signature:
+            # Modification hors texte (prix, stock...) : on avance seulement la date
+            unchanged.append(product.pk)
+            continue
+        vectors.append(ProductTextVector(
+            product_id=product.pk, signature=signature,
+            vector=vectorize(fields).tobytes(), updated_at=now,
+        ))
+        changed.append(product.pk)
+    _save_vectors(vectors)
+    if unchanged:
+        ProductTextVector.objects.filter(product_id__in=unchanged).update(updated_at=now)
+    return changed
+
+
+def _save_vectors(vectors):
+    if vectors:
+        ProductTextVector.objects.bulk_create(
+            vectors, update_conflicts=True, unique_fields=['product'],
+            update_fields=['signature', 'vector', 'updated_at'],
+        )
+
+
+def load_matrix():
+    """(ids, matrice TF-IDF normalisée) des produits actifs, lus par lots de BATCH vecteurs"""
+    vectors = ProductTextVector.objects.filter(product__is_active=True).order_by('product_id')
+    count = vectors.count()
+    ids = np.zeros(count, dtype=np.int64)
+    matrix = np.zeros((count, DIMENSIONS), dtype=np.float32)
+    row = -1
+    for row, (pk, vector) in enumerate(vectors.values_list('product_id', 'vector').iterator(chunk_size=BATCH)):
+        if row >= count:  # produit ajouté entre-temps
+            break
+        ids[row] = pk
+        matrix[row] = np.frombuffer(bytes(vector), dtype=np.float32)
+    ids, matrix = ids[:row + 1], matrix[:row + 1]
+    if not len(ids):
+        return ids, matrix
+
+    document_frequency = np.count_nonzero(matrix, axis=0)
+    idf = np.log((1 + len(ids)) / (1 + document_frequency)) + 1.0
+    matrix *= idf.astype(np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+    return ids, matrix
+
+
+def top_neighbors(ids, matrix, rows, top_k):
+    """{id: [(score, id voisin), ...]} pour les lignes `rows` de la matrice"""
+    result = {}
+    k = min(top_k, len(ids) - 1)
+    if k <= 0:
+        return result
+    for start in range(0, len(rows), BLOCK):
+        block = rows[start:start + BLOCK]
+        scores = matrix[block] @ matrix.T
+        scores[np.arange(len(block)), block] = -1.0  # pas soi-même
+        best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        for line, row in enumerate(block):
+            order = best[line][np.argsort(-scores[line, best[line]])]
+            result[int(ids[row])] = [
+                (float(scores[line, column]), int(ids[column]))
+                for column in order if scores[line, column] > 0
+            ]
+    return result
+
+
+def _store(neighbors):
+    product_ids = list(neighbors)
+    for start in range(0, len(product_ids), BATCH):
+        chunk = product_ids[start:start + BATCH]
+        ProductNeighbor.objects.filter(kind=KIND, product_id__in=chunk).delete()
+        ProductNeighbor.objects.bulk_create([
+            ProductNeighbor(product_id=pk, neighbor_id=other, kind=KIND, rank=rank, score=score)
+            for pk in chunk
+            for rank, (score, other) in enumerate(neighbors[pk], start=1)
+        ], batch_size=BATCH)
+
+
+def _stored_floors(ids, top_k):
+    """Score du dernier voisin gardé (rang top_k) par ligne de la matrice ; -inf si la liste est incomplète"""
+    floors = np.full(len(ids), -np.inf, dtype=np.float32)
+    stored = ProductNeighbor.objects.filter(kind=KIND, rank=top_k).values_list('product_id', 'score')
+    for pk, score in stored.iterator(chunk_size=BATCH):
+        row = np.searchsorted(ids, pk)
+        if row < len(ids) and ids[row] == pk:
+            floors[row] = score
+    return floors
+
+
+def _merge_into_existing(ids, matrix, changed_rows, top_k):
+    """Insère les produits modifiés dans les listes des autres produits qu'ils dépassent"""
+    k = min(top_k, len(changed_rows))
+    if k <= 0:
+        return {}
+    # Pour chaque produit (colonne), les k meilleurs produits modifiés : k x N au plus
+    best_scores = np.full((k, len(ids)), -np.inf, dtype=np.float32)
+    best_rows = np.full((k, len(ids)), -1, dtype=np.int64)
+    for start in range(0, len(changed_rows), BLOCK):
+        block = changed_rows[start:start + BLOCK]
+        scores = matrix[block] @ matrix.T
+        scores[:, changed_rows] = -np.inf  # ni soi-même ni un autre produit modifié
+        scores[scores <= 0] = -np.inf
+        scores = np.vstack([best_scores, scores])
+        rows = np.vstack([best_rows, np.repeat(block[:, None], len(ids), axis=1)])
+        keep = np.argpartition(-scores, k - 1, axis=0)[:k]
+        best_scores = np.take_along_axis(scores, keep, axis=0)
+        best_rows = np.take_along_axis(rows, keep, axis=0)
+
+    # Seules les listes dont le dernier voisin est dépassé sont relues, par lots
+    floors = _stored_floors(ids, top_k)
+    beaten = np.nonzero(best_scores.max(axis=0) > floors)[0]
+    updated = {}
+    for start in range(0, len(beaten), BATCH):
+        columns = beaten[start:start + BATCH]
+        current = defaultdict(list)
+        rows = ProductNeighbor.objects.filter(
+            kind=KIND, product_id__in=[int(ids[column]) for column in columns],
+        ).order_by('product_id', 'rank')
+        for pk, other, score in rows.values_list('product_id', 'neighbor_id', 'score'):
+            current[pk].append((score, other))
+        for column in columns:
+            target = int(ids[column])
+            better = [
+                (float(score), int(ids[row]))
+                for score, row in zip(best_scores[:, column], best_rows[:, column])
+                if score > floors[column]
+            ]
+            sources = {source for _, source in better}
+            entries = [e for e in current[target] if e[1] not in sources] + better
+            entries.sort(key=lambda e: -e[0])
+            updated[target] = entries[:top_k]
+    # Un produit modifié dont le score a baissé reste au pire jusqu'au prochain --rebuild
+    return updated
+
+
+def update_similar_products(top_k=TOP_K, rebuild=False):
+    """Retourne (produits revectorisés, listes de voisins réécrites)"""
+    with transaction.atomic():
+        changed = update_vectors(rebuild=rebuild)
+        if not changed:
+            return 0, 0
+        ids, matrix = load_matrix()
+        if rebuild:
+            ProductNeighbor.objects.filter(kind=KIND).delete()
+            rows = np.arange(len(ids))
+            neighbors = top_neighbors(ids, matrix, rows, top_k)
+        else:
+            position = {int(pk): row for row, pk in enumerate(ids)}
+            rows = np.array([position[pk] for pk in changed if pk in position], dtype=np.int64)
+            neighbors = _merge_into_existing(ids, matrix, rows, top_k)
+            neighbors.update(top_neighbors(ids, matrix, rows, top_k))
+        _store(neighbors)
+    return len(changed), len(neighbors)
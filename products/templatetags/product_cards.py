@@ -0,0 +1,29 @@
+from decimal import Decimal
+
+from django import template
+from django.utils.safestring import mark_safe
+
+from products.cards import render_cards
+
+register = template.Library()
+
+
+@register.simple_tag
+def product_cards(products, template_name='includes/product_card.html'):
+    """{% product_cards products 'includes/product_card.html' %} : cartes depuis le cache"""
+    return mark_safe(render_cards(products, template_name))
+
+
+@register.filter
+def rating_stars(value):
+    """Note (0 à 5) -> ['full', 'full', 'full', 'half', 'empty'] pour les icônes"""
+    rating = Decimal(value or 0)
+    stars = []
+    for position in range(1, 6):
+        if rating >= position - Decimal('0.25'):
+            stars.append('full')
+        elif rating >= position - Decimal('0.75'):
+            stars.append('half')
+        else:
+            stars.append('empty')
+    return stars
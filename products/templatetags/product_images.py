@@ -0,0 +1,60 @@
+from django import template
+from django.core.files.storage import default_storage
+from django.utils.html import format_html, format_html_join
+
+from products.images import current_sizes
+
+register = template.Library()
+
+# Largeur affichée de chaque usage, pour que le navigateur choisisse dans srcset
+SIZES = {
+    'card': '(max-width: 600px) 50vw, 260px',
+    'detail': '(max-width: 768px) 100vw, 600px',
+    'zoom': '100vw',
+}
+MIME_TYPES = {'avif': 'image/avif', 'webp': 'image/webp', 'jpeg': 'image/jpeg'}
+
+
+def _srcset(variants, fmt):
+    # Une largeur par candidat (plusieurs tailles peuvent partager un fichier)
+    by_width = {variant['width']: variant[fmt] for variant in variants.values() if fmt in variant}
+    return ', '.join(
+        f"{default_storage.url(path)} {width}w" for width, path in sorted(by_width.items())
+    )
+
+
+@register.simple_tag
+def product_image(product, size='card', css_class='', element_id='', loading='lazy'):
+    """
+    {% product_image product 'card' %} : <picture> avec srcset AVIF/WebP/JPEG
+    si les déclinaisons de l'image actuelle existent, sinon l'image d'origine.
+    """
+    alt = product.name
+    attrs = format_html_join(
+        '', ' {}="{}"', ((name, value) for name, value in (('class', css_class), ('id', element_id)) if value)
+    )
+    variants = current_sizes(product.image_variants, product.main_image.name)
+    if not variants:
+        if not product.main_image:
+            return ''
+        return format_html(
+            '<img src="{}" alt="{}"{} loading="{}">',
+            product.main_image.url, alt, attrs, loading,
+        )
+
+    fallback = variants.get(size) or next(iter(variants.values()))
+    sources = format_html_join(
+        '', '<source type="{}" srcset="{}" sizes="{}">',
+        (
+            (MIME_TYPES[fmt], _srcset(variants, fmt), SIZES.get(size, '100vw'))
+            for fmt in ('avif', 'webp') if fmt in fallback
+        ),
+    )
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}" '
+        'alt="{}"{} loading="{}" decoding="async"></picture>',
+        sources,
+        default_storage.url(fallback['jpeg']), _srcset(variants, 'jpeg'), SIZES.get(size, '100vw'),
+        fallback['width'], fallback['height'],
+        alt, attrs, loading,
+    )
@@ -1,3 +1,1112 @@
-from django.test import TestCase
+import io
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+from datetime import timedelta
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
-# Create your tests here.
+from django.core.cache import cache, caches
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+
+from accounts.models import SellerProfile, User
+
+from . import cards, conditional, jobs, recommendations, views_counter
+from .api import product_image_url
+from .autocomplete import INDEX_TTL, SuggestionIndex, suggestion_index
+from .facets import FacetFilters, compute_facets
+from .forms import ProductSearchForm
+from .importer import import_catalog
+from .models import Category, ImageJob, Product, ProductNeighbor, ProductSearchDocument, Review
+from .pagination import SORT_KEYS, InvalidCursor, encode_cursor, paginate
+from .query_plans import plan_problems
+from .search import search_products
+from .templatetags.product_images import product_image
+
+
+class CatalogImportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create(username='vendeur', is_seller=True)
+        cls.category = Category.objects.create(name='Téléphonie', slug='telephonie')
+        cls.product = Product.objects.create(
+            seller=cls.seller, category=cls.category, name='Galaxy A14', slug='galaxy-a14',
+            description='Smartphone', price=Decimal('185000'), discount_price=Decimal('150000'),
+            stock_quantity=7, brand='Samsung', condition='refurbished', sku='SAM-A14',
+        )
+
+    def _import(self, content):
+        return import_catalog(io.StringIO(content), 'csv', default_seller=self.seller)
+
+    def test_partial_file_keeps_absent_columns(self):
+        """Réimport sans promo, marque, état ni stock : ces champs restent intacts"""
+        report = self._import('name,price,sku\nGalaxy A14,190000,SAM-A14\n')
+
+        self.assertEqual((report.updated, report.error_count), (1, 0))
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.price, Decimal('190000'))
+        self.assertEqual(self.product.discount_price, Decimal('150000'))
+        self.assertEqual(self.product.brand, 'Samsung')
+        self.assertEqual(self.product.condition, 'refurbished')
+        self.assertEqual(self.product.stock_quantity, 7)
+        self.assertEqual(self.product.category_id, self.category.pk)
+        self.assertEqual(self.product.description, 'Smartphone')
+        self.assertTrue(self.product.is_active)
+
+    def test_present_columns_are_updated(self):
+        """Une colonne présente, même vide, est réécrite"""
+        self._import('name,price,stock,brand,discount_price,vendor_username\nGalaxy A14,185000,3,,,vendeur\n')
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 3)
+        self.assertEqual(self.product.brand, '')
+        self.assertIsNone(self.product.discount_price)
+        self.assertEqual(self.product.condition, 'refurbished')
+
+
+class CursorPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seller = User.objects.create(username='vendeur', is_seller=True)
+        Product.objects.bulk_create([
+            Product(seller=seller, name=f'Produit {i}', slug=f'produit-{i}', description='-',
+                    price=Decimal(1000 + i), stock_quantity=1, sku=f'SKU-{i}')
+            for i in range(5)
+        ])
+
+    def _cursor(self, sort):
+        return paginate(Product.objects.all(), sort, page_size=2).next_cursor
+
+    def test_cursor_follows_its_sort(self):
+        first = paginate(Product.objects.all(), 'price_asc', page_size=2)
+        second = paginate(Product.objects.all(), 'price_asc', first.next_cursor, page_size=2)
+        self.assertEqual([p.name for p in second], ['Produit 2', 'Produit 3'])
+
+    def test_cursor_from_another_sort_is_rejected(self):
+        for sort, other in [('newest', 'price_asc'), ('price_asc', 'newest'), ('price_desc', 'price_asc')]:
+            with self.subTest(sort=sort, cursor=other), self.assertRaises(InvalidCursor):
+                paginate(Product.objects.all(), sort, self._cursor(other), page_size=2)
+
+    def test_forged_cursor_is_rejected(self):
+        cursor = encode_cursor(['pas une date', 'x'], SORT_KEYS['newest'])
+        with self.assertRaises(InvalidCursor):
+            paginate(Product.objects.all(), 'newest', cursor)
+
+    def test_catalog_page_ignores_cross_sort_cursor(self):
+        """Curseur d'un autre tri : première page au lieu d'une erreur 500"""
+        for sort, other in [('newest', 'price_asc'), ('price_asc', 'newest')]:
+            with self.subTest(sort=sort):
+                response = self.client.get('/products/', {'sort': sort, 'cursor': self._cursor(other)})
+                self.assertEqual(response.status_code, 200)
+
+    def test_sort_keys_end_with_id(self):
+        for sort, keys in SORT_KEYS.items():
+            self.assertEqual(keys[-1].lstrip('-'), 'id', sort)
+
+
+class CatalogApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seller = User.objects.create(username='vendeur', is_seller=True)
+        Product.objects.bulk_create([
+            Product(seller=seller, name=f'Produit {i}', slug=f'produit-{i}', description='-',
+                    price=Decimal(1000 + i), stock_quantity=1, sku=f'SKU-{i}')
+            for i in range(5)
+        ])
+
+    def _next(self, sort):
+        response = self.client.get('/api/v1/products/', {'sort': sort, 'limit': 2, 'fields': 'id'})
+        self.assertEqual(response.status_code, 200)
+        return response.json()['next']
+
+    def test_cursor_pages_through(self):
+        response = self.client.get('/api/v1/products/', {'sort': 'price_asc', 'limit': 2, 'fields': 'name',
+                                                        'cursor': self._next('price_asc')})
+        self.assertEqual([row['name'] for row in response.json()['results']], ['Produit 2', 'Produit 3'])
+
+    def test_cross_sort_cursor_is_a_bad_request(self):
+        for sort, other in [('newest', 'price_asc'), ('price_asc', 'newest'), ('price_desc', 'newest')]:
+            with self.subTest(sort=sort, cursor=other):
+                response = self.client.get('/api/v1/products/', {'sort': sort, 'cursor': self._next(other)})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.json())
+
+
+class ProductImageVariantTests(TestCase):
+    VARIANTS = {
+        'source': 'products/ancienne.jpg',
+        'sizes': {'card': {'width': 320, 'height': 320, 'jpeg': 'products/derived/aa/ancienne-320.jpg'}},
+    }
+
+    def _product(self, main_image):
+        return Product(name='Lampe', main_image=main_image, image_variants=self.VARIANTS)
+
+    def test_variants_of_current_image_are_used(self):
+        html = product_image(self._product('products/ancienne.jpg'))
+        self.assertIn('ancienne-320.jpg', html)
+        self.assertIn('ancienne-320.jpg', product_image_url(
+            {'main_image': 'products/ancienne.jpg', 'image_variants': self.VARIANTS}))
+
+    def test_stale_variants_fall_back_to_new_image(self):
+        """Image changée, worker pas encore passé : l'original, pas l'ancienne photo"""
+        html = product_image(self._product('products/nouvelle.jpg'))
+        self.assertNotIn('ancienne', html)
+        self.assertIn('nouvelle.jpg', html)
+        url = product_image_url({'main_image': 'products/nouvelle.jpg', 'image_variants': self.VARIANTS})
+        self.assertTrue(url.endswith('products/nouvelle.jpg'))
+
+
+class QueryPlanTests(TestCase):
+    """Les requêtes fréquentes du catalogue sont servies par un index (EXPLAIN)"""
+
+    def test_catalog_queries_use_an_index(self):
+        active = Product.objects.filter(is_active=True)
+        queries = {
+            'Catalogue, plus récents': active.order_by('-created_at', '-id')[:25],
+            'Catalogue, par catégorie': active.filter(category_id=1).order_by('-created_at', '-id')[:25],
+            'Catalogue, prix croissant': active.order_by('effective_price', 'id')[:25],
+            'Produits similaires (repli)': active.filter(category_id=1).exclude(id=1)[:4],
+        }
+        for name, queryset in queries.items():
+            with self.subTest(name):
+                plan, problems = plan_problems(queryset)
+                self.assertEqual(problems, [], plan)
+
+
+def _png(color):
+    buffer = io.BytesIO()
+    Image.new('RGB', (8, 8), color).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+class ImageServer:
+    """Serveur HTTP local : une image par chemin, 503 au premier essai pour `flaky`"""
+
+    def __init__(self, images, flaky=()):
+        self.images = images
+        self.flaky = set(flaky)
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                path = self.path.split('?')[0]
+                server.requests.append(path)
+                if path in server.flaky:
+                    server.flaky.discard(path)
+                    self._reply(503, b'')
+                elif path in server.images:
+                    self._reply(200, server.images[path], 'image/png')
+                else:
+                    self._reply(404, b'')
+
+            def _reply(self, status, body, content_type='text/plain'):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.httpd.server_address[1]}'
+
+    def __enter__(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class DownloadImagesTests(TestCase):
+    # Chemins des URL de PRODUCT_IMAGES (les deux lampes partagent la même)
+    PHONE = '/photo-1511707171634-5f897ff02aa9'
+    LAMP = '/photo-1513506003901-1e6a229e2d15'
+    LAPTOP = '/photo-1496181133206-80ce9b88a853'
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.media_root = media.name
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        seller = User.objects.create(username='vendeur', is_seller=True)
+        names = ['Samsung Galaxy A14 128GB', 'Lampe Solaire LED Jardin', 'Lampe Suspension Calebasse',
+                 'Ordinateur Portable HP 15']
+        self.products = {
+            name: Product.objects.create(seller=seller, name=name, slug=f'produit-{i}', description='-',
+                                         price=1000, stock_quantity=1, sku=f'SKU-{i}')
+            for i, name in enumerate(names)
+        }
+        # Déjà illustré : ne doit pas être téléchargé
+        laptop = self.products['Ordinateur Portable HP 15']
+        laptop.main_image.name = 'products/existante.jpg'
+        laptop.save(update_fields=['main_image'])
+
+    def _run(self, server):
+        call_command('download_images', mirror=server.url, workers=2, stdout=io.StringIO(),
+                     manifest=os.path.join(self.media_root, 'manifest.json'))
+
+    def test_downloads_retries_and_skips(self):
+        images = {self.PHONE: _png('red'), self.LAMP: _png('blue'), self.LAPTOP: _png('green')}
+        with ImageServer(images, flaky=[self.PHONE]) as server:
+            self._run(server)
+
+        # 503 puis succès pour le téléphone ; URL partagée téléchargée une fois ;
+        # produit déjà illustré ignoré
+        self.assertEqual(sorted(server.requests), sorted([self.PHONE, self.PHONE, self.LAMP]))
+        for name in ['Samsung Galaxy A14 128GB', 'Lampe Solaire LED Jardin', 'Lampe Suspension Calebasse']:
+            product = Product.objects.get(pk=self.products[name].pk)
+            self.assertTrue(default_storage.exists(product.main_image.name), name)
+        phone = Product.objects.get(pk=self.products['Samsung Galaxy A14 128GB'].pk)
+        with default_storage.open(phone.main_image.name, 'rb') as handle:
+            self.assertEqual(handle.read(), images[self.PHONE])
+        lamps = Product.objects.filter(name__startswith='Lampe').values_list('main_image', flat=True)
+        self.assertEqual(len(set(lamps)), 1)
+        self.assertEqual(Product.objects.get(pk=self.products['Ordinateur Portable HP 15'].pk).main_image.name,
+                         'products/existante.jpg')
+
+        # Deuxième passage : tout est déjà là, aucune requête
+        with ImageServer(images) as server:
+            self._run(server)
+        self.assertEqual(server.requests, [])
+
+    def test_invalid_content_is_not_stored(self):
+        images = {self.PHONE: b'pas une image', self.LAMP: _png('blue')}
+        with ImageServer(images) as server:
+            self._run(server)
+        self.assertFalse(Product.objects.get(pk=self.products['Samsung Galaxy A14 128GB'].pk).main_image)
+        self.assertTrue(Product.objects.get(pk=self.products['Lampe Solaire LED Jardin'].pk).main_image)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class CatalogSignatureTests(TestCase):
+    def setUp(self):
+        self.seller = User.objects.create_user(username='vendeur', password='x', is_seller=True)
+        self.customer = User.objects.create_user(username='client', password='x')
+
+    def _cached(self):
+        conditional.catalog_signature()
+        return lambda: cache.get(conditional.CATALOG_SIGNATURE_KEY) is not None
+
+    def test_login_keeps_catalog_signature(self):
+        cached = self._cached()
+        self.assertTrue(self.client.login(username='vendeur', password='x'))
+        self.assertTrue(cached())
+
+    def test_private_or_customer_changes_keep_catalog_signature(self):
+        cached = self._cached()
+        self.customer.first_name = 'Ama'
+        self.customer.save()
+        self.seller.set_password('y')
+        self.seller.save()
+        self.assertTrue(cached())
+
+    def test_visible_seller_change_invalidates(self):
+        cached = self._cached()
+        seller = User.objects.get(pk=self.seller.pk)
+        seller.username = 'boutique'
+        seller.save()
+        self.assertFalse(cached())
+
+
+class SuggestionSignatureTests(TestCase):
+    def test_category_edit_changes_signature(self):
+        """Catégorie renommée : l'index des suggestions est reconstruit"""
+        category = Category.objects.create(name='Téléphonie', slug='telephonie')
+        index = SuggestionIndex()
+        before = index._current_signature()
+        Category.objects.filter(pk=category.pk).update(name='Smartphones', updated_at=timezone.now())
+        self.assertNotEqual(index._current_signature(), before)
+
+
+class SuggestionApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create(username='vendeur', is_seller=True)
+        cls.category = Category.objects.create(name='Téléphonie', slug='telephonie')
+        Product.objects.bulk_create([
+            Product(seller=cls.seller, category=cls.category, name=f'Galaxy A{i}', slug=f'galaxy-{i}',
+                    brand='Samsung', description='-', price=1000, stock_quantity=1, sku=f'SKU-{i}')
+            for i in range(12)
+        ] + [
+            Product(seller=cls.seller, name='Radio solaire', slug='radio', brand='Sony', description='-',
+                    price=1000, stock_quantity=1, sku='SKU-RADIO'),
+        ])
+
+    def setUp(self):
+        # Index du processus : reconstruit à partir de la base de test
+        suggestion_index.signature = None
+        self.addCleanup(setattr, suggestion_index, 'signature', None)
+
+    def _suggest(self, query, **params):
+        response = self.client.get('/api/products/search/', {'q': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results']
+
+    def test_prefix_match(self):
+        results = self._suggest('rad')
+        self.assertEqual([(r['type'], r['name']) for r in results], [('product', 'Radio solaire')])
+        self.assertEqual(results[0]['url'], f"/products/{Product.objects.get(slug='radio').pk}/")
+        self.assertEqual(self._suggest('télép')[0]['type'], 'category')
+
+    def test_typo_tolerance(self):
+        results = self._suggest('samsng')
+        self.assertEqual((results[0]['type'], results[0]['name']), ('brand', 'Samsung'))
+
+    def test_result_limit(self):
+        self.assertEqual(len(self._suggest('galaxy')), 8)
+        self.assertEqual(len(self._suggest('galaxy', limit=3)), 3)
+        self.assertEqual(len(self._suggest('galaxy', limit=500)), 12)
+        self.assertEqual(self._suggest('g'), [])
+
+    def test_change_from_another_worker_is_picked_up(self):
+        """Produit désactivé par un autre worker (sans signal ici) : retiré après INDEX_TTL"""
+        self.assertTrue(self._suggest('radio'))
+        Product.objects.filter(slug='radio').update(is_active=False, updated_at=timezone.now())
+        self.assertTrue(self._suggest('radio'))
+
+        suggestion_index.checked_at -= INDEX_TTL + 1
+        self.assertEqual(self._suggest('radio'), [])
+
+
+class CoPurchaseTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create(username='vendeur', is_seller=True)
+        cls.products = Product.objects.bulk_create([
+            Product(seller=cls.seller, name=f'Produit {i}', slug=f'produit-{i}', description='-',
+                    price=1000, stock_quantity=1, sku=f'SKU-{i}')
+            for i in range(5)
+        ])
+
+    def _orders(self, baskets):
+        from orders.models import Order, OrderItem
+
+        for basket in baskets:
+            order = Order.objects.create(guest_name='Client', shipping_address='-', shipping_city='Lomé',
+                                         subtotal=1000, total=3000)
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, product=self.products[i], product_name='-', product_price=1000,
+                          quantity=1, total_price=1000, seller=self.seller)
+                for i in basket
+            ])
+        # Commandes « mûres » (SETTLE_DELAY)
+        Order.objects.update(created_at=timezone.now() - recommendations.SETTLE_DELAY * 2)
+
+    def _neighbors(self):
+        return sorted(ProductNeighbor.objects.filter(kind=recommendations.KIND).values_list(
+            'product_id', 'neighbor_id', 'rank', 'score'))
+
+    def test_incremental_update_matches_full_rebuild(self):
+        """Les voisins d'un produit non touché suivent le total de ses voisins touchés"""
+        self._orders([[0, 1], [1, 2], [2, 3], [0, 2]])
+        recommendations.update_co_purchases()
+        # Le produit 3 n'est pas dans ces commandes, mais le total du produit 2 change
+        self._orders([[2, 4], [2, 4], [1, 2]])
+        recommendations.update_co_purchases()
+        incremental = self._neighbors()
+
+        recommendations.update_co_purchases(rebuild=True)
+        self.assertEqual(incremental, self._neighbors())
+
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+@unittest.skipUnless(numpy, "NumPy est requis")
+class SimilarProductsTests(TestCase):
+    NAMES = ['Chaussures cuir marron', 'Chaussures cuir noir', 'Chaussures toile blanche',
+             'Sac cuir marron', 'Radio portable solaire']
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create(username='vendeur', is_seller=True)
+        Product.objects.bulk_create([
+            Product(seller=cls.seller, name=name, slug=f'produit-{i}', description=name,
+                    price=1000, stock_quantity=1, sku=f'SKU-{i}')
+            for i, name in enumerate(cls.NAMES)
+        ])
+
+    def _neighbors(self, slug):
+        from .similarity import KIND
+
+        return list(ProductNeighbor.objects.filter(kind=KIND, product__slug=slug).order_by('rank')
+                    .values_list('neighbor__slug', flat=True))
+
+    def test_incremental_merge_evicts_weakest_neighbor(self):
+        from .similarity import update_similar_products
+
+        update_similar_products(top_k=2)
+        before = self._neighbors('produit-0')
+        self.assertEqual(len(before), 2)
+
+        # Produit existant réécrit comme le jumeau de produit-0 : run incrémental
+        Product.objects.filter(slug='produit-4').update(
+            name='Chaussures cuir marron', description='Chaussures cuir marron', updated_at=timezone.now(),
+        )
+        self.assertEqual(update_similar_products(top_k=2)[0], 1)
+        self.assertEqual(self._neighbors('produit-0'), ['produit-4', before[0]])
+
+        incremental = {slug: self._neighbors(slug) for slug in ('produit-0', 'produit-1', 'produit-3')}
+        update_similar_products(top_k=2, rebuild=True)
+        self.assertEqual(incremental, {slug: self._neighbors(slug) for slug in incremental})
+
+    def test_unchanged_text_is_not_revectorized(self):
+        from .similarity import update_similar_products
+
+        update_similar_products(top_k=2)
+        Product.objects.filter(slug='produit-0').update(price=2000, updated_at=timezone.now())
+        self.assertEqual(update_similar_products(top_k=2), (0, 0))
+
+    def test_new_product_is_merged_into_existing_lists(self):
+        from .similarity import KIND, update_similar_products
+
+        update_similar_products(top_k=2)
+        new = Product.objects.create(seller=self.seller, name='Chaussures cuir marron', slug='nouveau',
+                                     description='Chaussures cuir marron', price=1000, stock_quantity=1,
+                                     sku='SKU-NEW')
+        update_similar_products(top_k=2)
+
+        twin = Product.objects.get(slug='produit-0')
+        neighbors = list(ProductNeighbor.objects.filter(kind=KIND, product=twin).order_by('rank')
+                         .values_list('neighbor_id', flat=True))
+        self.assertEqual(neighbors[0], new.pk)
+        self.assertLessEqual(len(neighbors), 2)
+        self.assertFalse(ProductNeighbor.objects.filter(kind=KIND, neighbor__slug='produit-4').exists())
+
+
+class ViewCounterTests(TestCase):
+    BROWSER = 'Mozilla/5.0 (Linux; Android 13) Chrome/120.0 Mobile'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create(username='vendeur', is_seller=True)
+        cls.products = Product.objects.bulk_create([
+            Product(seller=cls.seller, name=f'Produit {i}', slug=f'produit-{i}', description='-',
+                    price=1000, stock_quantity=1, sku=f'SKU-{i}')
+            for i in range(3)
+        ])
+
+    def setUp(self):
+        views_counter._pending.clear()
+        views_counter._seen.clear()
+        self.addCleanup(views_counter._pending.clear)
+        self.addCleanup(views_counter._seen.clear)
+        # Pas d'écriture pendant record_view : seul flush() écrit
+        patcher = mock.patch.object(views_counter, 'FLUSH_INTERVAL', 3600)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _request(self, user_agent=BROWSER, ip='10.0.0.1'):
+        return RequestFactory().get('/', HTTP_USER_AGENT=user_agent, REMOTE_ADDR=ip)
+
+    def _views(self):
+        return dict(Product.objects.values_list('slug', 'views_count'))
+
+    def test_bots_are_not_counted(self):
+        for user_agent in ('', 'Googlebot/2.1', 'facebookexternalhit/1.1', 'python-requests/2.31'):
+            with self.subTest(user_agent=user_agent):
+                self.assertFalse(views_counter.record_view(self._request(user_agent), self.products[0].pk))
+        self.assertEqual(views_counter._pending, {})
+
+    def test_repeated_views_are_counted_once_per_window(self):
+        product = self.products[0].pk
+        self.assertTrue(views_counter.record_view(self._request(), product))
+        self.assertFalse(views_counter.record_view(self._request(), product))
+        # Autre visiteur, autre produit : comptés
+        self.assertTrue(views_counter.record_view(self._request(ip='10.0.0.2'), product))
+        self.assertTrue(views_counter.record_view(self._request(), self.products[1].pk))
+        self.assertEqual(views_counter._pending, {product: 2, self.products[1].pk: 1})
+
+        later = time.monotonic() + views_counter.DEDUPE_WINDOW + 1
+        with mock.patch.object(views_counter.time, 'monotonic', return_value=later):
+            self.assertTrue(views_counter.record_view(self._request(), product))
+        self.assertEqual(views_counter._pending[product], 3)
+
+    def test_dedupe_memory_is_bounded(self):
+        with mock.patch.object(views_counter, 'MAX_SEEN', 2):
+            for ip in ('10.0.0.1', '10.0.0.2', '10.0.0.3'):
+                views_counter.record_view(self._request(ip=ip), self.products[0].pk)
+            self.assertEqual(len(views_counter._seen), 2)
+            # La plus ancienne vue est oubliée
+            self.assertTrue(views_counter.record_view(self._request(ip='10.0.0.1'), self.products[0].pk))
+
+    def test_flush_is_one_case_update_per_batch(self):
+        for ip in ('10.0.0.1', '10.0.0.2', '10.0.0.3'):
+            for product in self.products[:2]:
+                views_counter.record_view(self._request(ip=ip), product.pk)
+        views_counter.record_view(self._request(), self.products[2].pk)
+        before = Product.objects.get(pk=self.products[0].pk).updated_at
+
+        with self.assertNumQueries(1):
+            self.assertEqual(views_counter.flush(), 3)
+        self.assertEqual(self._views(), {'produit-0': 3, 'produit-1': 3, 'produit-2': 1})
+        self.assertEqual(Product.objects.get(pk=self.products[0].pk).updated_at, before)
+        self.assertEqual(views_counter._pending, {})
+
+        with self.assertNumQueries(0):
+            self.assertEqual(views_counter.flush(), 0)
+
+    def test_flush_batches_of_flush_batch_products(self):
+        for product in self.products:
+            views_counter.record_view(self._request(), product.pk)
+        with mock.patch.object(views_counter, 'FLUSH_BATCH', 2), self.assertNumQueries(2):
+            views_counter.flush()
+        self.assertEqual(self._views(), {'produit-0': 1, 'produit-1': 1, 'produit-2': 1})
+
+
+class RatingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create(username='vendeur', is_seller=True)
+        cls.profile = SellerProfile.objects.create(user=cls.seller, business_name='Boutique')
+        cls.first, cls.second = Product.objects.bulk_create([
+            Product(seller=cls.seller, name=f'Produit {i}', slug=f'produit-{i}', description='-',
+                    price=1000, stock_quantity=1, sku=f'SKU-{i}')
+            for i in range(2)
+        ])
+
+    def _review(self, product, rating, approved=True):
+        return Review.objects.create(product=product, guest_name='Client', rating=rating, comment='-',
+                                     is_approved=approved)
+
+    def _ratings(self, product):
+        product = Product.objects.get(pk=product.pk)
+        return product.rating_avg, product.rating_count
+
+    def _seller_rating(self):
+        return SellerProfile.objects.get(pk=self.profile.pk).rating
+
+    def test_approve_unapprove_and_rerate(self):
+        review = self._review(self.first, 4, approved=False)
+        self._review(self.first, 2)
+        self.assertEqual(self._ratings(self.first), (Decimal('2.00'), 1))
+
+        review.is_approved = True
+        review.save()
+        self.assertEqual(self._ratings(self.first), (Decimal('3.00'), 2))
+
+        review.rating = 5
+        review.save()
+        self.assertEqual(self._ratings(self.first), (Decimal('3.50'), 2))
+        self.assertEqual(self._seller_rating(), Decimal('3.50'))
+
+        review.is_approved = False
+        review.save()
+        self.assertEqual(self._ratings(self.first), (Decimal('2.00'), 1))
+
+    def test_review_moved_to_another_product(self):
+        review = self._review(self.first, 5)
+        self._review(self.second, 1)
+        review.product = self.second
+        review.save()
+        self.assertEqual(self._ratings(self.first), (Decimal('0.00'), 0))
+        self.assertEqual(self._ratings(self.second), (Decimal('3.00'), 2))
+
+    def test_delete(self):
+        review = self._review(self.first, 5)
+        self._review(self.first, 3)
+        review.delete()
+        self.assertEqual(self._ratings(self.first), (Decimal('3.00'), 1))
+        self.assertEqual(self._seller_rating(), Decimal('3.00'))
+
+    def test_seller_refresh_bumps_updated_at(self):
+        """updated_at du profil sert de validateur à la page vendeur : il doit changer"""
+        SellerProfile.objects.filter(pk=self.profile.pk).update(updated_at=timezone.now() - timedelta(days=1))
+        before = SellerProfile.objects.get(pk=self.profile.pk).updated_at
+        self._review(self.first, 4)
+        self.assertEqual(self._seller_rating(), Decimal('4.00'))
+        self.assertGreater(SellerProfile.objects.get(pk=self.profile.pk).updated_at, before)
+
+    def test_admin_actions_refresh_ratings(self):
+        admin_user = User.objects.create(username='admin', is_staff=True, is_superuser=True)
+        self.client.force_login(admin_user)
+        reviews = [self._review(self.first, 4, approved=False), self._review(self.second, 2, approved=False)]
+        selected = [review.pk for review in reviews]
+
+        self.client.post('/admin/products/review/', {'action': 'approve_reviews', '_selected_action': selected})
+        self.assertEqual(self._ratings(self.first), (Decimal('4.00'), 1))
+        self.assertEqual(self._ratings(self.second), (Decimal('2.00'), 1))
+        self.assertEqual(self._seller_rating(), Decimal('3.00'))
+
+        self.client.post('/admin/products/review/', {'action': 'reject_reviews', '_selected_action': selected[:1]})
+        self.assertEqual(self._ratings(self.first), (Decimal('0.00'), 0))
+        self.assertEqual(self._seller_rating(), Decimal('2.00'))
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create(username='vendeur', is_seller=True)
+        cls.profile = SellerProfile.objects.create(user=cls.seller, business_name='Boutique')
+        cls.category = Category.objects.create(name='Téléphonie', slug='telephonie')
+        cls.product = Product.objects.create(seller=cls.seller, category=cls.category, name='Téléphone',
+                                             slug='telephone', description='-', price=1000,
+                                             stock_quantity=5, sku='SKU-1')
+
+    def setUp(self):
+        cache.clear()
+        # Les dates changent à la seconde près dans le test : on part d'hier
+        yesterday = timezone.now() - timedelta(days=1)
+        Product.objects.update(updated_at=yesterday)
+        Category.objects.update(updated_at=yesterday)
+        SellerProfile.objects.update(updated_at=yesterday)
+
+    def _urls(self):
+        return {
+            'fiche': f'/products/{self.product.pk}/',
+            'catalogue': '/products/',
+            'vendeur': f'/accounts/seller/{self.seller.username}/',
+        }
+
+    def _revalidate(self, url, first):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'],
+                               HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+
+    def _first(self, url):
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('private', first['Cache-Control'])
+        return first
+
+    def test_repeated_get_is_not_modified(self):
+        for name, url in self._urls().items():
+            with self.subTest(name):
+                first = self._first(url)
+                response = self._revalidate(url, first)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b'')
+                # If-Modified-Since seul
+                response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+                self.assertEqual(response.status_code, 304)
+
+    def _assert_changes(self, pages, change):
+        urls = {name: url for name, url in self._urls().items() if name in pages}
+        firsts = {name: self._first(url) for name, url in urls.items()}
+        change()
+        for name, url in urls.items():
+            with self.subTest(name):
+                self.assertEqual(self._revalidate(url, firsts[name]).status_code, 200)
+
+    def test_product_edit(self):
+        def edit():
+            product = Product.objects.get(pk=self.product.pk)
+            product.price = 900
+            product.save()
+        self._assert_changes({'fiche', 'catalogue', 'vendeur'}, edit)
+
+    def test_category_rename(self):
+        def rename():
+            category = Category.objects.get(pk=self.category.pk)
+            category.name = 'Téléphones'
+            category.save()
+        self._assert_changes({'fiche', 'catalogue'}, rename)
+
+    def test_seller_profile_edit(self):
+        def edit():
+            profile = SellerProfile.objects.get(pk=self.profile.pk)
+            profile.business_name = 'Nouvelle boutique'
+            profile.save()
+        self._assert_changes({'fiche', 'vendeur'}, edit)
+
+    def test_stock_reservation(self):
+        from orders.stock import reserve
+
+        self._assert_changes({'fiche', 'vendeur'}, lambda: reserve({self.product.pk: 1}))
+
+    def test_pending_flash_message_is_not_validated(self):
+        user = User.objects.create(username='client')
+        self.client.force_login(user)
+        url = self._urls()['fiche']
+        first = self._first(url)
+        # Export refusé : message flash en attente
+        self.client.get('/orders/export/orders/')
+        response = self._revalidate(url, first)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response)
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create(username='vendeur', is_seller=True)
+        cls.phones = Category.objects.create(name='Téléphonie', slug='telephonie')
+        cls.in_category = cls._create('Galaxy A15', 'Écran 6,5 pouces', cls.phones, 'galaxy')
+        cls.in_name = cls._create('Téléphone fixe', 'Combiné sans fil', None, 'fixe')
+        cls.in_description = cls._create('Coque rigide', 'Protège votre téléphone', None, 'coque')
+
+    @classmethod
+    def _create(cls, name, description, category, slug):
+        return Product.objects.create(seller=cls.seller, category=category, name=name, slug=slug,
+                                      description=description, price=1000, stock_quantity=1, sku=slug)
+
+    def _search(self, query):
+        return list(search_products(Product.objects.all(), query).order_by('-search_rank')
+                    .values_list('slug', flat=True))
+
+    def test_accents_and_stemming(self):
+        """« telephone » trouve la catégorie « Téléphonie » (accents, racine commune)"""
+        self.assertIn('galaxy', self._search('telephone'))
+        self.assertIn('galaxy', self._search('TÉLÉPHONIE'))
+
+    def test_name_hit_ranks_above_description_hit(self):
+        results = self._search('téléphone')
+        self.assertLess(results.index('fixe'), results.index('coque'))
+
+    def test_product_save_reindexes(self):
+        product = Product.objects.get(pk=self.in_description.pk)
+        product.name = 'Chargeur rapide'
+        product.save()
+        self.assertEqual(self._search('chargeur'), ['coque'])
+        self.assertEqual(self._search('coque'), [])
+
+    def test_product_delete_unindexes(self):
+        Product.objects.get(pk=self.in_name.pk).delete()
+        self.assertFalse(ProductSearchDocument.objects.filter(product_id=self.in_name.pk).exists())
+        self.assertNotIn('fixe', self._search('téléphone'))
+
+    def test_category_rename_reindexes(self):
+        category = Category.objects.get(pk=self.phones.pk)
+        category.name = 'Smartphones'
+        category.save()
+        self.assertEqual(self._search('smartphone'), ['galaxy'])
+        self.assertNotIn('galaxy', self._search('telephonie'))
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ProductCardCacheTests(TestCase):
+    TEMPLATE = 'includes/product_card.html'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create(username='vendeur', is_seller=True)
+        cls.other = User.objects.create(username='autre', is_seller=True)
+        cls.category = Category.objects.create(name='Téléphonie', slug='telephonie')
+        Product.objects.bulk_create([
+            Product(seller=cls.seller if i < 3 else cls.other, category=cls.category if i % 2 else None,
+                    name=f'Produit {i}', slug=f'produit-{i}', description='-', price=1000,
+                    stock_quantity=1, sku=f'SKU-{i}')
+            for i in range(5)
+        ])
+
+    def setUp(self):
+        cache.clear()
+
+    def _products(self):
+        return list(Product.objects.select_related('seller').order_by('pk'))
+
+    def _cached_ids(self):
+        products = self._products()
+        keys = {cards.card_key(self.TEMPLATE, p.pk, p.updated_at): p.slug for p in products}
+        return sorted(keys[key] for key in cache.get_many(list(keys)))
+
+    def test_listing_uses_one_get_many(self):
+        products = self._products()
+        first = cards.render_cards(products, self.TEMPLATE)
+        self.assertIn('Produit 4', first)
+
+        with mock.patch('products.cards.cache', wraps=caches['default']) as spy, \
+                mock.patch('products.cards.render_to_string') as render:
+            self.assertEqual(cards.render_cards(products, self.TEMPLATE), first)
+        self.assertEqual(spy.get_many.call_count, 1)
+        self.assertFalse(spy.get.called)
+        render.assert_not_called()
+
+    def test_category_rename_invalidates_its_cards(self):
+        cards.render_cards(self._products(), self.TEMPLATE)
+        category = Category.objects.get(pk=self.category.pk)
+        category.name = 'Smartphones'
+        category.save()
+        self.assertEqual(self._cached_ids(), ['produit-0', 'produit-2', 'produit-4'])
+
+    def test_seller_rename_invalidates_their_cards(self):
+        """Les cartes affichent User.username : seul son changement les invalide"""
+        cards.render_cards(self._products(), self.TEMPLATE)
+        seller = User.objects.get(pk=self.seller.pk)
+        seller.last_login = timezone.now()
+        seller.save(update_fields=['last_login'])
+        self.assertEqual(len(self._cached_ids()), 5)
+
+        seller.username = 'boutique'
+        seller.save()
+        self.assertEqual(self._cached_ids(), ['produit-3', 'produit-4'])
+        self.assertIn('boutique', cards.render_cards(self._products()[:1], self.TEMPLATE))
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class FacetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create(username='vendeur', is_seller=True)
+        cls.phones = Category.objects.create(name='Téléphonie', slug='telephonie')
+        cls.audio = Category.objects.create(name='Audio', slug='audio')
+        rows = [
+            (cls.phones, 'new', 5, 3000), (cls.phones, 'new', 0, 30000), (cls.phones, 'used', 2, 3000),
+            (cls.audio, 'new', 1, 30000), (cls.audio, 'used', 0, 600000),
+        ]
+        Product.objects.bulk_create([
+            Product(seller=cls.seller, category=category, condition=condition, stock_quantity=stock,
+                    price=price, name=f'Produit {i}', slug=f'produit-{i}', description='-', sku=f'SKU-{i}')
+            for i, (category, condition, stock, price) in enumerate(rows)
+        ])
+
+    def _facets(self, **filters):
+        facets, total, _ = compute_facets(Product.objects.all(), FacetFilters(**filters))
+        conditions = {item['value']: item['count'] for item in facets['conditions']}
+        return facets, conditions, total
+
+    def test_selected_category_keeps_its_own_facet(self):
+        facets, conditions, total = self._facets(category=self.phones)
+        # Les autres catégories gardent leur nombre...
+        self.assertEqual(facets['categories'], {self.phones.pk: 3, self.audio.pk: 2})
+        # ... mais les autres facettes sont restreintes à la catégorie
+        self.assertEqual(conditions, {'new': 2, 'used': 1, 'refurbished': 0})
+        self.assertEqual(facets['in_stock'], 2)
+        self.assertEqual(total, 3)
+
+    def test_two_selected_facets_narrow_each_other(self):
+        facets, conditions, total = self._facets(category=self.phones, condition='new')
+        self.assertEqual(facets['categories'], {self.phones.pk: 2, self.audio.pk: 1})
+        self.assertEqual(conditions, {'new': 2, 'used': 1, 'refurbished': 0})
+        self.assertEqual(total, 2)
+
+    def test_price_facets(self):
+        facets, _, total = self._facets(min_price=Decimal('10000'), max_price=Decimal('100000'))
+        self.assertEqual(total, 2)
+        # Les tranches ne tiennent pas compte de la tranche choisie, mais de la fourchette min/max
+        self.assertEqual([bucket['count'] for bucket in facets['price_buckets']], [0, 0, 2, 0, 0])
+        facets, _, total = self._facets(price_bucket=0)
+        self.assertEqual(total, 2)
+        self.assertEqual([bucket['count'] for bucket in facets['price_buckets']], [2, 0, 2, 0, 1])
+
+    def test_invalid_filter_values_are_ignored(self):
+        form = ProductSearchForm({'category': '999999', 'min_price': 'abc', 'price_bucket': '42',
+                                  'condition': 'used'})
+        filters = FacetFilters.from_form(form)
+        self.assertIsNone(filters.category)
+        self.assertIsNone(filters.min_price)
+        self.assertIsNone(filters.price_bucket)
+        self.assertEqual(filters.apply(Product.objects.all()).count(), 2)
+
+        response = self.client.get('/products/', {'category': 'x', 'min_price': 'abc', 'condition': 'used'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['total_results'], 2)
+
+    def test_all_facets_from_one_grouped_query(self):
+        with self.assertNumQueries(1):
+            facets, conditions, total = self._facets(category=self.phones, condition='new', in_stock=True,
+                                                     min_price=Decimal('1000'), min_discount=10)
+        self.assertEqual(total, 0)
+
+
+class CategoryCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create(username='vendeur', is_seller=True)
+        cls.phones = Category.objects.create(name='Téléphonie', slug='telephonie')
+        cls.audio = Category.objects.create(name='Audio', slug='audio')
+
+    def _create(self, category, sku):
+        return Product.objects.create(seller=self.seller, category=category, name=sku, slug=sku.lower(),
+                                      description='-', price=1000, stock_quantity=1, sku=sku)
+
+    def _counts(self):
+        return dict(Category.objects.values_list('slug', 'active_product_count'))
+
+    def test_create_move_deactivate_delete(self):
+        first = self._create(self.phones, 'P1')
+        self._create(self.phones, 'P2')
+        self.assertEqual(self._counts(), {'telephonie': 2, 'audio': 0})
+
+        first.category = self.audio
+        first.save()
+        self.assertEqual(self._counts(), {'telephonie': 1, 'audio': 1})
+
+        first.is_active = False
+        first.save()
+        self.assertEqual(self._counts(), {'telephonie': 1, 'audio': 0})
+
+        first.is_active = True
+        first.save()
+        self.assertEqual(self._counts(), {'telephonie': 1, 'audio': 1})
+
+        first.delete()
+        self.assertEqual(self._counts(), {'telephonie': 1, 'audio': 0})
+
+    def test_only_changes_refresh_counts(self):
+        product = self._create(self.phones, 'P1')
+        product.price = 2000
+        with mock.patch.object(Category, 'refresh_product_counts') as refresh:
+            product.save()
+        refresh.assert_not_called()
+
+    def test_import_batch(self):
+        self._create(self.phones, 'P1')
+        report = import_catalog(io.StringIO(
+            'name,price,sku,category\n'
+            'Casque,5000,P2,Audio\n'
+            'Enceinte,9000,P3,Audio\n'
+            'Déplacé,1000,P1,Audio\n'
+        ), 'csv', default_seller=self.seller)
+        self.assertEqual((report.created, report.updated, report.error_count), (2, 1, 0))
+        self.assertEqual(self._counts(), {'telephonie': 0, 'audio': 3})
+
+    def test_rebuild_command(self):
+        self._create(self.phones, 'P1')
+        Category.objects.update(active_product_count=42)
+        call_command('rebuild_category_counts', stdout=io.StringIO())
+        self.assertEqual(self._counts(), {'telephonie': 1, 'audio': 0})
+
+
+class EffectivePriceTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create(username='vendeur', is_seller=True)
+        rows = [
+            ('sans-remise', 3000, None),
+            ('remise-nulle', 2500, 0),
+            ('remise-25', 4000, 3000),
+            ('remise-60', 5000, 2000),
+            ('remise-10', 1000, 900),
+        ]
+        Product.objects.bulk_create([
+            Product(seller=cls.seller, name=slug, slug=slug, description='-', price=price,
+                    discount_price=discount, stock_quantity=1, sku=slug)
+            for slug, price, discount in rows
+        ])
+
+    def _values(self, slug):
+        return Product.objects.values_list('effective_price', 'discount_percentage').get(slug=slug)
+
+    def test_generated_values(self):
+        self.assertEqual(self._values('sans-remise'), (Decimal('3000'), Decimal('0')))
+        self.assertEqual(self._values('remise-nulle'), (Decimal('2500'), Decimal('0')))
+        self.assertEqual(self._values('remise-25'), (Decimal('3000'), Decimal('25')))
+        self.assertEqual(self._values('remise-60'), (Decimal('2000'), Decimal('60')))
+
+    def _listed(self, **params):
+        response = self.client.get('/products/', params)
+        self.assertEqual(response.status_code, 200)
+        return [product.slug for product in response.context['products']]
+
+    def test_price_sort_uses_discounted_price(self):
+        self.assertEqual(self._listed(sort='price_asc'),
+                         ['remise-10', 'remise-60', 'remise-nulle', 'sans-remise', 'remise-25'])
+        self.assertEqual(self._listed(sort='price_desc'),
+                         ['remise-25', 'sans-remise', 'remise-nulle', 'remise-60', 'remise-10'])
+
+    def test_price_range_filters_on_discounted_price(self):
+        self.assertEqual(sorted(self._listed(min_price=2000, max_price=2500)), ['remise-60', 'remise-nulle'])
+        self.assertEqual(sorted(self._listed(max_price=3000)),
+                         ['remise-10', 'remise-25', 'remise-60', 'remise-nulle', 'sans-remise'])
+        self.assertEqual(self._listed(min_price=3500), [])
+
+    def test_discount_facet_counts(self):
+        facets, total, _ = compute_facets(Product.objects.all(), FacetFilters())
+        counts = {item['value']: item['count'] for item in facets['discounts']}
+        # « X % et plus » : cumul des niveaux supérieurs
+        self.assertEqual(counts, {10: 3, 20: 2, 30: 1, 50: 1})
+        self.assertEqual(sorted(self._listed(min_discount=20)), ['remise-25', 'remise-60'])
+
+        facets, total, _ = compute_facets(Product.objects.all(), FacetFilters(min_discount=20))
+        self.assertEqual(total, 2)
+        # La facette « Remise » ignore sa propre sélection
+        self.assertEqual({item['value']: item['count'] for item in facets['discounts']}, counts)
+
+
+def processed_image_job(object_id):
+    pass
+
+
+def failing_image_job(object_id):
+    raise OSError(f"Image {object_id} illisible")
+
+
+@mock.patch.dict(jobs.HANDLERS, {'product_variants': 'products.tests.processed_image_job',
+                                 'payment_proof': 'products.tests.failing_image_job'})
+class ImageJobTests(TestCase):
+    def _job(self, kind='product_variants', object_id=1, **fields):
+        return ImageJob.objects.create(kind=kind, object_id=object_id, **fields)
+
+    def _worker(self):
+        out = io.StringIO()
+        call_command('run_image_worker', once=True, processes=0, stdout=out)
+        return out.getvalue()
+
+    def test_enqueue_deduplicates_pending_jobs(self):
+        first = jobs.enqueue('product_variants', 7)
+        self.assertEqual(jobs.enqueue('product_variants', 7), first)
+        with self.assertRaises(ValueError):
+            jobs.enqueue('inconnu', 7)
+
+    def test_claim_ready_jobs_once(self):
+        ready = [self._job(object_id=i) for i in range(3)]
+        self._job(object_id=9, run_after=timezone.now() + timedelta(minutes=5))
+        self._job(object_id=10, status='done')
+
+        claimed = jobs.claim(2)
+        # Les plus anciennes d'abord
+        self.assertEqual(sorted(job_id for job_id, _, _ in claimed), [ready[0].pk, ready[1].pk])
+        self.assertEqual([job_id for job_id, _, _ in jobs.claim(10)], [ready[2].pk])
+        self.assertEqual(jobs.claim(10), [])
+        self.assertEqual(ImageJob.objects.filter(status='running').count(), 3)
+
+    def test_retry_with_backoff_then_failed(self):
+        job = self._job('payment_proof', max_attempts=3)
+        delays = []
+        for attempt in range(1, 4):
+            ImageJob.objects.filter(pk=job.pk).update(run_after=timezone.now())
+            self._worker()
+            job.refresh_from_db()
+            self.assertEqual(job.attempts, attempt)
+            self.assertIn('illisible', job.last_error)
+            if attempt < 3:
+                self.assertEqual(job.status, 'pending')
+                delays.append(job.run_after - job.finished_at)
+        self.assertEqual(delays, [jobs.RETRY_DELAY, jobs.RETRY_DELAY * 2])
+        self.assertEqual(job.status, 'failed')
+
+    def test_delayed_retry_is_not_claimed(self):
+        job = self._job('payment_proof')
+        self._worker()
+        self.assertEqual(jobs.claim(10), [])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('pending', 1))
+
+    def test_worker_runs_jobs_inline(self):
+        self._job(object_id=1)
+        self._job('payment_proof', object_id=2, max_attempts=1)
+        output = self._worker()
+        self.assertEqual(jobs.status_counts(), {'pending': 0, 'running': 0, 'done': 1, 'failed': 1})
+        self.assertIn('1 tâches terminées, 1 en échec définitif', output)
+        self.assertIn('OSError: Image 2 illisible', output)
+
+    def test_stale_running_jobs_are_requeued(self):
+        stale = self._job(status='running', started_at=timezone.now() - jobs.STALE_AFTER * 2)
+        recent = self._job(object_id=2, status='running', started_at=timezone.now())
+        output = self._worker()
+        self.assertIn('1 tâches abandonnées remises en attente', output)
+        stale.refresh_from_db()
+        recent.refresh_from_db()
+        self.assertEqual((stale.status, stale.attempts), ('done', 1))
+        self.assertEqual(recent.status, 'running')
@@ -1,72 +1,118 @@
 from django.shortcuts import render, get_object_or_404
-from django.db.models import Q
+from django.http import JsonResponse
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils.http import urlencode
+from django.views.decorators.http import require_GET
 from .models import Product, Category
+from .search import search_products
+from .autocomplete import suggestion_index
+from .pagination import paginate, InvalidCursor, SORT_KEYS
+from .facets import FacetFilters, compute_facets
+from .forms import ProductSearchForm
+from .views_counter import record_view
+from .recommendations import bought_together, neighbors
+from . import conditional
+
+SUGGESTIONS_DEFAULT = 8
+SUGGESTIONS_MAX = 20
 
 def product_list_view(request):
     """
-    Liste des produits avec recherche et filtres
+    Liste des produits avec recherche, filtres et facettes
     """
-    products = Product.objects.filter(is_active=True)
-    categories = Category.objects.all()
+    # Copie du navigateur encore valide : ni requêtes du catalogue, ni rendu
+    validators = conditional.catalog_page(request)
+    response = conditional.not_modified(request, validators)
+    if response:
+        return response
+
+    searched = Product.objects.filter(is_active=True).select_related('seller')
     
-    # Recherche
+    # Recherche plein texte (FTS5 / tsvector)
     query = request.GET.get('q', '')
     if query:
-        products = products.filter(
-            Q(name__icontains=query) |
-            Q(description__icontains=query) |
-            Q(category__name__icontains=query)
-        )
-    
-    # Filtre par catégorie
-    category_id = request.GET.get('category', '')
-    if category_id:
-        products = products.filter(category__id=category_id)
-    
-    # Filtre par prix
-    min_price = request.GET.get('min_price', '')
-    max_price = request.GET.get('max_price', '')
-    if min_price:
-        products = products.filter(price__gte=min_price)
-    if max_price:
-        products = products.filter(price__lte=max_price)
+        searched = search_products(searched, query)
     
-    # Tri
-    sort = request.GET.get('sort', '-created_at')
-    if sort == 'price_asc':
-        products = products.order_by('price')
-    elif sort == 'price_desc':
-        products = products.order_by('-price')
-    elif sort == 'newest':
-        products = products.order_by('-created_at')
-    else:
-        products = products.order_by('-created_at')
+    # Filtres (catégorie, état, stock, prix) et décomptes par facette
+    filters = FacetFilters.from_form(ProductSearchForm(request.GET))
+    products = filters.apply(searched)
     
+    # Tri (par pertinence par défaut quand il y a une recherche)
+    sort = request.GET.get('sort', 'relevance' if query else 'newest')
+    if sort not in SORT_KEYS or (sort == 'relevance' and 'search_rank' not in products.query.annotations):
+        sort = 'newest'
+
+    # Pagination par curseur
+    try:
+        page = paginate(products, sort, request.GET.get('cursor'))
+    except InvalidCursor:
+        page = paginate(products, sort)
+
+    # Défilement infini : fragment HTML des cartes suivantes
+    if request.GET.get('partial'):
+        return conditional.with_validators(JsonResponse({
+            'html': render_to_string('includes/product_cards.html', {'products': page}, request=request),
+            'next': page.next_cursor,
+        }), validators)
+
+    # Total tiré de la requête des facettes (exact, sans COUNT séparé ni
+    # estimate_count : voir compute_facets)
+    facets, total_results, total_is_estimate = compute_facets(searched, filters)
+    categories = [
+        {'id': cat.id, 'name': cat.name, 'count': facets['categories'].get(cat.id, 0)}
+        for cat in Category.objects.filter(is_active=True)
+    ]
+
+    next_query = ''
+    if page.next_cursor:
+        params = request.GET.copy()
+        params['cursor'] = page.next_cursor
+        next_query = params.urlencode()
+
     context = {
-        'products': products,
+        'products': page,
+        'next_query': next_query,
         'categories': categories,
         'query': query,
-        'category_id': category_id,
-        'min_price': min_price,
-        'max_price': max_price,
+        'category_id': request.GET.get('category', ''),
+        'min_price': request.GET.get('min_price', ''),
+        'max_price': request.GET.get('max_price', ''),
+        'condition': filters.condition,
+        'in_stock': filters.in_stock,
+        'price_bucket': filters.price_bucket,
+        'min_discount': filters.min_discount,
+        'facets': facets,
         'sort': sort,
-        'total_results': products.count(),
+        'total_results': total_results,
+        'total_is_estimate': total_is_estimate,
     }
     
-    return render(request, 'products/product_list.html', context)
+    return conditional.with_validators(render(request, 'products/product_list.html', context), validators)
 
 
 def product_detail_view(request, product_id):
     """
     Détail d'un produit
     """
-    product = get_object_or_404(Product, id=product_id, is_active=True)
+    product = get_object_or_404(
+        Product.objects.select_related('category', 'seller__seller_profile'), id=product_id, is_active=True,
+    )
+    record_view(request, product.id)
+
+    validators = conditional.product_page(request, product)
+    response = conditional.not_modified(request, validators)
+    if response:
+        return response
     
-    # Produits similaires
-    similar_products = Product.objects.filter(
-        category=product.category,
-        is_active=True
-    ).exclude(id=product.id)[:4]
+    # Produits similaires : voisins précalculés (build_similar_products),
+    # sinon même catégorie pour un produit pas encore traité
+    similar_products = neighbors(product, 'similar')
+    if not similar_products:
+        similar_products = Product.objects.filter(
+            category=product.category,
+            is_active=True
+        ).exclude(id=product.id)[:4]
     
     # Profil vendeur
     seller_profile = None
@@ -75,8 +121,39 @@ def product_detail_view(request, product_id):
     
     context = {
         'product': product,
+        'bought_together': bought_together(product),
         'similar_products': similar_products,
         'seller_profile': seller_profile,
     }
     
-    return render(request, 'products/product_detail.html', context)
\ No newline at end of file
+    return conditional.with_validators(render(request, 'products/product_detail.html', context), validators)
+
+
+@require_GET
+def product_search_api_view(request):
+    """
+    Suggestions de recherche instantanée (produits, catégories, marques)
+    """
+    query = request.GET.get('q', '').strip()[:100]
+    try:
+        limit = min(int(request.GET.get('limit', SUGGESTIONS_DEFAULT)), SUGGESTIONS_MAX)
+    except ValueError:
+        limit = SUGGESTIONS_DEFAULT
+
+    results = []
+    if len(query) >= 2:
+        suggestion_index.ensure_fresh()
+        list_url = reverse('products:product-list')
+        for suggestion in suggestion_index.suggest(query, limit=max(limit, 1)):
+            if suggestion['type'] == 'product':
+                suggestion['url'] = reverse('products:product-detail', args=[suggestion['id']])
+            elif suggestion['type'] == 'category':
+                suggestion['url'] = f"{list_url}?category={suggestion['id']}"
+            else:
+                suggestion['url'] = f"{list_url}?{urlencode({'q': suggestion['name']})}"
+            results.append(suggestion)
+
+    return JsonResponse(
+        {'q': query, 'results': results},
+        json_dumps_params={'ensure_ascii': False, 'separators': (',', ':')},
+    )
\ No newline at end of file
@@ -0,0 +1,122 @@
+"""
+Compteur de vues produit tamponné
+
+Une vue de la fiche produit ne fait pas d'écriture : elle incrémente un
+compteur en mémoire du processus. Toutes les FLUSH_INTERVAL secondes (au
+premier hit qui suit, et à l'arrêt du processus) les compteurs sont écrits
+en une requête UPDATE ... CASE par lot de FLUSH_BATCH produits.
+
+Ne sont pas comptés : les robots (User-Agent) et les vues répétées du même
+visiteur (session, sinon IP + User-Agent) pendant DEDUPE_WINDOW secondes.
+Les vues déjà comptées sont mémorisées dans le processus (au plus MAX_SEEN,
+les plus anciennes oubliées en premier) : aucun accès au cache par vue. Un
+visiteur servi par plusieurs workers peut être compté une fois par worker.
+"""
+
+import atexit
+import hashlib
+import logging
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.db import DatabaseError
+from django.db.models import Case, F, IntegerField, Value, When
+
+from .models import Product
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = 5
+FLUSH_BATCH = 500
+DEDUPE_WINDOW = 30 * 60
+MAX_SEEN = 100_000
+
+BOT_RE = re.compile(
+    r'bot|crawl|spider|slurp|preview|facebookexternalhit|whatsapp|curl|wget|'
+    r'python-requests|httpclient|headless|lighthouse|monitor',
+    re.IGNORECASE,
+)
+
+_lock = threading.Lock()
+_pending = Counter()
+_last_flush = time.monotonic()
+# (visiteur, produit) -> fin de la fenêtre de déduplication, dans l'ordre d'arrivée
+_seen = OrderedDict()
+
+
+def is_bot(request):
+    user_agent = request.META.get('HTTP_USER_AGENT', '')
+    return not user_agent or bool(BOT_RE.search(user_agent))
+
+
+def _visitor(request):
+    session_key = getattr(request, 'session', None) and request.session.session_key
+    if session_key:
+        return session_key
+    raw = f"{request.META.get('REMOTE_ADDR', '')}|{request.META.get('HTTP_USER_AGENT', '')}"
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def _first_view(key, now):
+    """Mémorise la vue `key` ; False si elle est déjà comptée (appelé sous _lock)"""
+    # Même fenêtre pour toutes les entrées : les plus anciennes expirent en premier
+    while _seen and (next(iter(_seen.values())) <= now or len(_seen) >= MAX_SEEN):
+        _seen.popitem(last=False)
+    if key in _seen:
+        return False
+    _seen[key] = now + DEDUPE_WINDOW
+    return True
+
+
+def record_view(request, product_id):
+    """Compte une vue de `product_id` (sauf robot ou vue répétée)"""
+    if is_bot(request):
+        return False
+    key = (_visitor(request), product_id)
+
+    with _lock:
+        now = time.monotonic()
+        if not _first_view(key, now):
+            return False
+        _pending[product_id] += 1
+        due = now - _last_flush >= FLUSH_INTERVAL
+    if due:
+        flush()
+    return True
+
+
+def flush():
+    """Écrit les vues en attente ; retourne le nombre de produits mis à jour"""
+    global _last_flush
+    with _lock:
+        batch = dict(_pending)
+        _pending.clear()
+        _last_flush = time.monotonic()
+    if not batch:
+        return 0
+
+    items = sorted(batch.items())
+    try:
+        for start in range(0, len(items), FLUSH_BATCH):
+            chunk = items[start:start + FLUSH_BATCH]
+            increment = Case(
+                *[When(pk=pk, then=Value(count)) for pk, count in chunk],
+                default=Value(0),
+                output_field=IntegerField(),
+            )
+            # queryset.update() : pas de signal ni de changement d'updated_at
+            Product.objects.filter(pk__in=[pk for pk, _ in chunk]).update(
+                views_count=F('views_count') + increment
+            )
+    except DatabaseError:
+        # On remet les vues en attente pour le prochain essai
+        logger.exception('Échec de l’écriture des vues produit')
+        with _lock:
+            _pending.update(batch)
+        return 0
+    return len(items)
+
+
+atexit.register(flush)
@@ -67,10 +67,8 @@ document.addEventListener('DOMContentLoaded', function() {
         updateCartCount();
         showNotification('Produit ajouté au panier !', 'success');
         
-        // Envoyer au serveur si l'utilisateur est connecté
-        if (document.body.dataset.userAuthenticated === 'true') {
-            syncCartWithServer(cart);
-        }
+        // Envoyer au serveur (panier de l'utilisateur ou de la session)
+        syncCartWithServer(cart);
     };
     
     // Retirer du panier
@@ -80,9 +78,7 @@ document.addEventListener('DOMContentLoaded', function() {
         localStorage.setItem('cart', JSON.stringify(cart));
         updateCartCount();
         
-        if (document.body.dataset.userAuthenticated === 'true') {
-            syncCartWithServer(cart);
-        }
+        syncCartWithServer(cart);
         
         // Recharger la page du panier si on y est
         if (window.location.pathname.includes('/cart')) {
@@ -104,33 +100,66 @@ document.addEventListener('DOMContentLoaded', function() {
             localStorage.setItem('cart', JSON.stringify(cart));
             updateCartCount();
             
-            if (document.body.dataset.userAuthenticated === 'true') {
-                syncCartWithServer(cart);
-            }
+            syncCartWithServer(cart);
         }
     };
     
-    // Synchroniser avec le serveur
+    // Synchroniser avec le serveur : seules les lignes modifiées depuis la
+    // dernière synchronisation sont envoyées, avec la version du panier connue
     function syncCartWithServer(cart) {
+        const synced = JSON.parse(localStorage.getItem('cartSynced') || 'null');
+        const known = synced ? synced.items : {};
+        const changes = cart
+            .filter(item => known[item.id] !== item.quantity)
+            .map(item => ({ id: item.id, quantity: item.quantity }));
+        const removed = Object.keys(known)
+            .filter(id => !cart.some(item => String(item.id) === id))
+            .map(Number);
+        // Rien de nouveau (dont panier vide jamais synchronisé) : pas de requête
+        if (!changes.length && !removed.length) return;
+
         fetch('/api/cart/sync/', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
                 'X-CSRFToken': getCookie('csrftoken')
             },
-            body: JSON.stringify({ cart: cart })
+            body: JSON.stringify({ version: synced ? synced.version : null, changes: changes, removed: removed })
         })
         .then(response => response.json())
         .then(data => {
+            if (data.resync) {
+                // Panier d'un autre compte ou d'une autre session : tout renvoyer
+                localStorage.removeItem('cartSynced');
+                syncCartWithServer(cart);
+                return;
+            }
             if (!data.success) {
                 console.error('Erreur de synchronisation du panier');
+                return;
             }
+            if (data.items) {
+                // Le serveur a vu d'autres modifications (autre appareil, connexion)
+                cart = data.items.map(line => {
+                    const item = cart.find(i => i.id == line.id) || {
+                        id: line.id, name: line.name, price: Number(line.price), image: line.image
+                    };
+                    return Object.assign(item, { quantity: line.quantity });
+                });
+                localStorage.setItem('cart', JSON.stringify(cart));
+                updateCartCount();
+            }
+            const items = {};
+            cart.forEach(item => { items[item.id] = item.quantity; });
+            localStorage.setItem('cartSynced', JSON.stringify({ version: data.version, items: items }));
         })
         .catch(error => console.error('Erreur:', error));
     }
     
     // Initialiser le compteur du panier
     updateCartCount();
+    // Rattraper les modifications faites hors de ces pages (panier, fiche produit)
+    syncCartWithServer(JSON.parse(localStorage.getItem('cart') || '[]'));
     
     
     // ==========================================
@@ -379,11 +408,3 @@ document.addEventListener('DOMContentLoaded', function() {
     });
     
 });
-
-// Animation de défilement de la page
-@keyframes slideOut {
-    to {
-        transform: translateX(100%);
-        opacity: 0;
-    }
-}
\ No newline at end of file